@@ -0,0 +1,76 @@
+"""
+조합(JSONL) 파일을 압축 여부와 관계없이 같은 방식으로 읽고 쓰기 위한 모듈.
+
+확장자로 형식을 결정합니다.
+    .jsonl       일반 텍스트
+    .jsonl.gz    gzip (표준 라이브러리)
+    .jsonl.zst   zstandard (pip install zstandard 필요)
+
+압축/해제는 스트리밍으로 처리되므로 파일 전체를 메모리에 올리지 않습니다.
+.zst 파일은 여러 프레임(예: 'ab'로 이어 쓴 파일)을 끝까지 이어서 읽습니다.
+"""
+import gzip
+import io
+import os
+
+# zstandard 라이브러리를 시도하고, 없으면 플래그를 설정
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+COMPRESSION_SUFFIXES = ('.gz', '.zst')
+
+def compression_suffix(filepath):
+    """파일 경로의 압축 확장자('.gz', '.zst')를 반환합니다. 압축 파일이 아니면 ''."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if filepath.endswith(suffix):
+            return suffix
+    return ''
+
+def is_compressed(filepath):
+    return compression_suffix(filepath) != ''
+
+def open_composition_file(filepath, mode='rt'):
+    """
+    확장자에 맞춰 파일을 엽니다. mode는 open()과 같은 형식('rt', 'wb', 'ab' 등)입니다.
+    텍스트 모드는 항상 UTF-8을 사용합니다.
+    """
+    text_mode = 'b' not in mode
+    if text_mode and 't' not in mode:
+        mode += 't'
+    encoding = 'utf-8' if text_mode else None
+    suffix = compression_suffix(filepath)
+
+    if suffix == '.gz':
+        return gzip.open(filepath, mode, encoding=encoding)
+    if suffix == '.zst':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError(f"{filepath}: .zst 파일을 처리하려면 zstandard 라이브러리가 필요합니다. (pip install zstandard)")
+        if 'r' not in mode:
+            return zstandard.open(filepath, mode, encoding=encoding)
+        # 해제 스트림은 readline()/readlines()/줄 단위 반복을 지원하지 않으므로 버퍼 계층으로 감쌉니다.
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), read_across_frames=True, closefd=True)
+        buffered = io.BufferedReader(reader)
+        return io.TextIOWrapper(buffered, encoding=encoding) if text_mode else buffered
+    return open(filepath, mode, encoding=encoding)
+
+def resolve_composition_path(filepath):
+    """
+    filepath가 없으면 같은 이름의 압축 파일(.gz, .zst)을 찾아 반환합니다.
+    아무것도 없으면 filepath를 그대로 반환합니다.
+    """
+    if os.path.exists(filepath) or is_compressed(filepath):
+        return filepath
+    for suffix in COMPRESSION_SUFFIXES:
+        if os.path.exists(filepath + suffix):
+            return filepath + suffix
+    return filepath
+
+def with_compression(filepath, suffix):
+    """압축 확장자를 suffix('', '.gz', '.zst')로 바꾼 경로를 반환합니다."""
+    current = compression_suffix(filepath)
+    if current:
+        filepath = filepath[:-len(current)]
+    return filepath + suffix
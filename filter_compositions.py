@@ -1,48 +1,24 @@
-import json
 import glob
 
-def load_synergy_levels(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def check_synergy(synergy_name, synergy_level, required_synergies):
-    if synergy_name in required_synergies:
-        required_level = required_synergies[synergy_name]
-        if isinstance(required_level, list):
-            return synergy_level in required_level
-        else:
-            return synergy_level == required_level
-    return False
+from composition_io import open_composition_file
+from filter_spec import compile_filter_spec, load_champion_table, load_synergy_levels, spec_from_synergy_levels
+from parallel_filter import parallel_filter_file
 
 def process_composition_files(synergy_levels):
-    files_to_process = glob.glob('ai_team_compositions_size_*.jsonl')
+    # 압축 파일(.jsonl.gz, .jsonl.zst)도 함께 처리하며, 출력은 입력과 같은 형식으로 저장됩니다.
+    files_to_process = sorted(glob.glob('ai_team_compositions_size_*.jsonl') +
+                              glob.glob('ai_team_compositions_size_*.jsonl.gz') +
+                              glob.glob('ai_team_compositions_size_*.jsonl.zst'))
 
-    gold_synergies = synergy_levels.get('골드', {})
-    prism_synergies = synergy_levels.get('프리즘', {})
+    # 골드/프리즘 규칙을 한 번만 컴파일해 모든 파일에 재사용합니다.
+    compiled_filter = compile_filter_spec(spec_from_synergy_levels(synergy_levels), load_champion_table())
 
     for input_filepath in files_to_process:
         output_filepath = f"filtered_{input_filepath}"
         print(f"Processing {input_filepath} -> {output_filepath}")
 
-        with open(input_filepath, 'r', encoding='utf-8') as infile, \
-             open(output_filepath, 'w', encoding='utf-8') as outfile:
-
-            for line in infile:
-                try:
-                    composition = json.loads(line)
-                    synergies = composition.get('synergies', {})
-
-                    is_synergy_met = False
-                    for name, level in synergies.items():
-                        if check_synergy(name, level, gold_synergies) or \
-                           check_synergy(name, level, prism_synergies):
-                            is_synergy_met = True
-                            break
-
-                    if is_synergy_met:
-                        outfile.write(line)
-                except json.JSONDecodeError:
-                    print(f"Skipping invalid JSON line in {input_filepath}: {line.strip()}")
+        with open_composition_file(output_filepath, 'wb') as outfile:
+            parallel_filter_file(input_filepath, outfile, compiled_filter)
 
 def main():
     synergy_levels = load_synergy_levels('synergy_level.json')
@@ -0,0 +1,250 @@
+"""
+조합 필터 명세(spec)를 한 번 컴파일해 빠른 집합/비트마스크 검사로 바꾸는 모듈.
+
+명세는 JSON으로 표현 가능한 dict이며, 다음 키를 지원합니다 (모두 선택 사항).
+
+    any_trait_levels   : {시너지: 단계 또는 [단계, ...]}  하나라도 정확히 일치해야 통과
+                         (synergy_level.json의 골드/프리즘 규칙과 같은 형식)
+    required_traits    : {시너지: 최소 인원}  모두 만족해야 통과
+    forbidden_traits   : {시너지: 최소 인원}  하나라도 만족하면 탈락
+    include_champions  : [챔피언, ...]  모두 포함해야 통과
+    exclude_champions  : [챔피언, ...]  하나라도 포함하면 탈락
+    min_size, max_size : 팀 인원 범위
+    max_champion_cost  : 팀에 포함된 챔피언 1명의 최대 코스트
+    min_total_cost, max_total_cost : 팀 전체 코스트 합 범위
+    min_gold_traits    : synergy_level.json의 골드 단계인 시너지 최소 수
+    min_prism_traits   : synergy_level.json의 프리즘 단계인 시너지 최소 수
+
+사용법: python filter_spec.py <spec.json> <출력.jsonl> [입력.jsonl ...]
+"""
+import glob
+import json
+import sys
+
+from composition_io import open_composition_file, resolve_composition_path
+from parallel_filter import parallel_filter_file
+from trait_tiers import level_tier_pairs
+
+CHAMPIONS_FILE = 'tft_all_champions_set15.json'
+SYNERGY_LEVELS_FILE = 'synergy_level.json'
+
+SPEC_KEYS = {
+    'any_trait_levels', 'required_traits', 'forbidden_traits',
+    'include_champions', 'exclude_champions',
+    'min_size', 'max_size', 'max_champion_cost', 'min_total_cost', 'max_total_cost',
+    'min_gold_traits', 'min_prism_traits',
+}
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def check_spec(spec):
+    """
+    명세의 키와 값 형식을 검사합니다. 알 수 없는 키나 형식이 잘못된 값이 있으면 그 키를 밝힌 ValueError를 발생시킵니다.
+    (챔피언/시너지 이름이 실제로 있는지는 검사하지 않습니다)
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("명세는 JSON 객체여야 합니다.")
+    unknown_keys = set(spec) - SPEC_KEYS
+    if unknown_keys:
+        raise ValueError(f"알 수 없는 필터 키: {', '.join(sorted(unknown_keys))}")
+    for key, value in spec.items():
+        if key == 'any_trait_levels':
+            valid = isinstance(value, dict) and all(
+                all(_is_number(level) for level in (levels if isinstance(levels, list) else [levels])) for levels in value.values())
+            expected = "{시너지: 단계 또는 [단계, ...]}"
+        elif key in ('required_traits', 'forbidden_traits'):
+            valid = isinstance(value, dict) and all(_is_number(level) for level in value.values())
+            expected = "{시너지: 인원}"
+        elif key in ('include_champions', 'exclude_champions'):
+            valid = isinstance(value, list) and all(isinstance(name, str) for name in value)
+            expected = "[챔피언, ...]"
+        else:
+            valid = value is None or _is_number(value)
+            expected = "숫자"
+        if not valid:
+            raise ValueError(f"{key}는 {expected} 형식이어야 합니다: {json.dumps(value, ensure_ascii=False)}")
+
+def load_champion_table(filepath=CHAMPIONS_FILE):
+    """챔피언 데이터 파일을 {이름: 챔피언 dict} 형태로 로드합니다."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return {champ['name']: champ for champ in json.load(f)}
+
+def load_synergy_levels(filepath=SYNERGY_LEVELS_FILE):
+    """synergy_level.json을 {등급: {시너지: 단계 또는 [단계, ...]}} 형태로 로드합니다."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def spec_from_synergy_levels(synergy_levels, tiers=('골드', '프리즘')):
+    """synergy_level.json의 지정 등급(기본: 골드, 프리즘) 중 하나라도 달성한 팀을 고르는 명세를 만듭니다."""
+    any_trait_levels = {}
+    for tier in tiers:
+        for name, levels in synergy_levels.get(tier, {}).items():
+            if not isinstance(levels, list):
+                levels = [levels]
+            any_trait_levels.setdefault(name, []).extend(levels)
+    return {'any_trait_levels': any_trait_levels}
+
+def spec_from_target_synergies(synergy_counts):
+    """synergy_counts.json에서 targetSynergy가 true인 (시너지, 인원) 중 하나라도 일치하는 팀을 고르는 명세를 만듭니다."""
+    any_trait_levels = {}
+    for synergy in synergy_counts:
+        if synergy.get('targetSynergy'):
+            any_trait_levels.setdefault(synergy['synergy_name'], []).append(synergy['count'])
+    return {'any_trait_levels': any_trait_levels}
+
+class CompiledFilter:
+    """
+    compile_filter_spec()가 반환하는 필터.
+    파일의 조합 dict에는 호출(compiled(composition))을, 챔피언 목록만 있는 경우에는 match_champions(champions)를 사용합니다.
+    모듈 최상위 클래스이므로 프로세스 풀로 그대로 전달(pickle)할 수 있습니다.
+    """
+
+    def __init__(self, champion_bits, champion_costs, champion_traits, any_trait_levels,
+                 required_traits, forbidden_traits, include_mask, exclude_mask,
+                 min_size, max_size, max_champion_cost, min_total_cost, max_total_cost,
+                 gold_levels=frozenset(), prism_levels=frozenset(), min_gold_traits=0, min_prism_traits=0):
+        self.champion_bits = champion_bits
+        self.champion_costs = champion_costs
+        self.champion_traits = champion_traits
+        self.any_trait_levels = any_trait_levels
+        self.required_traits = required_traits
+        self.forbidden_traits = forbidden_traits
+        self.include_mask = include_mask
+        self.exclude_mask = exclude_mask
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_champion_cost = max_champion_cost
+        self.min_total_cost = min_total_cost
+        self.max_total_cost = max_total_cost
+        self.gold_levels = gold_levels
+        self.prism_levels = prism_levels
+        self.min_gold_traits = min_gold_traits
+        self.min_prism_traits = min_prism_traits
+        self.needs_cost = max_champion_cost is not None or min_total_cost is not None or max_total_cost is not None
+        self.needs_traits = bool(any_trait_levels or required_traits or forbidden_traits or min_gold_traits or min_prism_traits)
+
+    def __call__(self, composition):
+        return self.match(composition.get('champions', []), composition.get('synergies', {}))
+
+    def match_champions(self, champions):
+        """시너지 정보 없이 챔피언 목록만으로 검사합니다. (시너지는 챔피언 특성으로 계산)"""
+        synergies = None
+        if self.needs_traits:
+            synergies = {}
+            for champ in champions:
+                for trait in self.champion_traits.get(champ, ()):
+                    synergies[trait] = synergies.get(trait, 0) + 1
+        return self.match(champions, synergies)
+
+    def match(self, champions, synergies):
+        size = len(champions)
+        if size < self.min_size or size > self.max_size:
+            return False
+
+        if self.include_mask or self.exclude_mask:
+            mask = 0
+            for champ in champions:
+                mask |= self.champion_bits.get(champ, 0)
+            if mask & self.include_mask != self.include_mask or mask & self.exclude_mask:
+                return False
+
+        if self.needs_cost:
+            costs = [self.champion_costs.get(champ, 0) for champ in champions]
+            total_cost = sum(costs)
+            if self.max_champion_cost is not None and costs and max(costs) > self.max_champion_cost:
+                return False
+            if self.min_total_cost is not None and total_cost < self.min_total_cost:
+                return False
+            if self.max_total_cost is not None and total_cost > self.max_total_cost:
+                return False
+
+        if self.needs_traits:
+            if self.any_trait_levels and self.any_trait_levels.isdisjoint(synergies.items()):
+                return False
+            for trait, level in self.required_traits:
+                if synergies.get(trait, 0) < level:
+                    return False
+            for trait, level in self.forbidden_traits:
+                if synergies.get(trait, 0) >= level:
+                    return False
+            if self.min_gold_traits and len(self.gold_levels.intersection(synergies.items())) < self.min_gold_traits:
+                return False
+            if self.min_prism_traits and len(self.prism_levels.intersection(synergies.items())) < self.min_prism_traits:
+                return False
+
+        return True
+
+def compile_filter_spec(spec, champion_table, synergy_levels=None):
+    """
+    명세 dict를 CompiledFilter로 컴파일합니다.
+    champion_table은 load_champion_table()과 같은 {이름: {'cost', 'traits', ...}} 형태입니다.
+    synergy_levels는 등급 조건(min_gold_traits, min_prism_traits)에 쓰이며, 없으면 필요할 때 synergy_level.json을 읽습니다.
+    알 수 없는 키나 챔피언, 형식이 잘못된 값이 있으면 ValueError를 발생시킵니다. (check_spec() 참고)
+    """
+    check_spec(spec)
+
+    champion_names = sorted(champion_table)
+    champion_bits = {name: 1 << i for i, name in enumerate(champion_names)}
+    champion_costs = {name: champ.get('cost', 0) for name, champ in champion_table.items()}
+    champion_traits = {name: tuple(champ.get('traits', ())) for name, champ in champion_table.items()}
+
+    def to_mask(names):
+        mask = 0
+        for name in names:
+            if name not in champion_bits:
+                raise ValueError(f"알 수 없는 챔피언: {name}")
+            mask |= champion_bits[name]
+        return mask
+
+    any_trait_levels = set()
+    for name, levels in spec.get('any_trait_levels', {}).items():
+        if not isinstance(levels, list):
+            levels = [levels]
+        any_trait_levels.update((name, level) for level in levels)
+
+    tier_pairs = {}
+    if spec.get('min_gold_traits') or spec.get('min_prism_traits'):
+        tier_pairs = level_tier_pairs(synergy_levels if synergy_levels is not None else load_synergy_levels())
+
+    return CompiledFilter(
+        champion_bits=champion_bits,
+        champion_costs=champion_costs,
+        champion_traits=champion_traits,
+        any_trait_levels=frozenset(any_trait_levels),
+        required_traits=tuple(spec.get('required_traits', {}).items()),
+        forbidden_traits=tuple(spec.get('forbidden_traits', {}).items()),
+        include_mask=to_mask(spec.get('include_champions', [])),
+        exclude_mask=to_mask(spec.get('exclude_champions', [])),
+        min_size=spec.get('min_size', 0),
+        max_size=spec.get('max_size', len(champion_names)),
+        max_champion_cost=spec.get('max_champion_cost'),
+        min_total_cost=spec.get('min_total_cost'),
+        max_total_cost=spec.get('max_total_cost'),
+        gold_levels=tier_pairs.get('골드', frozenset()),
+        prism_levels=tier_pairs.get('프리즘', frozenset()),
+        min_gold_traits=spec.get('min_gold_traits', 0),
+        min_prism_traits=spec.get('min_prism_traits', 0),
+    )
+
+def run_filter(spec, input_files, output_file, annotate_source=False):
+    """명세에 맞는 조합만 input_files에서 골라 output_file에 순서대로 저장합니다."""
+    compiled = compile_filter_spec(spec, load_champion_table())
+    # 입력/출력 모두 .gz, .zst 압축 파일을 지원합니다.
+    with open_composition_file(output_file, 'wb') as outfile:
+        for input_file in map(resolve_composition_path, input_files):
+            print(f"Processing {input_file} -> {output_file}")
+            annotate_fields = {'source_file': input_file} if annotate_source else None
+            parallel_filter_file(input_file, outfile, compiled, annotate_fields=annotate_fields)
+
+def main():
+    if len(sys.argv) < 3:
+        print("사용법: python filter_spec.py <spec.json> <출력.jsonl> [입력.jsonl ...]")
+        return
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    input_files = sys.argv[3:] or sorted(glob.glob('ai_team_compositions_size_*.jsonl*'))
+    run_filter(spec, input_files, sys.argv[2])
+
+if __name__ == '__main__':
+    main()
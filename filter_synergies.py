@@ -1,72 +1,42 @@
-import json
+import sys
 
-def get_target_synergies(synergy_counts_file):
+from composition_io import compression_suffix, open_composition_file, resolve_composition_path, with_compression
+from filter_spec import compile_filter_spec, load_champion_table
+from parallel_filter import parallel_filter_file
+from team_store import save_subset, target_synergy_spec
+
+def get_target_spec(synergy_counts_file):
     """
-    Reads the synergy_counts.json file and returns a list of target synergy dictionaries.
+    Returns a filter spec that matches teams having any (synergy, count) pair marked with targetSynergy: true.
+    Uses the same parser as the team store (team_store.target_synergy_spec).
     """
-    with open(synergy_counts_file, 'r', encoding='utf-8') as f:
-        synergy_counts = json.load(f)
-
-    target_synergies_list = []
-    for synergy in synergy_counts:
-        if synergy.get('targetSynergy'):
-            # Create a dictionary for each target synergy combination
-            target_synergies_list.append({synergy['synergy_name']: synergy['count']})
-
-    # The above is not quite right. A team can have multiple synergies.
-    # The problem is to find a team that has ALL the target synergies.
-    # Let's rebuild the target synergy dictionary correctly.
-
-    target_synergies = {}
-    for synergy in synergy_counts:
-        if synergy.get('targetSynergy'):
-            name = synergy['synergy_name']
-            count = synergy['count']
-            if name not in target_synergies or count > target_synergies[name]:
-                target_synergies[name] = count
-
-    # The user request is to find teams that match the synergy and count.
-    # It does not say that a team should have ALL target synergies.
-    # It says "check if its synergies match the target synergies and their counts."
-    # Let's assume this means that any team that has *any* of the target synergies with the correct count is a match.
-    # This is a bit ambiguous. Let's try a different interpretation.
-    # "synergy_counts.json 파일의 targetSynerge true 인 시너지와 카운트가 일치하는 팀을 찾아서 파일로 저장해줘"
-    # This means "Find teams where the synergy and count match a synergy with targetSynergy:true in the synergy_counts.json file and save it to a file."
-
-    # This implies that if a team has a synergy "별 수호자: 8" and this exists in the synergy_counts.json with targetSynergy: true, then it's a match.
-    # The logic in the previous script was too strict. Let's create a set of tuples for faster lookup.
+    return target_synergy_spec(synergy_counts_file)
 
-    targets = set()
-    for synergy in synergy_counts:
-        if synergy.get('targetSynergy'):
-            targets.add((synergy['synergy_name'], synergy['count']))
-    return targets
+def get_target_filter(synergy_counts_file):
+    """Returns the compiled form of get_target_spec()."""
+    return compile_filter_spec(get_target_spec(synergy_counts_file), load_champion_table())
 
 
-def filter_compositions_by_synergy(input_file, output_file, target_synergies):
+def filter_compositions_by_synergy(input_file, outfile, target_filter):
     """
-    Filters team compositions from an input file based on synergy match and saves them to an output file.
+    Filters team compositions from an input file based on synergy match and writes them to an open output file.
+    The input is split into newline-aligned chunks that are filtered in a process pool; output order is preserved.
     """
-    with open(input_file, 'r', encoding='utf-8') as infile, open(output_file, 'a', encoding='utf-8') as outfile:
-        for line in infile:
-            try:
-                composition = json.loads(line.strip())
-                synergies = composition.get("synergies", {})
-
-                # Check if any of the team's synergies match any of the target synergies
-                for synergy_name, synergy_count in synergies.items():
-                    if (synergy_name, synergy_count) in target_synergies:
-                        outfile.write(line.strip() + '\n')
-                        break # Move to the next composition once a match is found
-            except json.JSONDecodeError:
-                print(f"Skipping invalid JSON line in {input_file}: {line.strip()}")
+    parallel_filter_file(input_file, outfile, target_filter)
 
 def main():
     """
     Main function to execute the filtering process.
     """
     synergy_counts_file = "synergy_counts.json"
-    target_synergies = get_target_synergies(synergy_counts_file)
+    target_spec = get_target_spec(synergy_counts_file)
+    target_filter = compile_filter_spec(target_spec, load_champion_table())
+
+    # The server reads this dataset as a membership bitmap (one bit per team) over the team store.
+    save_subset("high_value", "all_ai", target_spec)
+    if "--subset-only" in sys.argv:
+        # Both backends derive this dataset from all_ai, so the JSONL copy is only for reading the file directly.
+        return
 
     input_files = [
         "ai_team_compositions_size_6.jsonl",
@@ -74,17 +44,18 @@ def main():
         "ai_team_compositions_size_8.jsonl",
         "ai_team_compositions_size_9.jsonl"
     ]
-
-    output_file = "filtered_compositions_by_synergy.jsonl"
-
-    # Clear the output file before starting
-    with open(output_file, 'w', encoding='utf-8') as f:
-        pass
-
-    for input_file in input_files:
-        print(f"Processing {input_file} -> {output_file}")
-        filter_compositions_by_synergy(input_file, output_file, target_synergies)
-        print(f"Finished processing {input_file}")
+    # Compressed variants (.jsonl.gz / .jsonl.zst) are picked up transparently.
+    input_files = [resolve_composition_path(input_file) for input_file in input_files]
+
+    # The output uses the same compression as the first input file.
+    output_file = with_compression("filtered_compositions_by_synergy.jsonl", compression_suffix(input_files[0]))
+
+    # A single writer for all inputs, so a compressed output is one continuous stream.
+    with open_composition_file(output_file, 'wb') as outfile:
+        for input_file in input_files:
+            print(f"Processing {input_file} -> {output_file}")
+            filter_compositions_by_synergy(input_file, outfile, target_filter)
+            print(f"Finished processing {input_file}")
 
 if __name__ == "__main__":
     main()
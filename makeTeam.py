@@ -5,6 +5,7 @@ import time
 import math
 import multiprocessing
 import sys
+from composition_io import open_composition_file
 # TQDM 라이브러리를 시도하고, 없으면 플래그를 설정
 try:
     from tqdm import tqdm
@@ -52,9 +53,10 @@ def check_team_validity(team):
 # 2. 메인 로직 함수 정의
 # --------------------------------------------------------------------------
 
-def find_fully_activated_teams(champions, synergies, team_size):
+def find_fully_activated_teams(champions, synergies, team_size, compression=''):
     """
     비활성/낭비되는 시너지가 없는 모든 팀 조합 목록을 찾습니다.
+    compression이 'gz' 또는 'zst'이면 결과를 스트리밍 압축하여 저장합니다.
     """
     # 메인 프로세스에서만 데이터를 지역 변수로 로드합니다.
     local_champion_data = {champ['name']: champ['traits'] for champ in champions if 'name' in champ and 'traits' in champ}
@@ -85,10 +87,12 @@ def find_fully_activated_teams(champions, synergies, team_size):
     start_time = time.time()
     valid_team_count = 0
     output_filename = f'ai_team_compositions_size_{team_size}.jsonl'
+    if compression:
+        output_filename += f'.{compression}'
     print(f"\n결과를 '{output_filename}' 파일에 실시간으로 저장합니다.")
 
     try:
-        with open(output_filename, 'w', encoding='utf-8') as f_out:
+        with open_composition_file(output_filename, 'wt') as f_out:
             with multiprocessing.Pool(processes=num_cores, initializer=init_worker, initargs=(local_champion_data, local_synergy_tiers)) as pool:
                 # --- Chunksize 설정 ---
                 # 작업을 적절한 크기의 묶음으로 보내 통신 오버헤드를 줄입니다.
@@ -185,7 +189,7 @@ def main():
                 raise ValueError
         except ValueError:
             print("오류: 팀 규모는 0보다 큰 정수여야 합니다.")
-            print("사용법: python makeTeam.py [팀 규모]")
+            print("사용법: python makeTeam.py [팀 규모] [gz|zst]")
             return
     else:
         team_size = 8
@@ -193,7 +197,14 @@ def main():
         print("      이 작업은 매우 오래 걸릴 수 있습니다. 다른 숫자를 지정하려면,")
         print("      'python makeTeam.py 6'과 같이 실행하세요.")
 
-    find_fully_activated_teams(champions_data, synergies_data, team_size)
+    # --- 압축 형식 설정 (선택) ---
+    compression = sys.argv[2] if len(sys.argv) > 2 else ''
+    if compression not in ('', 'gz', 'zst'):
+        print("오류: 압축 형식은 gz 또는 zst만 지원합니다.")
+        print("사용법: python makeTeam.py [팀 규모] [gz|zst]")
+        return
+
+    find_fully_activated_teams(champions_data, synergies_data, team_size, compression)
 
 
 # 스크립트가 직접 실행될 때만 아래 코드가 동작하도록 보장합니다.
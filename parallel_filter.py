@@ -0,0 +1,150 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+
+from composition_io import is_compressed, open_composition_file
+
+# 청크 하나의 최소 크기. 너무 잘게 나누면 프로세스 간 통신 비용이 커집니다.
+MIN_CHUNK_BYTES = 4 * 1024 * 1024
+# 코어당 청크 수. 청크 처리 시간이 들쭉날쭉해도 코어가 놀지 않도록 여유 있게 나눕니다.
+CHUNKS_PER_PROCESS = 4
+
+# --------------------------------------------------------------------------
+# 일꾼(Worker) 프로세스 전역 상태
+# --------------------------------------------------------------------------
+
+def init_worker(predicate_arg, annotate_arg):
+    """
+    각 일꾼 프로세스가 생성될 때 한 번만 실행되는 초기화 함수.
+    필터 조건 함수와 추가 필드를 일꾼의 전역 변수로 설정합니다.
+    """
+    global predicate, annotate
+    predicate = predicate_arg
+    annotate = annotate_arg
+
+def split_into_chunks(filepath, num_chunks):
+    """
+    파일을 줄바꿈 위치에 맞춘 바이트 범위 [(start, end), ...]로 나눕니다.
+    각 범위는 완전한 줄만 포함하므로 일꾼이 독립적으로 처리할 수 있습니다.
+    """
+    file_size = os.path.getsize(filepath)
+    if file_size == 0:
+        return []
+
+    chunk_size = max(MIN_CHUNK_BYTES, -(-file_size // max(1, num_chunks)))
+    chunks = []
+    with open(filepath, 'rb') as f:
+        start = 0
+        while start < file_size:
+            end = start + chunk_size
+            if end >= file_size:
+                end = file_size
+            else:
+                # 경계가 줄 중간에 걸리면 다음 줄바꿈까지 밀어냅니다.
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def iter_compressed_chunks(filepath, chunk_bytes):
+    """
+    압축 파일은 바이트 범위로 나눌 수 없으므로, 스트리밍으로 해제하면서
+    약 chunk_bytes 크기의 완전한 줄 묶음을 차례로 만들어 냅니다.
+    """
+    with open_composition_file(filepath, 'rb') as f:
+        while True:
+            lines = f.readlines(chunk_bytes)
+            if not lines:
+                break
+            yield filepath, b''.join(lines)
+
+def filter_chunk(task):
+    """
+    (파일 경로, (start, end)) 범위 또는 (파일 경로, 해제된 바이트)의 줄을 읽어
+    조건을 만족하는 줄만 모아 반환합니다.
+    반환값: (결과 바이트, 읽은 줄 수, 남은 줄 수)
+    """
+    filepath, payload = task
+    if isinstance(payload, bytes):
+        data = payload
+    else:
+        start, end = payload
+        with open(filepath, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+
+    kept = []
+    line_count = 0
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        line_count += 1
+        try:
+            composition = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"Skipping invalid JSON line in {filepath}: {line.decode('utf-8', 'replace').strip()}")
+            continue
+        if not predicate(composition):
+            continue
+        if annotate:
+            composition.update(annotate)
+            kept.append(json.dumps(composition, ensure_ascii=False).encode('utf-8'))
+        else:
+            kept.append(line.strip())
+
+    output = b'\n'.join(kept) + b'\n' if kept else b''
+    return output, line_count, len(kept)
+
+# --------------------------------------------------------------------------
+# 메인 로직 함수
+# --------------------------------------------------------------------------
+
+def parallel_filter_file(input_filepath, outfile, predicate_func, annotate_fields=None, processes=None):
+    """
+    input_filepath를 청크로 나누어 프로세스 풀에서 필터링하고, 원래 순서대로 outfile(바이너리 모드)에 씁니다.
+    압축 파일(.gz, .zst)은 스트리밍으로 해제하면서 청크를 만듭니다. (composition_io.py 참고)
+
+    predicate_func는 파싱된 조합(dict)을 받아 bool을 반환하는 모듈 최상위 함수(또는 pickle 가능한 객체)여야 합니다.
+    annotate_fields가 주어지면 남은 조합에 해당 필드를 추가해 다시 직렬화합니다.
+    반환값: (읽은 줄 수, 남은 줄 수)
+    """
+    num_processes = processes or multiprocessing.cpu_count()
+    if is_compressed(input_filepath):
+        tasks = iter_compressed_chunks(input_filepath, MIN_CHUNK_BYTES)
+    else:
+        chunks = split_into_chunks(input_filepath, num_processes * CHUNKS_PER_PROCESS)
+        num_processes = max(1, min(num_processes, len(chunks)))
+        tasks = ((input_filepath, chunk) for chunk in chunks)
+
+    start_time = time.time()
+    total_lines = 0
+    total_kept = 0
+    chunk_count = 0
+
+    with multiprocessing.Pool(processes=num_processes, initializer=init_worker, initargs=(predicate_func, annotate_fields)) as pool:
+        # 결과를 제출 순서대로 꺼내 쓰므로 출력 순서가 원본과 같게 유지됩니다.
+        # 동시에 처리 중인 청크 수를 제한해 큰 파일에서도 메모리 사용량이 일정합니다.
+        pending = deque()
+        max_pending = num_processes * 2
+        for task in tasks:
+            pending.append(pool.apply_async(filter_chunk, (task,)))
+            chunk_count += 1
+            if len(pending) >= max_pending:
+                total_lines, total_kept = _write_result(pending.popleft().get(), outfile, total_lines, total_kept)
+        while pending:
+            total_lines, total_kept = _write_result(pending.popleft().get(), outfile, total_lines, total_kept)
+
+    elapsed = time.time() - start_time
+    throughput = total_lines / elapsed if elapsed > 0 else 0.0
+    print(f"  {total_lines:,}줄 중 {total_kept:,}줄 통과 "
+          f"({chunk_count}개 청크, {num_processes}개 프로세스, {elapsed:.2f}초, {throughput:,.0f} lines/sec)")
+    return total_lines, total_kept
+
+def _write_result(result, outfile, total_lines, total_kept):
+    output, line_count, kept_count = result
+    outfile.write(output)
+    return total_lines + line_count, total_kept + kept_count
@@ -34,16 +34,15 @@ export async function fetchBulkRecommendationCounts() {
     return new Map(Object.entries(counts));
 }
 
-export async function fetchDeactivationCount(championName) {
-    if (!championName) return 0;
+export async function fetchDeactivationCounts() {
+    if (state.selectedChampions.size === 0) return new Map();
     try {
-        const response = await fetch(`/api/deactivation_recommendation_count/${encodeURIComponent(championName)}?mode=${state.currentRecommendationMode}`);
-        if (!response.ok) return 0;
-        const data = await response.json();
-        return data.count || 0;
+        const response = await fetch(`/api/deactivation_recommendation_counts?mode=${state.currentRecommendationMode}`);
+        if (!response.ok) return new Map();
+        return new Map(Object.entries(await response.json()));
     } catch (error) {
-        console.error(`Error fetching deactivation count for ${championName}:`, error);
-        return 0;
+        console.error('Error fetching deactivation counts:', error);
+        return new Map();
     }
 }
 
@@ -93,18 +93,15 @@ async function updateAll() {
                 }
             }),
             api.fetchSuggestedChampions().then(champs => state.suggestedChampions = champs),
-            api.fetchBulkRecommendationCounts().then(counts => state.recommendationCounts = counts)
-        ];
-
-        if (state.selectedChampions.size > 0) {
-            const deactivationPromises = Array.from(state.selectedChampions).map(async (champion) => {
-                const count = await api.fetchDeactivationCount(champion);
-                if (count > 0) {
-                    state.deactivationCounts.set(champion, count);
+            api.fetchBulkRecommendationCounts().then(counts => state.recommendationCounts = counts),
+            api.fetchDeactivationCounts().then(counts => {
+                for (const [champion, count] of counts) {
+                    if (count > 0) {
+                        state.deactivationCounts.set(champion, count);
+                    }
                 }
-            });
-            dataFetchPromises.push(...deactivationPromises);
-        }
+            })
+        ];
 
         await Promise.all(dataFetchPromises);
 
@@ -0,0 +1,465 @@
+"""
+조합 파일을 SQLite 데이터베이스로 가져오고, 서버의 추천 쿼리를 인덱스를 타는 SQL로 실행하는 모듈.
+
+테이블 구성:
+    datasets           (dataset_id, name, team_count)
+    champions          (champion_id, name, cost)
+    dataset_champions  (dataset_id, champion_id, team_count)      챔피언별 팀 수 (가장 드문 챔피언부터 조인)
+    teams              (dataset_id, team_id, team_key, size, total_cost, synergy_tier_score, champions, synergies)
+    team_champions     (dataset_id, champion_id, team_id)         팀–챔피언 포함 관계
+    team_traits        (dataset_id, trait, level, team_id)        팀–시너지 인원 관계 (기본 키가 (dataset_id, trait, level) 색인)
+
+부분집합 데이터셋(SUBSET_DATASETS: filtered, high_value)은 따로 가져오지 않고, 컬럼 저장소처럼 기준 데이터셋 위의
+명세로 처리합니다. 명세의 시너지 조건은 team_traits로, 챔피언 조건은 team_champions로 SQL 안에서 거릅니다.
+요청의 필터 명세도 같은 방식으로 SQL_SPEC_KEYS만 SQL에서 처리하고 나머지는 서버가 팀 dict로 검사합니다.
+
+team_id는 데이터셋 안에서 1부터 시작하는 줄 번호로, 추천 순서의 동점 처리에만 씁니다.
+API에 돌려주는 id는 챔피언 구성으로 정해지는 team_key(team_store.team_id_of())이므로 컬럼 저장소와 같습니다.
+
+사용법: python team_db.py [데이터베이스 경로]   (기본값: tft_teams.sqlite3)
+서버에서 사용하려면 TFT_TEAM_DB 환경 변수에 데이터베이스 경로를 지정합니다.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from composition_io import open_composition_file, resolve_composition_path
+from filter_spec import load_champion_table
+from team_store import STORE_DATASET_SOURCES, SUBSET_DATASETS, load_synergy_tier_lists, score_trait_counts, team_id_of
+
+DEFAULT_DB_PATH = 'tft_teams.sqlite3'
+INSERT_BATCH_SIZE = 50000
+
+# SQL 안에서 처리하는 필터 명세 키 (시너지: team_traits, 챔피언: team_champions)
+SQL_SPEC_KEYS = ('any_trait_levels', 'required_traits', 'forbidden_traits', 'include_champions', 'exclude_champions')
+
+SCHEMA = """
+CREATE TABLE datasets (
+    dataset_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    team_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE champions (
+    champion_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    cost INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE dataset_champions (
+    dataset_id INTEGER NOT NULL,
+    champion_id INTEGER NOT NULL,
+    team_count INTEGER NOT NULL,
+    PRIMARY KEY (dataset_id, champion_id)
+) WITHOUT ROWID;
+CREATE TABLE teams (
+    dataset_id INTEGER NOT NULL,
+    team_id INTEGER NOT NULL,
+    team_key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    total_cost INTEGER NOT NULL,
+    synergy_tier_score INTEGER NOT NULL,
+    champions TEXT NOT NULL,
+    synergies TEXT NOT NULL,
+    PRIMARY KEY (dataset_id, team_id)
+) WITHOUT ROWID;
+CREATE TABLE team_champions (
+    dataset_id INTEGER NOT NULL,
+    champion_id INTEGER NOT NULL,
+    team_id INTEGER NOT NULL,
+    PRIMARY KEY (dataset_id, champion_id, team_id)
+) WITHOUT ROWID;
+CREATE TABLE team_traits (
+    dataset_id INTEGER NOT NULL,
+    trait TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    team_id INTEGER NOT NULL,
+    PRIMARY KEY (dataset_id, trait, level, team_id)
+) WITHOUT ROWID;
+"""
+
+# 데이터를 모두 넣은 뒤에 만드는 보조 인덱스
+POST_LOAD_INDEXES = """
+CREATE INDEX idx_team_champions_by_team ON team_champions (dataset_id, team_id, champion_id);
+CREATE INDEX idx_teams_by_size ON teams (dataset_id, size, team_id);
+CREATE INDEX idx_teams_by_key ON teams (team_key);
+"""
+
+# --------------------------------------------------------------------------
+# 가져오기 (Importer)
+# --------------------------------------------------------------------------
+
+def import_compositions(db_path=DEFAULT_DB_PATH, dataset_sources=STORE_DATASET_SOURCES):
+    """dataset_sources의 모든 조합 파일을 db_path에 새로 가져옵니다. 기존 파일은 덮어씁니다."""
+    start_time = time.time()
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    champion_table = load_champion_table()
+    synergy_tiers = load_synergy_tier_lists()
+    champion_ids = {name: i for i, name in enumerate(sorted(champion_table))}
+    champion_costs = {name: champ.get('cost', 0) for name, champ in champion_table.items()}
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executescript(SCHEMA)
+    conn.executemany('INSERT INTO champions (champion_id, name, cost) VALUES (?, ?, ?)',
+                     [(i, name, champion_costs[name]) for name, i in champion_ids.items()])
+
+    for dataset_id, (dataset_name, input_files) in enumerate(dataset_sources.items()):
+        team_count = _import_dataset(conn, dataset_id, input_files, champion_ids, champion_costs, synergy_tiers)
+        conn.execute('INSERT INTO datasets (dataset_id, name, team_count) VALUES (?, ?, ?)',
+                     (dataset_id, dataset_name, team_count))
+        print(f"  {dataset_name}: {team_count:,}팀")
+
+    conn.execute("""
+        INSERT INTO dataset_champions (dataset_id, champion_id, team_count)
+        SELECT dataset_id, champion_id, COUNT(*) FROM team_champions GROUP BY dataset_id, champion_id
+    """)
+    conn.executescript(POST_LOAD_INDEXES)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+    os.replace(tmp_path, db_path)
+    print(f"SQLite 가져오기 완료: {db_path} ({time.time() - start_time:.2f}초)")
+
+def _import_dataset(conn, dataset_id, input_files, champion_ids, champion_costs, synergy_tiers):
+    team_rows, champion_rows, trait_rows = [], [], []
+    team_id = 0
+
+    def flush():
+        conn.executemany('INSERT INTO teams VALUES (?, ?, ?, ?, ?, ?, ?, ?)', team_rows)
+        conn.executemany('INSERT INTO team_champions VALUES (?, ?, ?)', champion_rows)
+        conn.executemany('INSERT INTO team_traits VALUES (?, ?, ?, ?)', trait_rows)
+        team_rows.clear()
+        champion_rows.clear()
+        trait_rows.clear()
+
+    for filepath in map(resolve_composition_path, input_files):
+        if not os.path.exists(filepath):
+            print(f"경고: {filepath}을 찾을 수 없습니다. 건너뜁니다.")
+            continue
+        with open_composition_file(filepath, 'rt') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                team_id += 1
+                champions = data['champions']
+                synergies = data.get('synergies', {})
+                tier_score, _ = score_trait_counts(synergies, synergy_tiers)
+
+                team_rows.append((
+                    dataset_id, team_id, team_id_of(champions, champion_ids), len(champions),
+                    sum(champion_costs.get(champ, 0) for champ in champions), tier_score,
+                    json.dumps(champions, ensure_ascii=False), json.dumps(synergies, ensure_ascii=False),
+                ))
+                champion_rows.extend((dataset_id, champion_ids[champ], team_id) for champ in champions)
+                trait_rows.extend((dataset_id, trait, level, team_id) for trait, level in synergies.items())
+
+                if len(team_rows) >= INSERT_BATCH_SIZE:
+                    flush()
+    flush()
+    return team_id
+
+# --------------------------------------------------------------------------
+# 조회 (Query backend)
+# --------------------------------------------------------------------------
+
+def split_sql_spec(spec):
+    """필터 명세를 (SQL_SPEC_KEYS 부분, 나머지)로 나눕니다."""
+    return ({key: value for key, value in spec.items() if key in SQL_SPEC_KEYS},
+            {key: value for key, value in spec.items() if key not in SQL_SPEC_KEYS})
+
+class TeamDatabase:
+    """
+    서버의 추천 쿼리를 SQLite로 실행합니다.
+    kind는 'all_inclusive'(선택 챔피언 모두 포함, ID 순) 또는 'overlap'(겹치는 수 내림차순, 크기 오름차순, ID 순)입니다.
+    스레드마다 별도 연결을 사용하므로 Flask의 threaded 모드에서 안전합니다.
+    """
+
+    def __init__(self, db_path, subset_datasets=SUBSET_DATASETS):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        self.db_path = db_path
+        self.subset_datasets = subset_datasets
+        self._subset_specs = {}
+        self._local = threading.local()
+        conn = self._connection()
+        self.dataset_ids = {name: dataset_id for dataset_id, name in conn.execute('SELECT dataset_id, name FROM datasets')}
+        self.champion_ids = {name: champion_id for champion_id, name in conn.execute('SELECT champion_id, name FROM champions')}
+        if 'team_key' not in {row[1] for row in conn.execute('PRAGMA table_info(teams)')}:
+            raise ValueError("team_key 컬럼이 없는 이전 형식의 데이터베이스입니다. team_db.py로 다시 가져오세요.")
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'team_traits'").fetchone():
+            raise ValueError("team_traits 테이블이 없는 이전 형식의 데이터베이스입니다. team_db.py로 다시 가져오세요.")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def team_count(self, dataset_name):
+        scope = self._scope(dataset_name)
+        if scope is None:
+            return 0
+        dataset_id, conditions, params = scope
+        if not conditions:
+            row = self._connection().execute('SELECT team_count FROM datasets WHERE dataset_id = ?', (dataset_id,)).fetchone()
+            return row[0] if row else 0
+        return self._connection().execute(
+            f'SELECT COUNT(*) FROM teams WHERE dataset_id = ?{conditions}', [dataset_id, *params]).fetchone()[0]
+
+    def _dataset_specs(self, dataset_name):
+        """(데이터가 있는 dataset_id, 명세 리스트). 부분집합 데이터셋은 기준 데이터셋과 부분집합 명세입니다. 없으면 (None, [])."""
+        if dataset_name in self.dataset_ids:
+            return self.dataset_ids[dataset_name], []
+        if dataset_name in self.subset_datasets:
+            base_name, spec_factory = self.subset_datasets[dataset_name]
+            if base_name in self.dataset_ids:
+                if dataset_name not in self._subset_specs:
+                    self._subset_specs[dataset_name] = spec_factory()
+                return self.dataset_ids[base_name], [self._subset_specs[dataset_name]]
+        return None, []
+
+    def _scope(self, dataset_name, spec=None, team_column='team_id'):
+        """
+        데이터셋(과 요청 명세)의 (dataset_id, ' AND ...' 형태의 조건 SQL, 파라미터). 조건은 team_column에 대한 것입니다.
+        알 수 없는 데이터셋이거나 결과가 비어 있음이 확실하면 None.
+        """
+        dataset_id, specs = self._dataset_specs(dataset_name)
+        if dataset_id is None:
+            return None
+        conditions, params = [], []
+        for condition_spec in specs + ([spec] if spec else []):
+            spec_conditions = self._spec_conditions(dataset_id, condition_spec, team_column)
+            if spec_conditions is None:
+                return None
+            conditions.extend(spec_conditions[0])
+            params.extend(spec_conditions[1])
+        return dataset_id, ''.join(f' AND {condition}' for condition in conditions), params
+
+    def _spec_conditions(self, dataset_id, spec, team_column):
+        """
+        명세의 SQL_SPEC_KEYS 조건을 team_column에 대한 (조건 SQL 리스트, 파라미터)로 만듭니다.
+        시너지 조건은 team_traits의 (dataset_id, trait, level) 색인으로, 챔피언 조건은 team_champions로 팀 id를 고릅니다.
+        사전에 없는 챔피언을 포함해야 하면 결과가 비어 있으므로 None.
+        """
+        conditions, params = [], []
+        any_trait_levels = [(trait, levels if isinstance(levels, list) else [levels])
+                            for trait, levels in spec.get('any_trait_levels', {}).items()]
+        if any_trait_levels:
+            selects = ' UNION ALL '.join(
+                f"SELECT team_id FROM team_traits WHERE dataset_id = ? AND trait = ? AND level IN ({', '.join('?' * len(levels))})"
+                for _, levels in any_trait_levels)
+            conditions.append(f'{team_column} IN ({selects})')
+            params.extend(itertools.chain.from_iterable((dataset_id, trait, *levels) for trait, levels in any_trait_levels))
+        for trait, level in spec.get('required_traits', {}).items():
+            conditions.append(f'{team_column} IN (SELECT team_id FROM team_traits WHERE dataset_id = ? AND trait = ? AND level >= ?)')
+            params.extend((dataset_id, trait, level))
+        for trait, level in spec.get('forbidden_traits', {}).items():
+            conditions.append(f'{team_column} NOT IN (SELECT team_id FROM team_traits WHERE dataset_id = ? AND trait = ? AND level >= ?)')
+            params.extend((dataset_id, trait, level))
+        for name in spec.get('include_champions', []):
+            if name not in self.champion_ids:
+                return None
+            conditions.append(f'{team_column} IN (SELECT team_id FROM team_champions WHERE dataset_id = ? AND champion_id = ?)')
+            params.extend((dataset_id, self.champion_ids[name]))
+        excluded_ids = [self.champion_ids[name] for name in spec.get('exclude_champions', []) if name in self.champion_ids]
+        if excluded_ids:
+            conditions.append(f"{team_column} NOT IN (SELECT team_id FROM team_champions "
+                              f"WHERE dataset_id = ? AND champion_id IN ({', '.join('?' * len(excluded_ids))}))")
+            params.extend((dataset_id, *excluded_ids))
+        return conditions, params
+
+    def _candidate_sql(self, dataset_name, kind, selected_champions, spec=None):
+        """
+        추천 팀 id를 추천 순서대로 돌려주는 (SQL, 파라미터)를 만듭니다. 결과가 비어 있음이 확실하면 None.
+        spec은 SQL_SPEC_KEYS만 담은 요청의 필터 명세입니다. (split_sql_spec() 참고)
+        """
+        if not selected_champions:
+            return None
+
+        # SQLite에는 LSH 색인이 없으므로 'similar'도 정확한 겹치는 수 순서로 처리합니다.
+        # 'score'의 후보도 같으며, 종합 점수 정렬은 서버가 합니다.
+        if kind in ('overlap', 'similar', 'score'):
+            champion_ids = [self.champion_ids[name] for name in selected_champions if name in self.champion_ids]
+            if not champion_ids:
+                return None
+            scope = self._scope(dataset_name, spec, 'r.team_id')
+            if scope is None:
+                return None
+            dataset_id, conditions, condition_params = scope
+            placeholders = ', '.join('?' * len(champion_ids))
+            sql = f"""
+                SELECT r.team_id FROM (
+                    SELECT team_id, COUNT(*) AS overlap FROM team_champions
+                    WHERE dataset_id = ? AND champion_id IN ({placeholders})
+                    GROUP BY team_id
+                ) AS r
+                JOIN teams t ON t.dataset_id = ? AND t.team_id = r.team_id
+                WHERE 1{conditions}
+                ORDER BY r.overlap DESC, t.size, r.team_id
+            """
+            return sql, [dataset_id, *champion_ids, dataset_id, *condition_params]
+
+        # all_inclusive: 가장 드문 챔피언의 팀 목록을 기준으로 나머지 챔피언을 기본 키로 조인합니다.
+        if any(name not in self.champion_ids for name in selected_champions):
+            return None
+        scope = self._scope(dataset_name, spec, 'c0.team_id')
+        if scope is None:
+            return None
+        dataset_id, conditions, condition_params = scope
+        champion_ids = self._order_by_rarity(dataset_id, [self.champion_ids[name] for name in selected_champions])
+        if champion_ids is None:
+            return None
+        joins = ''.join(
+            f" JOIN team_champions c{i} ON c{i}.dataset_id = c0.dataset_id"
+            f" AND c{i}.champion_id = ? AND c{i}.team_id = c0.team_id"
+            for i in range(1, len(champion_ids))
+        )
+        sql = (f"SELECT c0.team_id FROM team_champions c0{joins} WHERE c0.dataset_id = ? AND c0.champion_id = ?{conditions} "
+               f"ORDER BY c0.team_id")
+        return sql, [*champion_ids[1:], dataset_id, champion_ids[0], *condition_params]
+
+    def _order_by_rarity(self, dataset_id, champion_ids):
+        placeholders = ', '.join('?' * len(champion_ids))
+        counts = dict(self._connection().execute(
+            f'SELECT champion_id, team_count FROM dataset_champions WHERE dataset_id = ? AND champion_id IN ({placeholders})',
+            [dataset_id, *champion_ids]))
+        if len(counts) < len(set(champion_ids)):
+            return None  # 어떤 팀에도 없는 챔피언이 있으면 결과가 없습니다.
+        return sorted(set(champion_ids), key=lambda champion_id: counts[champion_id])
+
+    def count(self, dataset_name, kind, selected_champions):
+        query = self._candidate_sql(dataset_name, kind, selected_champions)
+        if query is None:
+            return 0
+        sql, params = query
+        return self._connection().execute(f'SELECT COUNT(*) FROM ({sql})', params).fetchone()[0]
+
+    def page(self, dataset_name, kind, selected_champions, offset, limit):
+        """추천 순서대로 offset부터 limit개의 팀 dict를 반환합니다. LIMIT/OFFSET은 SQL에서 처리됩니다."""
+        query = self._candidate_sql(dataset_name, kind, selected_champions)
+        if query is None:
+            return []
+        sql, params = query
+        team_ids = [row[0] for row in self._connection().execute(f'{sql} LIMIT ? OFFSET ?', [*params, limit, offset])]
+        return self.team_records(dataset_name, team_ids)
+
+    def iter_records(self, dataset_name, kind, selected_champions, spec=None, batch_size=500):
+        """추천 순서대로 팀 dict를 하나씩 돌려줍니다. (필터를 적용하며 페이지를 채울 때 사용) spec은 _candidate_sql()과 같습니다."""
+        query = self._candidate_sql(dataset_name, kind, selected_champions, spec)
+        if query is None:
+            return
+        sql, params = query
+        cursor = self._connection().execute(sql, params)
+        while True:
+            team_ids = [row[0] for row in cursor.fetchmany(batch_size)]
+            if not team_ids:
+                break
+            yield from self.team_records(dataset_name, team_ids)
+
+    def champion_names(self, dataset_name, kind, selected_champions):
+        """추천 팀들에 한 번이라도 포함된 챔피언 이름 리스트."""
+        query = self._candidate_sql(dataset_name, kind, selected_champions)
+        if query is None:
+            return []
+        sql, params = query
+        rows = self._connection().execute(f"""
+            SELECT DISTINCT ch.name FROM ({sql}) AS r
+            JOIN team_champions tc ON tc.dataset_id = ? AND tc.team_id = r.team_id
+            JOIN champions ch ON ch.champion_id = tc.champion_id
+        """, [*params, self._dataset_specs(dataset_name)[0]])
+        return [row[0] for row in rows]
+
+    def champion_counts(self, dataset_name, selected_champions):
+        """'모두 포함' 추천 팀들에서 챔피언별로 포함된 팀 수 {챔피언: 팀 수}. 선택이 비었으면 데이터셋 전체 기준입니다."""
+        scope = self._scope(dataset_name, team_column='tc.team_id')
+        if scope is None:
+            return {}
+        dataset_id, conditions, condition_params = scope
+        if not selected_champions and conditions:
+            rows = self._connection().execute(f"""
+                SELECT ch.name, COUNT(*) FROM team_champions tc
+                JOIN champions ch ON ch.champion_id = tc.champion_id
+                WHERE tc.dataset_id = ?{conditions}
+                GROUP BY tc.champion_id
+            """, [dataset_id, *condition_params])
+            return dict(rows)
+        if not selected_champions:
+            rows = self._connection().execute("""
+                SELECT ch.name, dc.team_count FROM dataset_champions dc
+                JOIN champions ch ON ch.champion_id = dc.champion_id
+                WHERE dc.dataset_id = ?
+            """, (dataset_id,))
+            return dict(rows)
+        query = self._candidate_sql(dataset_name, 'all_inclusive', selected_champions)
+        if query is None:
+            return {}
+        sql, params = query
+        rows = self._connection().execute(f"""
+            SELECT ch.name, COUNT(*) FROM ({sql}) AS r
+            JOIN team_champions tc ON tc.dataset_id = ? AND tc.team_id = r.team_id
+            JOIN champions ch ON ch.champion_id = tc.champion_id
+            GROUP BY tc.champion_id
+        """, [*params, dataset_id])
+        return dict(rows)
+
+    def team_records(self, dataset_name, team_ids):
+        """team_ids 순서대로 프론트엔드에 보낼 팀 dict 리스트를 반환합니다."""
+        if not team_ids:
+            return []
+        placeholders = ', '.join('?' * len(team_ids))
+        rows = self._connection().execute(
+            f'SELECT team_id, team_key, champions, synergies FROM teams WHERE dataset_id = ? AND team_id IN ({placeholders})',
+            [self._dataset_specs(dataset_name)[0], *team_ids])
+        records = {}
+        for team_id, team_key, champions, synergies in rows:
+            records[team_id] = {
+                'id': team_key,
+                'champions': json.loads(champions),
+                'synergies': [f"{name} ({count})" for name, count in json.loads(synergies).items()],
+            }
+        return [records[team_id] for team_id in team_ids]
+
+    def find_team(self, team_key):
+        """팀 ID(team_key)의 (팀 dict, 그 팀을 포함한 데이터셋 이름 리스트). 없으면 (None, [])."""
+        rows = self._connection().execute(
+            'SELECT dataset_id, team_id FROM teams WHERE team_key = ? ORDER BY dataset_id', [team_key]).fetchall()
+        if not rows:
+            return None, []
+        dataset_names = {dataset_id: name for name, dataset_id in self.dataset_ids.items()}
+        team_ids = dict(rows)
+        datasets = {dataset_names[dataset_id] for dataset_id in team_ids}
+        # 부분집합 데이터셋은 기준 데이터셋의 그 팀이 부분집합 명세를 만족하는지 SQL로 확인합니다.
+        for subset_name in self.subset_datasets:
+            scope = None if subset_name in self.dataset_ids else self._scope(subset_name)
+            if scope is None or scope[0] not in team_ids:
+                continue
+            dataset_id, conditions, params = scope
+            if self._connection().execute(f'SELECT 1 FROM teams WHERE dataset_id = ? AND team_id = ?{conditions}',
+                                          [dataset_id, team_ids[dataset_id], *params]).fetchone():
+                datasets.add(subset_name)
+        return self.team_records(dataset_names[rows[0][0]], [rows[0][1]])[0], sorted(datasets)
+
+def open_team_db(db_path):
+    """데이터베이스를 읽기 전용으로 엽니다. 실패하면 None을 반환합니다."""
+    try:
+        return TeamDatabase(db_path)
+    except Exception as e:
+        print(f"SQLite 데이터베이스 로드 오류({db_path}): {e}")
+        return None
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH
+    import_compositions(db_path)
+
+if __name__ == '__main__':
+    main()
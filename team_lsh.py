@@ -0,0 +1,89 @@
+"""
+팀 챔피언 구성에 대한 MinHash 서명과 LSH(banding) 색인.
+
+서명: 챔피언 사전 순서를 섞은 순열 K개마다, 팀에 포함된 챔피언 중 순열 순위가 가장 앞선 값.
+      두 챔피언 집합의 서명 값이 같을 확률은 두 집합의 Jaccard 유사도와 같습니다.
+색인: 서명을 rows_per_band개씩 묶은 band마다 (band 키 오름차순, 팀 번호) 배열을 만들어 두고,
+      질의 서명과 band 키가 하나라도 같은 팀만 후보로 꺼냅니다.
+
+질의 시간은 후보 수에 비례하므로 데이터셋 전체를 훑지 않습니다.
+사용하는 band 수(bands)가 많을수록 재현율이 높아지고 후보도 늘어납니다.
+"""
+import numpy as np
+
+# 서명 길이 = LSH_BANDS * LSH_ROWS_PER_BAND
+LSH_BANDS = 20
+LSH_ROWS_PER_BAND = 2
+LSH_SEED = 15
+
+def minhash_permutations(num_champions, num_hashes, seed=LSH_SEED):
+    """(K, C) 배열. permutations[k]는 챔피언을 순열 k의 순위 순으로 나열한 챔피언 번호입니다."""
+    rng = np.random.default_rng(seed)
+    return np.stack([rng.permutation(num_champions) for _ in range(num_hashes)]).astype(np.int64)
+
+def minhash_signatures(membership, permutations):
+    """
+    (N, C) 0/1 행렬의 각 팀에 대해 (N, K) uint8 서명을 계산합니다.
+    서명 값은 순열에서 처음으로 팀에 포함된 챔피언의 순위입니다. 빈 팀은 C가 됩니다.
+    """
+    num_champions = membership.shape[1]
+    signatures = np.empty((len(membership), len(permutations)), dtype=np.uint8)
+    for k, order in enumerate(permutations):
+        permuted = membership[:, order]
+        first = permuted.argmax(axis=1)
+        signatures[:, k] = np.where(permuted[np.arange(len(membership)), first] == 1, first, num_champions)
+    return signatures
+
+def band_keys(signatures, rows_per_band=LSH_ROWS_PER_BAND):
+    """(N, B*R) 서명을 band별 uint64 키 (B, N)로 묶습니다. (서명 값 하나당 8비트)"""
+    num_bands = signatures.shape[1] // rows_per_band
+    keys = np.zeros((num_bands, len(signatures)), dtype=np.uint64)
+    for band in range(num_bands):
+        for j in range(rows_per_band):
+            keys[band] |= signatures[:, band * rows_per_band + j].astype(np.uint64) << np.uint64(8 * j)
+    return keys
+
+def build_lsh_index(membership, team_rows, bands=LSH_BANDS, rows_per_band=LSH_ROWS_PER_BAND, seed=LSH_SEED):
+    """
+    team_rows(팀 번호)와 그 팀들의 (N, C) 0/1 행렬로 LSH 색인을 만듭니다.
+    반환값: (lsh_keys (B, N) uint64, lsh_rows (B, N) uint32) — band마다 키 오름차순으로 정렬된 배열
+    """
+    permutations = minhash_permutations(membership.shape[1], bands * rows_per_band, seed)
+    keys = band_keys(minhash_signatures(membership, permutations), rows_per_band)
+    order = np.argsort(keys, axis=1, kind='stable')
+    lsh_keys = np.take_along_axis(keys, order, axis=1)
+    lsh_rows = np.asarray(team_rows, dtype=np.uint32)[order]
+    return lsh_keys, lsh_rows
+
+class LSHIndex:
+    """build_lsh_index()로 만든 (메모리 매핑된) 배열 위의 질의 객체."""
+
+    def __init__(self, lsh_keys, lsh_rows, num_champions, rows_per_band=LSH_ROWS_PER_BAND, seed=LSH_SEED):
+        self.lsh_keys = lsh_keys
+        self.lsh_rows = lsh_rows
+        self.num_bands = lsh_keys.shape[0]
+        self.num_champions = num_champions
+        self.rows_per_band = rows_per_band
+        self.permutations = minhash_permutations(num_champions, self.num_bands * rows_per_band, seed)
+
+    def candidates(self, champion_indices, bands=None):
+        """
+        챔피언 번호 집합과 band 키가 하나라도 같은 팀 번호를 오름차순으로 반환합니다.
+        bands로 사용할 band 수를 줄이면 후보와 재현율이 함께 줄어듭니다. (기본: 전체)
+        """
+        if not champion_indices:
+            return np.zeros(0, dtype=np.int64)
+        membership = np.zeros((1, self.num_champions), dtype=np.uint8)
+        membership[0, list(champion_indices)] = 1
+        query_keys = band_keys(minhash_signatures(membership, self.permutations), self.rows_per_band)[:, 0]
+
+        found = []
+        for band in range(min(bands or self.num_bands, self.num_bands)):
+            keys = self.lsh_keys[band]
+            lo = np.searchsorted(keys, query_keys[band], side='left')
+            hi = np.searchsorted(keys, query_keys[band], side='right')
+            if hi > lo:
+                found.append(self.lsh_rows[band, lo:hi])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found)).astype(np.int64)
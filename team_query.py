@@ -0,0 +1,286 @@
+"""
+팀 저장소(team_store.py) 위의 복합 검색과 간단한 비용 기반 실행 계획.
+
+검색 조건은 필터 명세(filter_spec.py 형식)로 표현합니다. 실행기는 조건을 세 종류로 나눕니다.
+    역색인 조건  include_champions, required_traits, any_trait_levels  (팀을 줄이는 조건)
+    제외 조건    exclude_champions, forbidden_traits
+    컬럼 조건    min/max_size, min/max_total_cost, max_champion_cost
+
+역색인 조건은 예상 팀 수(챔피언: 동시 출현 표의 대각선, 시너지: (시너지, 단계) 비트셋의 popcount)가
+작은 것부터 적용합니다. 남은 팀이 비트셋 word 수보다 적어질 것으로 예상되면 비트셋 연산을 멈추고,
+남은 팀 번호에 대해서만 컬럼 값을 직접 검사합니다. 컬럼 조건은 항상 마지막에 남은 팀에만 적용합니다.
+"""
+import numpy as np
+
+from filter_spec import check_spec
+from team_store import RankedRows, bitset_rows, rows_in_bitset
+
+# 정렬 키: 'id' | 'overlap' | 팀 컬럼 이름. 컬럼은 앞에 '-'를 붙이면 내림차순입니다.
+SORT_COLUMNS = ('size', 'total_cost', 'synergy_tier_score', 'almost_complete', 'gold_traits', 'prism_traits', 'highest_tier')
+
+def rank_by_overlap(arena, rows, champion_names):
+    """rows를 champion_names와 겹치는 수 내림차순, 팀 크기 오름차순, ID 오름차순으로 꺼내는 RankedRows를 반환합니다."""
+    # 겹치는 수와 팀 크기는 작은 정수이므로 (겹치는 수, 크기) 버킷으로 세어 두고, 필요한 페이지만 꺼냅니다.
+    overlap_counts = arena.overlap_counts(rows, champion_names)
+    team_sizes = arena.size[rows].astype(np.int64)
+    keys = (len(champion_names) - overlap_counts.astype(np.int64)) * 256 + team_sizes
+    return RankedRows(rows, keys)
+
+class _Step:
+    """실행 계획의 한 단계. 비트셋으로도, 남은 팀 번호에 대한 직접 검사로도 적용할 수 있습니다."""
+
+    def __init__(self, label, estimate, bits, row_test, negate=False):
+        self.label = label
+        self.estimate = estimate
+        self.bits = bits          # () -> 비트셋
+        self.row_test = row_test  # (rows) -> bool 배열
+        self.negate = negate
+
+def _view_share(view, arena_count):
+    """아레나 전체의 팀 수를 뷰 크기 비율로 줄인 예상치. (시너지 비트셋은 아레나 전체에 대한 것입니다)"""
+    return min(view.rows.size, arena_count * view.rows.size // max(1, len(view.arena)))
+
+def _champion_step(view, name, negate):
+    arena = view.arena
+    i = arena.champion_index.get(name)
+    if i is None:
+        raise ValueError(f"알 수 없는 챔피언: {name}")
+    word, bit = i >> 6, np.uint64(1 << (i & 63))
+    return _Step(f"챔피언 {name}", int(view.pair_counts[i, i]), lambda: view.posting_bits[i],
+                 lambda rows: (arena.champion_mask[rows, word] & bit) != 0, negate)
+
+def _trait_step(view, trait, level, negate):
+    arena = view.arena
+    t = arena.trait_index.get(trait)
+    if t is None:
+        # 사전에 없는 시너지는 어떤 팀도 만족하지 않습니다.
+        return _Step(f"시너지 {trait}>={level}", 0, view.empty_bits,
+                     lambda rows: np.zeros(len(rows), dtype=bool), negate)
+    return _Step(f"시너지 {trait}>={level}", _view_share(view, arena.trait_level_count(trait, level)),
+                 lambda: arena.trait_bits(trait, level),
+                 lambda rows: arena.trait_counts[rows, t] >= level, negate)
+
+def _any_trait_levels_step(view, any_trait_levels):
+    arena = view.arena
+    pairs = []
+    for trait, levels in any_trait_levels.items():
+        for level in (levels if isinstance(levels, list) else [levels]):
+            if trait in arena.trait_index:
+                pairs.append((trait, level))
+    estimate = _view_share(view, sum(arena.trait_level_count(trait, level) - arena.trait_level_count(trait, level + 1)
+                                     for trait, level in pairs))
+
+    def bits():
+        result = view.empty_bits()
+        for trait, level in pairs:
+            result |= arena.trait_bits(trait, level, level)
+        return result
+
+    def row_test(rows):
+        passed = np.zeros(len(rows), dtype=bool)
+        for trait, level in pairs:
+            passed |= arena.trait_counts[rows, arena.trait_index[trait]] == level
+        return passed
+
+    return _Step(f"시너지 단계 중 하나 ({len(pairs)}개)", estimate, bits, row_test)
+
+def _column_tests(arena, spec):
+    """(설명, rows -> bool 배열) 리스트."""
+    tests = []
+    for column, low_key, high_key in (('size', 'min_size', 'max_size'), ('total_cost', 'min_total_cost', 'max_total_cost'),
+                                      ('gold_traits', 'min_gold_traits', None), ('prism_traits', 'min_prism_traits', None)):
+        low, high = spec.get(low_key), spec.get(high_key) if high_key else None
+        if low is not None:
+            tests.append((f"{column}>={low}", lambda rows, c=column, v=low: getattr(arena, c)[rows] >= v))
+        if high is not None:
+            tests.append((f"{column}<={high}", lambda rows, c=column, v=high: getattr(arena, c)[rows] <= v))
+    if spec.get('max_champion_cost') is not None:
+        expensive = arena.champion_mask_of([name for name, cost in arena.champion_costs.items() if cost > spec['max_champion_cost']])
+        tests.append((f"챔피언 코스트<={spec['max_champion_cost']}",
+                      lambda rows: ~(arena.champion_mask[rows] & expensive).any(axis=1)))
+    return tests
+
+def plan_query(view, spec):
+    """
+    명세를 (역색인 단계 리스트, 컬럼 검사 리스트)로 나눕니다. 역색인 단계는 실행 순서대로 정렬됩니다.
+    형식이 잘못된 명세이면 ValueError를 발생시킵니다. (filter_spec.check_spec())
+    """
+    check_spec(spec)
+
+    positive = [_champion_step(view, name, False) for name in spec.get('include_champions', [])]
+    positive += [_trait_step(view, trait, level, False) for trait, level in spec.get('required_traits', {}).items()]
+    if spec.get('any_trait_levels'):
+        positive.append(_any_trait_levels_step(view, spec['any_trait_levels']))
+    negative = [_champion_step(view, name, True) for name in spec.get('exclude_champions', [])]
+    negative += [_trait_step(view, trait, level, True) for trait, level in spec.get('forbidden_traits', {}).items()]
+
+    # 가장 드문 조건부터 적용하고, 제외 조건은 (대개 거의 줄이지 않으므로) 그 뒤에 적용합니다.
+    positive.sort(key=lambda step: step.estimate)
+    negative.sort(key=lambda step: -step.estimate)
+    return positive + negative, _column_tests(view.arena, spec)
+
+def execute_query(view, spec):
+    """
+    명세를 만족하는 뷰 팀의 번호를 ID 오름차순 배열로 반환합니다.
+    반환값: (팀 번호 배열, 실행 계획 설명 리스트)
+    """
+    steps, column_tests = plan_query(view, spec)
+    total = max(1, view.rows.size)
+    num_words = view.arena.num_words
+    explain = []
+
+    bits = view.member_bits()
+    estimate = total
+    rows = None
+    for step in steps:
+        if rows is None and estimate > num_words:
+            step_bits = step.bits()
+            bits = np.bitwise_and(bits, ~step_bits if step.negate else step_bits)
+            explain.append(f"bitset {'ANDNOT' if step.negate else 'AND'} {step.label} (~{step.estimate:,})")
+        else:
+            if rows is None:
+                rows = bitset_rows(bits)
+            passed = step.row_test(rows)
+            rows = rows[~passed if step.negate else passed]
+            explain.append(f"rows {'NOT ' if step.negate else ''}{step.label} ({len(rows):,})")
+        selectivity = (total - step.estimate) / total if step.negate else step.estimate / total
+        estimate = int(estimate * selectivity)
+
+    if rows is None:
+        rows = bitset_rows(bits)
+    for label, test in column_tests:
+        rows = rows[test(rows)]
+        explain.append(f"rows {label} ({len(rows):,})")
+    return rows, explain
+
+def page_in_order(order, bits, position, limit, skip=0, chunk_size=4096):
+    """
+    정렬 순열 order를 position부터 훑으며 비트셋에 속한 팀을 skip개 건너뛴 뒤 limit개 꺼냅니다.
+    순열 전체를 정렬하거나 결과 전체를 만들지 않으므로, 비용은 (건너뛴 팀 + 페이지)를 찾을 때까지 훑은 길이에 비례합니다.
+    반환값: (팀 번호 리스트, 다음 페이지를 시작할 순열 위치 — 끝까지 훑었으면 None)
+    """
+    found = []
+    while position < len(order) and len(found) < limit:
+        chunk = np.asarray(order[position:position + chunk_size], dtype=np.int64)
+        hits = np.flatnonzero(rows_in_bitset(chunk, bits))
+        if skip:
+            skipped = min(skip, hits.size)
+            hits = hits[skipped:]
+            skip -= skipped
+        hits = hits[:limit - len(found)]
+        found.extend(chunk[hits].tolist())
+        position = position + int(hits[-1]) + 1 if len(found) == limit else position + chunk.size
+    return found, (position if position < len(order) else None)
+
+def page_in_bitset(bits, position, limit, skip=0, chunk_words=1024):
+    """page_in_order()의 아레나 번호 순('id') 판. 비트셋을 position 비트부터 word 묶음 단위로 훑습니다."""
+    found = []
+    num_bits = len(bits) * 64
+    while position < num_bits and len(found) < limit:
+        word = position >> 6
+        hits = bitset_rows(bits[word:word + chunk_words]) + word * 64
+        hits = hits[hits >= position]
+        if skip:
+            skipped = min(skip, hits.size)
+            hits = hits[skipped:]
+            skip -= skipped
+        hits = hits[:limit - len(found)]
+        found.extend(hits.tolist())
+        position = int(hits[-1]) + 1 if len(found) == limit else (word + chunk_words) * 64
+    return found, (position if position < num_bits else None)
+
+def sort_rows(arena, rows, sort='id', overlap_champions=()):
+    """
+    팀 번호 배열을 정렬 키에 따라 정렬합니다. 'overlap'은 RankedRows(전체 정렬 없음), 나머지는 리스트를 반환합니다.
+    동점은 ID 오름차순입니다.
+    """
+    if sort == 'id':
+        return rows.tolist()
+    if sort == 'overlap':
+        if not overlap_champions:
+            raise ValueError("overlap 정렬에는 overlap_champions가 필요합니다.")
+        return rank_by_overlap(arena, rows, set(overlap_champions))
+    column = sort.lstrip('-')
+    if column not in SORT_COLUMNS:
+        raise ValueError(f"알 수 없는 정렬 키: {sort}")
+    values = getattr(arena, column)[rows].astype(np.int64)
+    return rows[np.lexsort((rows, -values if sort.startswith('-') else values))].tolist()
+
+def exclude_rows(ranked, excluded_bits):
+    """
+    추천 결과(팀 번호 리스트 또는 RankedRows)에서 excluded_bits에 속한 팀을 뺍니다. 순서는 유지합니다.
+    RankedRows는 버킷 키를 그대로 두고 다시 세므로 전체 정렬을 하지 않습니다.
+    """
+    if isinstance(ranked, RankedRows):
+        keep = ~rows_in_bitset(ranked.members, excluded_bits)
+        return RankedRows(ranked.members[keep], ranked.keys[keep])
+    rows = np.asarray(ranked, dtype=np.int64)
+    return rows[~rows_in_bitset(rows, excluded_bits)].tolist()
+
+def penalty_scores(arena, rows, penalties):
+    """rows의 각 팀이 포함한 챔피언의 벌점 합 배열. penalties: {챔피언: 벌점}"""
+    scores = np.zeros(len(rows), dtype=np.float64)
+    for name, weight in penalties.items():
+        bit = arena.champion_bit(name)
+        if bit is not None:
+            scores += weight * ((arena.champion_mask[rows, bit[0]] & bit[1]) != 0)
+    return scores
+
+def rank_with_penalties(arena, ranked, penalties):
+    """
+    추천 결과(팀 번호 오름차순 리스트 또는 RankedRows)를 벌점 합 오름차순으로 다시 묶은 RankedRows를 반환합니다.
+    같은 벌점 안에서는 원래 순서를 유지합니다. 벌점 합의 종류는 적으므로 (벌점 순위, 원래 키)를 버킷 키로 씁니다.
+    """
+    if isinstance(ranked, RankedRows):
+        rows, keys = ranked.members, ranked.keys.astype(np.int64)
+    else:
+        rows = np.asarray(ranked, dtype=np.int64)
+        keys = np.zeros(rows.size, dtype=np.int64)
+    if not rows.size:
+        return ranked
+    _, penalty_ranks = np.unique(penalty_scores(arena, rows, penalties), return_inverse=True)
+    _, combined_keys = np.unique(penalty_ranks * (int(keys.max()) + 1) + keys, return_inverse=True)
+    return RankedRows(rows, combined_keys.reshape(-1))
+
+# 종합 점수 요소. 가중치는 요청마다 바꿀 수 있습니다. (tft_team_builder.calculate_comprehensive_score와 같은 계산)
+SCORE_COMPONENTS = ('overlap', 'synergy_tier', 'cost', 'almost_complete', 'findability')
+
+def score_rows(arena, rows, selected_champions, weights, level_probabilities, synergy_scores=None):
+    """
+    rows의 각 팀 종합 점수를 한 번에 계산합니다. 팀마다 dict를 만들지 않고 아레나 컬럼만 사용합니다.
+        overlap          선택 챔피언과 겹치는 수 (비트마스크 AND + popcount)
+        synergy_tier     활성화된 시너지 단계 합 (synergy_tier_score 컬럼)
+        cost             챔피언 코스트 합 (total_cost 컬럼)
+        almost_complete  다음 단계까지 1명 남은 시너지 수 (almost_complete 컬럼)
+        findability      선택하지 않은 팀 챔피언의 코스트별 등장 확률 합 (코스트별 마스크 popcount × 확률)
+    weights: {요소: 가중치}, level_probabilities: {'코스트': 확률} (플레이어 레벨의 리롤 확률, 없으면 빈 dict)
+    synergy_scores: 컬럼 대신 쓸 (시너지 단계 합, '완성 직전' 수) 배열 쌍 (예: 상징을 더해 다시 계산한 값)
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if synergy_scores is None:
+        synergy_scores = (arena.synergy_tier_score[rows], arena.almost_complete[rows])
+    tier_scores, almost_complete = synergy_scores
+    masks = arena.champion_mask[rows]
+    selected_mask = arena.champion_mask_of(selected_champions)
+    scores = weights['overlap'] * np.bitwise_count(masks & selected_mask).sum(axis=1, dtype=np.int64)
+    scores = scores + weights['synergy_tier'] * np.asarray(tier_scores, dtype=np.float64)
+    scores += weights['cost'] * arena.total_cost[rows].astype(np.float64)
+    scores += weights['almost_complete'] * np.asarray(almost_complete, dtype=np.float64)
+
+    findability = np.zeros(rows.size, dtype=np.float64)
+    for cost, probability in level_probabilities.items():
+        if not probability:
+            continue
+        cost_mask = arena.champion_mask_of([name for name, champ_cost in arena.champion_costs.items()
+                                            if str(champ_cost) == cost and name not in selected_champions])
+        findability += probability * np.bitwise_count(masks & cost_mask).sum(axis=1, dtype=np.int64)
+    scores += weights['findability'] * findability
+    return scores
+
+def rank_by_score(arena, rows, scores):
+    """rows를 점수 내림차순, 팀 ID 오름차순으로 정렬한 팀 번호 배열. (점수는 소수 6자리에서 반올림해 비교)"""
+    rows = np.asarray(rows, dtype=np.int64)
+    masks = arena.champion_mask[rows]
+    # 팀 ID는 상위 word부터 쓴 비트마스크이므로, 하위 word → 상위 word 순으로 넘기면 ID 순 비교가 됩니다.
+    order = np.lexsort((*(masks[:, w] for w in range(masks.shape[1])), -np.round(scores, 6)))
+    return rows[order]
@@ -0,0 +1,1218 @@
+"""
+조합(JSONL) 파일을 고정 폭 컬럼 배열로 저장하고 메모리 매핑으로 여는 팀 저장소 모듈.
+
+모든 데이터셋은 하나의 팀 아레나(arena)를 공유합니다. 같은 챔피언 구성의 팀은 아레나에 한 번만 저장되고,
+각 데이터셋은 아레나 번호의 목록(뷰)으로만 표현되므로 데이터셋이 겹쳐도 팀 컬럼은 중복되지 않습니다.
+
+저장소 디렉터리 구성:
+    header.json                 버전, 데이터셋 목록, 모든 원본 파일 정보 (빌드 완료 표시)
+    arena/header.json           팀 수, 챔피언/시너지 사전, 컬럼 정보
+    arena/champion_mask.npy     (N, W) uint64   챔피언 비트마스크 (챔피언 i → 비트 i)
+    arena/trait_counts.npy      (N, T) uint8    시너지별 인원 수
+    arena/size.npy              (N,)   uint8    팀 인원
+    arena/total_cost.npy        (N,)   uint16   챔피언 코스트 합
+    arena/synergy_tier_score.npy (N,)  uint16   활성화된 시너지 단계 합 (calculate_comprehensive_score 기준)
+    arena/almost_complete.npy   (N,)   uint8    다음 단계까지 1명 남은 시너지 수
+    arena/gold_traits.npy       (N,)   uint8    synergy_level.json의 골드 단계인 시너지 수
+    arena/prism_traits.npy      (N,)   uint8    synergy_level.json의 프리즘 단계인 시너지 수
+    arena/highest_tier.npy      (N,)   uint8    가장 높은 synergy_level.json 등급 (0: 없음, 1: 실버, 2: 골드, 3: 프리즘)
+    arena/trait_level_bits.npy  (T, L, B) uint64  시너지 t가 l+1명 이상인 팀 비트셋 ((시너지, 단계) 역색인)
+    arena/champion_order.npy    (N, S) uint8    원본 파일의 챔피언 순서 (챔피언 번호, 빈 칸은 ORDER_PAD)
+    arena/trait_order.npy       (N, K) uint8    원본 파일의 시너지 순서 (시너지 번호, 빈 칸은 ORDER_PAD)
+    views/<데이터셋>/rows.npy    (M,)   uint32   데이터셋 파일의 줄 순서대로 나열한 아레나 번호
+    views/<데이터셋>/posting_bits.npy (C, B) uint64  챔피언별 팀 비트셋 (아레나 번호 r → word r // 64의 비트 r % 64)
+    views/<데이터셋>/pair_counts.npy  (C, C) uint32  챔피언 i, j를 함께 포함한 팀 수 (대각선은 챔피언별 팀 수)
+    views/<데이터셋>/triple_counts.npy (C, C, C) uint32  챔피언 i, j, k를 함께 포함한 팀 수
+    views/<데이터셋>/lsh_keys.npy, lsh_rows.npy (B, N)   MinHash LSH 색인 (LSH_DATASETS만, team_lsh.py 참고)
+    views/<데이터셋>/order_<키>.npy (U,) uint32  SORT_ORDERS의 정렬 키 순서로 나열한 뷰의 아레나 번호 (정렬 순열)
+    subsets/<데이터셋>/bits.npy  (B,)   uint64   부분집합 데이터셋의 아레나 멤버십 비트맵 (팀당 1비트)
+
+서버는 이 파일들을 메모리 매핑만 하고 파싱이나 인덱스 빌드를 하지 않으므로, 시작 시간이 팀 수와 무관합니다.
+저장소는 오프라인 명령(아래 사용법)으로만 빌드하며, 서버는 원본 조합 파일 없이 저장소만 배포해도 header.json의 버전을 믿고 엽니다.
+여러 챔피언을 모두 포함하는 팀은 비트셋의 word 단위 AND로, 팀 수는 popcount로 구하므로
+결과는 항상 아레나 번호 순이며 질의 시간은 팀 수/64에 비례합니다.
+챔피언 3명 이하 조합의 팀 수는 동시 출현 표에서 바로 읽습니다.
+필요한 팀만 decode하여 JSON으로 변환하므로 메모리 사용량도 팀 수에 비례해 늘지 않습니다.
+
+SUBSET_DATASETS의 데이터셋(filtered, high_value)은 기준 데이터셋의 부분집합이므로 별도의 뷰와 역색인을 만들지 않고,
+필터 단계(test.py, filter_synergies.py)가 save_subset()으로 저장한 멤버십 비트맵만 가집니다.
+서버는 처음 사용할 때 기준 뷰의 역색인을 비트맵과 AND하여 메모리에서 뷰를 만듭니다.
+비트맵이 없거나 아레나가 다시 빌드되어 맞지 않으면 명세로 다시 계산합니다.
+
+사용법:
+    python team_store.py [<저장소 디렉터리>]    DATASET_SOURCES의 모든 데이터셋을 아레나 + 뷰로 빌드 (기본: team_store/)
+"""
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from composition_io import open_composition_file, resolve_composition_path
+from filter_spec import check_spec, load_champion_table, load_synergy_levels, spec_from_target_synergies
+from team_lsh import LSH_BANDS, LSH_ROWS_PER_BAND, LSH_SEED, LSHIndex, build_lsh_index
+from trait_tiers import TraitTierTable
+
+STORE_VERSION = 11
+TEAM_STORE_DIR = 'team_store'
+ARENA_DIR = 'arena'
+VIEWS_DIR = 'views'
+SUBSETS_DIR = 'subsets'
+HEADER_FILE = 'header.json'
+SYNERGY_COUNTS_FILE = 'synergy_counts.json'
+
+# --- 데이터셋별 원본 파일 ---
+# 서버(tft_team_builder.py)와 SQLite 가져오기(team_db.py)가 같은 목록을 사용합니다.
+DATASET_SOURCES = {
+    'size_6': ['filtered_ai_team_compositions.jsonl'],
+    'size_8': ['ai_team_compositions_size_8.jsonl'],
+    'filtered': ['filtered_compositions_all.jsonl'],
+    'all_ai': [
+        "ai_team_compositions_size_6.jsonl",
+        "ai_team_compositions_size_7.jsonl",
+        "ai_team_compositions_size_8.jsonl",
+        "ai_team_compositions_size_9.jsonl"
+    ],
+    'high_value': ['filtered_compositions_by_synergy.jsonl'],
+}
+# 기준 데이터셋의 부분집합으로, 저장소에는 멤버십 비트맵만 저장하는 데이터셋.
+# {이름: (기준 데이터셋, 명세를 반환하는 함수)} — 명세는 비트맵이 없거나 오래되었을 때 다시 계산하는 데 씁니다.
+def target_synergy_spec(synergy_counts_file=SYNERGY_COUNTS_FILE):
+    """test.py, filter_synergies.py와 같은 명세: targetSynergy로 지정된 (시너지, 인원) 중 하나를 달성한 팀."""
+    with open(synergy_counts_file, 'r', encoding='utf-8') as f:
+        return spec_from_target_synergies(json.load(f))
+
+SUBSET_DATASETS = {
+    'filtered': ('all_ai', target_synergy_spec),
+    'high_value': ('all_ai', target_synergy_spec),
+}
+# 저장소에 뷰로 빌드하는 데이터셋
+STORE_DATASET_SOURCES = {name: files for name, files in DATASET_SOURCES.items() if name not in SUBSET_DATASETS}
+
+# 아레나의 기준 파일. 다른 데이터셋은 대부분 이 파일들의 부분집합이므로 먼저 읽어 번호 순서를 정합니다.
+ARENA_SOURCES = DATASET_SOURCES['all_ai']
+
+COLUMN_DTYPES = {
+    'champion_mask': np.uint64,
+    'trait_counts': np.uint8,
+    'size': np.uint8,
+    'total_cost': np.uint16,
+    'synergy_tier_score': np.uint16,
+    'almost_complete': np.uint8,
+    'gold_traits': np.uint8,
+    'prism_traits': np.uint8,
+    'highest_tier': np.uint8,
+}
+# 팀 컬럼이 아닌 아레나 인덱스 배열 (메모리 매핑 대상)
+ARENA_ARRAYS = ('trait_level_bits', 'champion_order', 'trait_order')
+# champion_order, trait_order의 빈 칸 값 (챔피언/시너지 번호는 이보다 작아야 합니다)
+ORDER_PAD = 255
+# 뷰마다 미리 계산해 두는 정렬 순열의 키 (팀 컬럼 이름, 앞에 '-'면 내림차순, 동점은 아레나 번호 순)
+# 아레나 번호 순('id')은 비트셋 자체가 그 순서이므로 따로 저장하지 않습니다.
+SORT_ORDERS = ('size', '-size', 'total_cost', '-total_cost', '-synergy_tier_score', '-almost_complete',
+               '-gold_traits', '-prism_traits', '-highest_tier')
+
+def sort_order_array_name(sort_key):
+    """정렬 키의 뷰 배열 이름 (예: '-total_cost' → 'order_desc_total_cost')."""
+    return f"order_desc_{sort_key[1:]}" if sort_key.startswith('-') else f"order_{sort_key}"
+
+# 데이터셋 뷰의 배열 (메모리 매핑 대상)
+VIEW_ARRAYS = ('rows', 'posting_bits', 'pair_counts', 'triple_counts', *map(sort_order_array_name, SORT_ORDERS))
+# 유사 팀 검색용 MinHash LSH 색인을 만들 데이터셋 (겹치는 수 기반 추천에 쓰는 데이터셋)
+LSH_DATASETS = ('size_8',)
+LSH_ARRAYS = ('lsh_keys', 'lsh_rows')
+# 동시 출현 표로 팀 수를 바로 구할 수 있는 최대 챔피언 수
+MAX_TABLE_CHAMPIONS = 3
+# 선택별 후보 비트셋 캐시의 최대 항목 수 (항목 하나는 아레나 팀 수/8 바이트)
+SELECTION_CACHE_SIZE = 512
+# 동시 출현 표 계산 시 한 번에 곱하는 팀 수. float32 행렬곱이 정확한 범위(2^24) 안에 둡니다.
+CO_OCCURRENCE_CHUNK = 1 << 20
+
+def load_synergy_tier_lists(filepath=SYNERGY_COUNTS_FILE):
+    """synergy_counts.json을 {시너지: 오름차순 활성화 단계 리스트}로 로드합니다."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        synergy_data = json.load(f)
+    tiers = {}
+    for item in synergy_data:
+        tiers.setdefault(item['synergy_name'], []).append(item['count'])
+    return {name: sorted(levels) for name, levels in tiers.items()}
+
+def score_trait_counts(trait_counts, synergy_tiers):
+    """
+    {시너지: 인원}에 대해 (활성화된 단계 합, '완성 직전' 시너지 수)를 계산합니다.
+    tft_team_builder.calculate_comprehensive_score의 시너지 점수 계산과 같은 규칙입니다.
+    """
+    tier_score = 0
+    almost_complete = 0
+    for trait, count in trait_counts.items():
+        tiers = synergy_tiers.get(trait)
+        if not tiers:
+            continue
+        current = 0
+        for level in tiers:
+            if count >= level:
+                current = level
+            else:
+                if count + 1 == level:
+                    almost_complete += 1
+                break
+        tier_score += current
+    return tier_score, almost_complete
+
+def _source_info(filepath):
+    filepath = resolve_composition_path(filepath)
+    if not os.path.exists(filepath):
+        return {'path': filepath, 'exists': False}
+    stat = os.stat(filepath)
+    return {'path': filepath, 'exists': True, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def _all_source_files(dataset_sources, arena_sources):
+    """아레나 원본과 데이터셋 원본을 중복 없이 순서대로 나열합니다."""
+    files = list(arena_sources)
+    for input_files in dataset_sources.values():
+        files.extend(filepath for filepath in input_files if filepath not in files)
+    return files
+
+def _iter_compositions(filepath):
+    """(챔피언 리스트, 시너지 dict)를 파일 순서대로 만들어 냅니다. 압축 파일은 스트리밍으로 해제하며 읽습니다."""
+    with open_composition_file(filepath, 'rt') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            yield data['champions'], data.get('synergies', {})
+
+def bitset_rows(bits):
+    """비트셋(uint64 word 배열)에서 켜진 비트의 번호를 오름차순 int64 배열로 반환합니다."""
+    return np.flatnonzero(np.unpackbits(np.ascontiguousarray(bits).view(np.uint8), bitorder='little'))
+
+def bitset_count(bits):
+    """비트셋에서 켜진 비트 수 (popcount)."""
+    return int(np.bitwise_count(bits).sum())
+
+def bitset_contains(bits, row):
+    """비트셋에서 row 번 비트가 켜져 있는지 여부."""
+    return bool((int(bits[row >> 6]) >> (row & 63)) & 1)
+
+def flags_to_bitset(flags, num_words):
+    """길이 N 이하의 bool/0-1 배열을 (num_words,) uint64 비트셋으로 변환합니다."""
+    padded = np.zeros(num_words * 64, dtype=np.uint8)
+    padded[:len(flags)] = flags
+    return np.packbits(padded, bitorder='little').view(np.uint64)
+
+def rows_in_bitset(rows, bits):
+    """rows 중 비트셋에 속한 팀만 순서를 유지해 남기는 bool 배열."""
+    rows = np.asarray(rows, dtype=np.int64)
+    return ((bits[rows >> 6] >> (rows & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+def rows_to_bitset(rows, num_words):
+    """팀 번호 배열을 (num_words,) uint64 비트셋으로 변환합니다."""
+    padded = np.zeros(num_words * 64, dtype=np.uint8)
+    padded[rows] = 1
+    return np.packbits(padded, bitorder='little').view(np.uint64)
+
+def team_id_from_mask(mask_words):
+    """
+    챔피언 비트마스크(uint64 word 배열, 챔피언 이름 순 비트)를 팀 ID 문자열로 변환합니다.
+    ID는 상위 word부터 16자리 16진수를 이어 붙인 값으로, 챔피언 구성만으로 정해지므로
+    파일, 데이터셋, 모드, 백엔드가 달라도 같은 팀은 같은 ID입니다.
+    """
+    return ''.join(f'{int(word):016x}' for word in reversed(list(mask_words)))
+
+def team_id_of(champion_names, champion_index):
+    """챔피언 이름 목록의 팀 ID. champion_index는 {챔피언 이름: 이름 순 번호}입니다."""
+    mask = 0
+    for name in champion_names:
+        mask |= 1 << champion_index[name]
+    num_words = (len(champion_index) + 63) // 64
+    return team_id_from_mask((mask >> (64 * i)) & ((1 << 64) - 1) for i in range(num_words))
+
+def _write_header(directory, header):
+    # header.json을 마지막에 교체하여, 빌드 도중 중단되어도 반쯤 쓰인 저장소를 열지 않게 합니다.
+    header_path = os.path.join(directory, HEADER_FILE)
+    with open(header_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+    os.replace(header_path + '.tmp', header_path)
+
+def _pad_rows(flat, lengths):
+    """길이가 다른 행들을 이어 붙인 uint8 배열을 (행 수, 최대 길이) 배열로 펼칩니다. 빈 칸은 ORDER_PAD입니다."""
+    lengths = np.array(lengths, dtype=np.int64)
+    width = int(lengths.max()) if lengths.size else 0
+    padded = np.full((lengths.size, width), ORDER_PAD, dtype=np.uint8)
+    padded[np.arange(width) < lengths[:, None]] = np.frombuffer(flat, dtype=np.uint8)
+    return padded
+
+class _ColumnBuilder:
+    """아레나 컬럼을 누적하는 빌더. 같은 챔피언 구성의 팀은 한 번만 저장하고 기존 번호를 돌려줍니다."""
+
+    def __init__(self, champion_table, synergy_tiers, synergy_levels):
+        self.synergy_tiers = synergy_tiers
+        self.synergy_levels = synergy_levels
+        self.champions = sorted(champion_table)
+        self.champion_index = {name: i for i, name in enumerate(self.champions)}
+        self.traits = sorted({trait for champ in champion_table.values() for trait in champ.get('traits', [])} | set(synergy_tiers))
+        self.trait_index = {name: i for i, name in enumerate(self.traits)}
+        self.champion_costs = {name: champ.get('cost', 0) for name, champ in champion_table.items()}
+        if max(len(self.champions), len(self.traits)) >= ORDER_PAD:
+            raise ValueError(f"챔피언/시너지가 {ORDER_PAD}개 이상이면 순서 배열(uint8)에 담을 수 없습니다.")
+        self.num_words = max(1, (len(self.champions) + 63) // 64)
+        self.columns = {name: array('Q' if name == 'champion_mask' else 'H') for name in COLUMN_DTYPES}
+        self.row_of_mask = {}
+        # 응답에 원본 파일과 같은 순서로 챔피언/시너지를 보여 주기 위해, 처음 본 줄의 순서를 번호로 남깁니다.
+        self.champion_order = array('B')
+        self.trait_order = array('B')
+        self.trait_order_lengths = array('B')
+
+    def __len__(self):
+        return len(self.row_of_mask)
+
+    def add(self, team_champions, synergies, filepath):
+        """팀의 아레나 번호를 반환합니다. 처음 보는 팀이면 컬럼 끝에 추가합니다."""
+        mask = 0
+        for champ in team_champions:
+            mask |= 1 << self.champion_index[champ]
+        row = self.row_of_mask.get(mask)
+        if row is not None:
+            return row
+
+        for word_index in range(self.num_words):
+            self.columns['champion_mask'].append((mask >> (word_index << 6)) & 0xFFFFFFFFFFFFFFFF)
+
+        counts = [0] * len(self.traits)
+        for trait, count in synergies.items():
+            if trait not in self.trait_index:
+                raise ValueError(f"{filepath}: 챔피언 데이터에 없는 시너지입니다 - {trait}")
+            counts[self.trait_index[trait]] = count
+        self.columns['trait_counts'].extend(counts)
+        self.champion_order.extend(self.champion_index[champ] for champ in team_champions)
+        self.trait_order.extend(self.trait_index[trait] for trait in synergies)
+        self.trait_order_lengths.append(len(synergies))
+
+        self.columns['size'].append(len(team_champions))
+        self.columns['total_cost'].append(sum(self.champion_costs.get(champ, 0) for champ in team_champions))
+
+        row = len(self.row_of_mask)
+        self.row_of_mask[mask] = row
+        return row
+
+    def save(self, arena_dir, sources):
+        team_count = len(self)
+        # 시너지 점수/등급 컬럼은 팀마다 단계 목록을 순회하지 않고, 모든 팀의 시너지별 인원에 단계 조회 표를 한 번에 적용합니다.
+        trait_counts = np.frombuffer(self.columns['trait_counts'], dtype=np.uint16).reshape(team_count, len(self.traits))
+        tier_table = TraitTierTable(self.synergy_tiers, {}, self.traits, self.synergy_levels)
+        tier_score, almost_complete = tier_table.score_counts(trait_counts)
+        gold_traits, prism_traits, highest_tier = tier_table.tier_summary(trait_counts)
+        for name, values in (('synergy_tier_score', tier_score), ('almost_complete', almost_complete),
+                             ('gold_traits', gold_traits), ('prism_traits', prism_traits), ('highest_tier', highest_tier)):
+            self.columns[name] = array('H', values.astype(np.uint16).tobytes())
+        os.makedirs(arena_dir, exist_ok=True)
+        header = {
+            'version': STORE_VERSION,
+            'team_count': team_count,
+            'champions': self.champions,
+            'traits': self.traits,
+            'champion_costs': [self.champion_costs.get(name, 0) for name in self.champions],
+            'sources': sources,
+            'columns': {},
+        }
+        for name, dtype in COLUMN_DTYPES.items():
+            values = np.frombuffer(self.columns[name], dtype=np.uint64 if name == 'champion_mask' else np.uint16)
+            if name == 'champion_mask':
+                values = values.reshape(team_count, self.num_words)
+            elif name == 'trait_counts':
+                values = values.reshape(team_count, len(self.traits))
+            values = values.astype(dtype)
+            np.save(os.path.join(arena_dir, f'{name}.npy'), values)
+            header['columns'][name] = {'dtype': np.dtype(dtype).name, 'shape': list(values.shape)}
+
+        # (시너지, 단계) → 팀 비트셋. 단계 l은 'l명 이상'이며, 정확히 l명은 두 비트셋의 차로 구합니다.
+        max_level = int(trait_counts.max()) if trait_counts.size else 0
+        num_words = (team_count + 63) // 64
+        trait_level_bits = np.zeros((len(self.traits), max_level, num_words), dtype=np.uint64)
+        for t in range(len(self.traits)):
+            for level in range(1, max_level + 1):
+                trait_level_bits[t, level - 1] = flags_to_bitset(trait_counts[:, t] >= level, num_words)
+        np.save(os.path.join(arena_dir, 'trait_level_bits.npy'), trait_level_bits)
+        np.save(os.path.join(arena_dir, 'champion_order.npy'), _pad_rows(self.champion_order, self.columns['size']))
+        np.save(os.path.join(arena_dir, 'trait_order.npy'), _pad_rows(self.trait_order, self.trait_order_lengths))
+        header['built_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        _write_header(arena_dir, header)
+        return np.frombuffer(self.columns['champion_mask'], dtype=np.uint64).reshape(team_count, self.num_words)
+
+def _co_occurrence_counts(membership):
+    """(N, C) 0/1 행렬에서 두 챔피언을 함께 포함한 팀 수 (C, C)를 구합니다."""
+    counts = np.zeros((membership.shape[1], membership.shape[1]), dtype=np.int64)
+    for start in range(0, len(membership), CO_OCCURRENCE_CHUNK):
+        chunk = membership[start:start + CO_OCCURRENCE_CHUNK].astype(np.float32)
+        counts += np.rint(chunk.T @ chunk).astype(np.int64)
+    return counts
+
+def _view_tables(view_masks, num_champions):
+    """뷰 팀들의 (N, W) 비트마스크로 (N, C) 0/1 행렬과 챔피언 2명/3명 동시 출현 표를 계산합니다."""
+    # 2명은 M^T M, 3명은 챔피언 i를 포함한 팀들만으로 같은 계산을 반복합니다.
+    membership = np.unpackbits(np.ascontiguousarray(view_masks).view(np.uint8), axis=1, bitorder='little')[:, :num_champions]
+    pair_counts = _co_occurrence_counts(membership)
+    triple_counts = np.zeros((num_champions, num_champions, num_champions), dtype=np.int64)
+    for i in range(num_champions):
+        triple_counts[i] = _co_occurrence_counts(membership[membership[:, i] == 1])
+    return membership, pair_counts.astype(np.uint32), triple_counts.astype(np.uint32)
+
+def _sort_orders(team_rows, columns):
+    """team_rows(오름차순)를 SORT_ORDERS의 키마다 정렬한 {배열 이름: uint32 순열}. 동점은 아레나 번호 순입니다."""
+    orders = {}
+    for sort_key in SORT_ORDERS:
+        values = np.asarray(columns[sort_key.lstrip('-')][team_rows], dtype=np.int64)
+        order = np.argsort(-values if sort_key.startswith('-') else values, kind='stable')
+        orders[sort_order_array_name(sort_key)] = team_rows[order].astype(np.uint32)
+    return orders
+
+def _save_view(view_dir, view_rows, champion_mask, num_champions, sources, sort_columns, with_lsh=False):
+    """데이터셋 뷰(아레나 번호 목록 + 챔피언별 팀 비트셋 + 동시 출현 표 + 정렬 순열, 선택적으로 LSH 색인)를 저장합니다."""
+    os.makedirs(view_dir, exist_ok=True)
+    rows = np.frombuffer(view_rows, dtype=np.uint32)
+    team_rows = np.unique(rows)
+    num_words = (len(champion_mask) + 63) // 64
+
+    # 챔피언 → 팀 비트셋 (역색인). 행은 아레나 전체 길이이며, 뷰에 없는 팀의 비트는 꺼져 있습니다.
+    view_masks = champion_mask[team_rows]
+    posting_bits = np.zeros((num_champions, num_words), dtype=np.uint64)
+    posting_count = 0
+    for i in range(num_champions):
+        champion_rows = team_rows[np.flatnonzero(view_masks[:, i >> 6] & np.uint64(1 << (i & 63)))]
+        posting_bits[i] = rows_to_bitset(champion_rows, num_words)
+        posting_count += len(champion_rows)
+
+    # 챔피언 동시 출현 표
+    membership, pair_counts, triple_counts = _view_tables(view_masks, num_champions)
+
+    np.save(os.path.join(view_dir, 'rows.npy'), rows)
+    np.save(os.path.join(view_dir, 'posting_bits.npy'), posting_bits)
+    np.save(os.path.join(view_dir, 'pair_counts.npy'), pair_counts)
+    np.save(os.path.join(view_dir, 'triple_counts.npy'), triple_counts)
+    for name, order in _sort_orders(team_rows, sort_columns).items():
+        np.save(os.path.join(view_dir, f'{name}.npy'), order)
+    header = {
+        'version': STORE_VERSION,
+        'team_count': int(rows.size),
+        'unique_team_count': int(team_rows.size),
+        'posting_count': posting_count,
+        'sources': sources,
+    }
+    if with_lsh:
+        lsh_keys, lsh_rows = build_lsh_index(membership, team_rows)
+        np.save(os.path.join(view_dir, 'lsh_keys.npy'), lsh_keys)
+        np.save(os.path.join(view_dir, 'lsh_rows.npy'), lsh_rows)
+        header['lsh'] = {'bands': LSH_BANDS, 'rows_per_band': LSH_ROWS_PER_BAND, 'seed': LSH_SEED}
+    header['built_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    _write_header(view_dir, header)
+
+def build_team_arena(store_root=TEAM_STORE_DIR, dataset_sources=STORE_DATASET_SOURCES, arena_sources=ARENA_SOURCES,
+                     champion_table=None, synergy_tiers=None, synergy_levels=None):
+    """
+    arena_sources의 팀으로 아레나를 만들고, 각 데이터셋을 아레나 번호의 뷰로 저장합니다.
+    데이터셋 파일에만 있는 팀은 아레나 끝에 추가됩니다.
+    파일이 없으면 같은 이름의 압축 파일(.gz, .zst)을 찾고, 그것도 없으면 경고 후 건너뜁니다. 반환값: 아레나 팀 수
+    원본이 하나도 없으면 빈 저장소로 기존 저장소를 덮어쓰지 않도록 FileNotFoundError를 발생시킵니다.
+    """
+    source_files = _all_source_files(dataset_sources, arena_sources)
+    if not any(os.path.exists(resolve_composition_path(filepath)) for filepath in source_files):
+        raise FileNotFoundError(f"원본 조합 파일이 하나도 없어 {store_root}을 빌드하지 않습니다. ({', '.join(source_files)})")
+    champion_table = champion_table if champion_table is not None else load_champion_table()
+    synergy_tiers = synergy_tiers if synergy_tiers is not None else load_synergy_tier_lists()
+    synergy_levels = synergy_levels if synergy_levels is not None else load_synergy_levels()
+    builder = _ColumnBuilder(champion_table, synergy_tiers, synergy_levels)
+    start_time = time.time()
+
+    # 같은 파일을 여러 데이터셋이 공유하므로 파일별 아레나 번호 목록을 한 번만 계산합니다.
+    file_rows = {}
+    for filepath in _all_source_files(dataset_sources, arena_sources):
+        resolved = resolve_composition_path(filepath)
+        if not os.path.exists(resolved):
+            print(f"경고: {resolved}을 찾을 수 없습니다. 건너뜁니다.")
+            file_rows[filepath] = array('I')
+            continue
+        file_rows[filepath] = array('I', (builder.add(champs, synergies, resolved) for champs, synergies in _iter_compositions(resolved)))
+
+    # 루트 header.json은 마지막에 쓰므로, 빌드 도중 중단되면 다음 실행에서 다시 빌드합니다.
+    root_header_path = os.path.join(store_root, HEADER_FILE)
+    if os.path.exists(root_header_path):
+        os.remove(root_header_path)
+
+    all_sources = [_source_info(filepath) for filepath in _all_source_files(dataset_sources, arena_sources)]
+    champion_mask = builder.save(os.path.join(store_root, ARENA_DIR), all_sources)
+    sort_columns = {name: np.load(os.path.join(store_root, ARENA_DIR, f'{name}.npy'), mmap_mode='r')
+                    for name in {sort_key.lstrip('-') for sort_key in SORT_ORDERS}}
+    line_count = 0
+    for dataset_name, input_files in dataset_sources.items():
+        view_rows = array('I')
+        for filepath in input_files:
+            view_rows.extend(file_rows[filepath])
+        line_count += len(view_rows)
+        _save_view(os.path.join(store_root, VIEWS_DIR, dataset_name), view_rows, champion_mask,
+                   len(builder.champions), [_source_info(filepath) for filepath in input_files],
+                   sort_columns, with_lsh=dataset_name in LSH_DATASETS)
+
+    _write_header(store_root, {
+        'version': STORE_VERSION,
+        'datasets': sorted(dataset_sources),
+        'lsh_datasets': sorted(LSH_DATASETS),
+        'sources': all_sources,
+        'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    print(f"팀 아레나 빌드 완료: {store_root} (데이터셋 {len(dataset_sources)}개, 데이터셋 팀 합계 {line_count:,} → "
+          f"아레나 {len(builder):,}팀, {time.time() - start_time:.2f}초)")
+    return len(builder)
+
+def read_store_header(store_root, dataset_sources=STORE_DATASET_SOURCES):
+    """빌드가 끝난 저장소의 루트 header.json. 없거나 버전/데이터셋 구성이 현재 코드와 다르면 None."""
+    header_path = os.path.join(store_root, HEADER_FILE)
+    if not os.path.exists(header_path):
+        return None
+    with open(header_path, 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get('version') != STORE_VERSION or header.get('datasets') != sorted(dataset_sources):
+        return None
+    if header.get('lsh_datasets') != sorted(LSH_DATASETS):
+        return None
+    return header
+
+def is_arena_current(store_root, dataset_sources=STORE_DATASET_SOURCES, arena_sources=ARENA_SOURCES):
+    """
+    아레나와 모든 뷰가 있고 원본 파일이 그 이후로 바뀌지 않았으면 True를 반환합니다.
+    디스크에 없는 원본(저장소만 배포한 경우)은 비교하지 않고 저장소의 기록을 믿습니다.
+    """
+    header = read_store_header(store_root, dataset_sources)
+    if header is None:
+        return False
+    recorded = header.get('sources', [])
+    current = [_source_info(filepath) for filepath in _all_source_files(dataset_sources, arena_sources)]
+    if len(recorded) != len(current):
+        return False
+    return all(not info['exists'] or info == recorded_info for info, recorded_info in zip(current, recorded))
+
+def _load_arrays(directory, names, header):
+    mmap_mode = 'r' if header['team_count'] else None
+    return {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in names}
+
+class TeamArena:
+    """
+    모든 데이터셋이 공유하는 메모리 매핑된 컬럼 저장소.
+    팀 번호(row)는 0부터 시작하며, 같은 챔피언 구성의 팀은 데이터셋이 달라도 같은 번호를 가집니다.
+    """
+
+    def __init__(self, arena_dir):
+        with open(os.path.join(arena_dir, HEADER_FILE), 'r', encoding='utf-8') as f:
+            self.header = json.load(f)
+        self.arena_dir = arena_dir
+        self.team_count = self.header['team_count']
+        self.champions = self.header['champions']
+        self.traits = self.header['traits']
+        self.champion_index = {name: i for i, name in enumerate(self.champions)}
+        self.trait_index = {name: i for i, name in enumerate(self.traits)}
+        self.champion_costs = dict(zip(self.champions, self.header['champion_costs']))
+        for name, values in _load_arrays(arena_dir, (*COLUMN_DTYPES, *ARENA_ARRAYS), self.header).items():
+            setattr(self, name, values)
+        self.num_words = (self.team_count + 63) // 64
+        self._trait_level_counts = None
+        self._mask_order = None
+
+    def __len__(self):
+        return self.team_count
+
+    def champion_bit(self, champion_name):
+        """챔피언의 (word 번호, 비트값)을 반환합니다. 사전에 없으면 None."""
+        i = self.champion_index.get(champion_name)
+        if i is None:
+            return None
+        return i >> 6, np.uint64(1 << (i & 63))
+
+    def mapped_bytes(self):
+        """메모리 매핑된 컬럼과 인덱스의 전체 크기(바이트)."""
+        return sum(getattr(self, name).nbytes for name in (*COLUMN_DTYPES, *ARENA_ARRAYS))
+
+    def trait_bits(self, trait, min_level=1, max_level=None):
+        """
+        시너지 인원이 min_level 이상(max_level이 있으면 이하까지)인 팀의 비트셋.
+        사전에 없는 시너지이면 None. 반환된 배열은 새로 만든 것이므로 수정해도 됩니다.
+        """
+        t = self.trait_index.get(trait)
+        if t is None:
+            return None
+        num_levels = self.trait_level_bits.shape[1]
+        if min_level <= 0:
+            bits = flags_to_bitset(np.ones(self.team_count, dtype=np.uint8), self.num_words)
+        elif min_level > num_levels:
+            return np.zeros(self.num_words, dtype=np.uint64)
+        else:
+            bits = self.trait_level_bits[t, min_level - 1].copy()
+        if max_level is not None and max_level < num_levels:
+            bits &= ~self.trait_level_bits[t, max(max_level, 0)]
+        return bits
+
+    def trait_level_count(self, trait, min_level):
+        """시너지 인원이 min_level 이상인 팀 수. 사전에 없는 시너지이면 0. (실행 계획의 예상 팀 수로 사용)"""
+        if self._trait_level_counts is None:
+            self._trait_level_counts = np.bitwise_count(self.trait_level_bits).sum(axis=2, dtype=np.int64)
+        t = self.trait_index.get(trait)
+        if t is None:
+            return 0
+        if min_level <= 0:
+            return self.team_count
+        if min_level > self._trait_level_counts.shape[1]:
+            return 0
+        return int(self._trait_level_counts[t, min_level - 1])
+
+    def column_bits(self, column, min_value=None, max_value=None):
+        """팀 컬럼(size, total_cost 등)이 [min_value, max_value] 범위인 팀의 비트셋."""
+        values = getattr(self, column)
+        flags = np.ones(self.team_count, dtype=bool)
+        if min_value is not None:
+            flags &= values >= min_value
+        if max_value is not None:
+            flags &= values <= max_value
+        return flags_to_bitset(flags, self.num_words)
+
+    def champion_mask_of(self, champion_names):
+        """챔피언 이름 목록을 저장소와 같은 형식의 (W,) uint64 비트마스크로 변환합니다. 사전에 없는 이름은 무시합니다."""
+        mask = np.zeros(self.champion_mask.shape[1], dtype=np.uint64)
+        for name in champion_names:
+            bit = self.champion_bit(name)
+            if bit is not None:
+                mask[bit[0]] |= bit[1]
+        return mask
+
+    def overlap_counts(self, rows, champion_names):
+        """rows의 각 팀이 champion_names 중 몇 명을 포함하는지 배열로 반환합니다."""
+        selected_mask = self.champion_mask_of(champion_names)
+        return np.bitwise_count(self.champion_mask[rows] & selected_mask).sum(axis=1)
+
+    def champions_in_rows(self, rows):
+        """rows의 팀들에 한 번이라도 포함된 챔피언 이름 리스트."""
+        if len(rows) == 0:
+            return []
+        union = np.bitwise_or.reduce(self.champion_mask[rows], axis=0)
+        return self._decode_mask(union)
+
+    def champion_counts(self, rows, chunk_size=65536):
+        """rows의 팀 중 각 챔피언을 포함한 팀 수를 (C,) int64 배열로 반환합니다. (챔피언 사전 순서)"""
+        counts = np.zeros(self.champion_mask.shape[1] * 64, dtype=np.int64)
+        for start in range(0, len(rows), chunk_size):
+            masks = np.ascontiguousarray(self.champion_mask[rows[start:start + chunk_size]])
+            counts += np.unpackbits(masks.view(np.uint8), axis=1, bitorder='little').sum(axis=0, dtype=np.int64)
+        return counts[:len(self.champions)]
+
+    def _decode_mask(self, mask_words):
+        names = []
+        for word_index, word in enumerate(mask_words.tolist()):
+            while word:
+                low_bit = word & -word
+                names.append(self.champions[(word_index << 6) + low_bit.bit_length() - 1])
+                word ^= low_bit
+        return names
+
+    def champions_of(self, row):
+        """팀의 챔피언 이름 리스트 (이름 순)."""
+        return self._decode_mask(self.champion_mask[row])
+
+    def synergies_of(self, row):
+        """팀의 {시너지: 인원} (0명인 시너지는 제외)."""
+        counts = self.trait_counts[row]
+        return {self.traits[i]: int(counts[i]) for i in np.flatnonzero(counts).tolist()}
+
+    def team_id(self, row):
+        """팀의 ID (챔피언 비트마스크의 16진수 문자열, team_id_from_mask() 참고)."""
+        return team_id_from_mask(self.champion_mask[row])
+
+    def row_of_team_id(self, team_id):
+        """팀 ID의 아레나 번호. 아레나에 없는 팀이거나 형식이 잘못된 ID이면 None."""
+        num_words = self.champion_mask.shape[1]
+        if not isinstance(team_id, str) or len(team_id) != 16 * num_words:
+            return None
+        try:
+            mask = np.array([int(team_id[16 * i:16 * (i + 1)], 16) for i in range(num_words)][::-1], dtype=np.uint64)
+        except ValueError:
+            return None
+        mask_dtype = np.dtype((np.void, 8 * num_words))
+        if self._mask_order is None:
+            # 비트마스크를 word 묶음 하나의 바이트열로 보고 정렬해 두면 ID 조회는 이진 탐색 한 번입니다.
+            mask_keys = np.ascontiguousarray(self.champion_mask).view(mask_dtype).ravel()
+            mask_order = np.argsort(mask_keys, kind='stable')
+            self._sorted_mask_keys = mask_keys[mask_order]
+            self._mask_order = mask_order
+        key = mask.view(mask_dtype)[0]
+        i = int(np.searchsorted(self._sorted_mask_keys, key))
+        if i < len(self._sorted_mask_keys) and self._sorted_mask_keys[i] == key:
+            return int(self._mask_order[i])
+        return None
+
+    def team_record(self, row):
+        """
+        프론트엔드에 보낼 팀 dict. id는 챔피언 구성으로 정해지는 팀 ID로, 모든 데이터셋과 모드에서 같은 팀은 같은 id입니다.
+        챔피언과 시너지는 원본 파일(그 팀이 처음 나온 줄)의 순서를 따릅니다.
+        """
+        return {
+            'id': self.team_id(row),
+            'champions': [self.champions[i] for i in self.champion_order[row].tolist() if i != ORDER_PAD],
+            'synergies': [f"{self.traits[t]} ({int(self.trait_counts[row, t])})"
+                          for t in self.trait_order[row].tolist() if t != ORDER_PAD],
+        }
+
+class TeamView:
+    """
+    데이터셋 하나를 아레나 번호로 표현한 뷰. 팀 컬럼은 갖지 않고 번호 목록과 역색인만 가집니다.
+    저장소의 뷰는 TeamView.load()로 메모리 매핑하고, 파생 데이터셋은 restricted()로 메모리에서 만듭니다.
+    """
+
+    def __init__(self, header, arrays, arena):
+        self.header = header
+        self.arena = arena
+        self.array_names = tuple(arrays)
+        for name, values in arrays.items():
+            setattr(self, name, values)
+        self._member_bits = None
+        self.lsh = None
+        if 'lsh' in self.header:
+            lsh = self.header['lsh']
+            self.lsh = LSHIndex(self.lsh_keys, self.lsh_rows, len(arena.champions),
+                                rows_per_band=lsh['rows_per_band'], seed=lsh['seed'])
+
+    @classmethod
+    def load(cls, view_dir, arena):
+        """저장소의 뷰 디렉터리를 메모리 매핑으로 엽니다."""
+        with open(os.path.join(view_dir, HEADER_FILE), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        array_names = VIEW_ARRAYS + (LSH_ARRAYS if 'lsh' in header else ())
+        return cls(header, _load_arrays(view_dir, array_names, header), arena)
+
+    def restricted(self, team_bits, **header_fields):
+        """team_bits에 속한 팀만 남긴 새 뷰를 메모리에서 만듭니다. (동시 출현 표는 다시 계산하고, LSH 색인은 없습니다)"""
+        team_bits = np.bitwise_and(team_bits, self.member_bits())
+        team_rows = bitset_rows(team_bits)
+        num_champions = len(self.arena.champions)
+        _, pair_counts, triple_counts = _view_tables(self.arena.champion_mask[team_rows], num_champions)
+        arrays = {
+            'rows': team_rows.astype(np.uint32),
+            'posting_bits': np.bitwise_and(self.posting_bits, team_bits),
+            'pair_counts': pair_counts,
+            'triple_counts': triple_counts,
+        }
+        # 정렬 순열은 기준 뷰의 순열에서 남는 팀만 골라내면 순서가 그대로 유지됩니다.
+        for sort_key in SORT_ORDERS:
+            name = sort_order_array_name(sort_key)
+            order = getattr(self, name)
+            arrays[name] = order[rows_in_bitset(order, team_bits)]
+        header = {'version': STORE_VERSION, 'team_count': int(team_rows.size), 'unique_team_count': int(team_rows.size),
+                  **header_fields}
+        return TeamView(header, arrays, self.arena)
+
+    def __len__(self):
+        return self.header['team_count']
+
+    def sort_order(self, sort_key):
+        """정렬 키의 미리 계산된 순열 (뷰 팀의 아레나 번호). SORT_ORDERS에 없는 키이면 None."""
+        if sort_key not in SORT_ORDERS:
+            return None
+        return getattr(self, sort_order_array_name(sort_key))
+
+    def contains(self, row):
+        """아레나 번호 row의 팀이 이 뷰에 속하는지 여부."""
+        return bitset_contains(self.member_bits(), row)
+
+    def member_bits(self):
+        """뷰에 속한 모든 팀의 비트셋."""
+        if self._member_bits is None:
+            self._member_bits = np.bitwise_or.reduce(self.posting_bits, axis=0) if len(self.posting_bits) else self.empty_bits()
+        return self._member_bits
+
+    def spec_bits(self, spec):
+        """
+        필터 명세(filter_spec.py 형식)를 만족하는 뷰 팀의 비트셋을 역색인만으로 계산합니다.
+        챔피언 조건은 챔피언 비트셋, 시너지 조건은 (시너지, 단계) 비트셋, 인원/코스트 조건은 컬럼 비교로 처리합니다.
+        알 수 없는 키나 챔피언이 있으면 ValueError를 발생시킵니다.
+        """
+        check_spec(spec)
+        arena = self.arena
+        bits = self.member_bits().copy()
+
+        def champion_bits_or_error(name):
+            champ_bits = self.champion_bits(name)
+            if champ_bits is None:
+                raise ValueError(f"알 수 없는 챔피언: {name}")
+            return champ_bits
+
+        for name in spec.get('include_champions', []):
+            bits &= champion_bits_or_error(name)
+        for name in spec.get('exclude_champions', []):
+            bits &= ~champion_bits_or_error(name)
+
+        if spec.get('any_trait_levels'):
+            any_bits = self.empty_bits()
+            for trait, levels in spec['any_trait_levels'].items():
+                for level in (levels if isinstance(levels, list) else [levels]):
+                    trait_bits = arena.trait_bits(trait, level, level)
+                    if trait_bits is not None:
+                        any_bits |= trait_bits
+            bits &= any_bits
+        for trait, level in spec.get('required_traits', {}).items():
+            trait_bits = arena.trait_bits(trait, level)
+            bits &= trait_bits if trait_bits is not None else self.empty_bits()
+        for trait, level in spec.get('forbidden_traits', {}).items():
+            trait_bits = arena.trait_bits(trait, level)
+            if trait_bits is not None:
+                bits &= ~trait_bits
+
+        if 'max_champion_cost' in spec:
+            for name, cost in arena.champion_costs.items():
+                if cost > spec['max_champion_cost']:
+                    bits &= ~self.champion_bits(name)
+        if 'min_size' in spec or 'max_size' in spec:
+            bits &= arena.column_bits('size', spec.get('min_size'), spec.get('max_size'))
+        if 'min_total_cost' in spec or 'max_total_cost' in spec:
+            bits &= arena.column_bits('total_cost', spec.get('min_total_cost'), spec.get('max_total_cost'))
+        for column in ('gold_traits', 'prism_traits'):
+            if spec.get(f'min_{column}'):
+                bits &= arena.column_bits(column, spec[f'min_{column}'])
+        return bits
+
+    def champion_bits(self, champion_name):
+        """챔피언을 포함한 팀의 비트셋 (메모리 매핑된 뷰). 사전에 없으면 None."""
+        i = self.arena.champion_index.get(champion_name)
+        if i is None:
+            return None
+        return self.posting_bits[i]
+
+    def all_inclusive_bits(self, champion_names):
+        """champion_names를 모두 포함하는 팀의 비트셋. 선택이 비었거나 사전에 없는 챔피언이 있으면 None."""
+        result = None
+        for name in champion_names:
+            bits = self.champion_bits(name)
+            if bits is None:
+                return None
+            result = bits.copy() if result is None else np.bitwise_and(result, bits, out=result)
+        return result
+
+    def any_bits(self, champion_names):
+        """champion_names 중 한 명 이상을 포함하는 팀의 비트셋. 사전에 없는 챔피언은 무시합니다."""
+        result = np.zeros(self.posting_bits.shape[1], dtype=np.uint64)
+        for name in champion_names:
+            bits = self.champion_bits(name)
+            if bits is not None:
+                np.bitwise_or(result, bits, out=result)
+        return result
+
+    def leave_one_out_bits(self, champion_names, all_inclusive=True):
+        """
+        champion_names(2명 이상)에서 한 명씩 뺐을 때의 팀 비트셋 리스트 (champion_names 순서).
+        all_inclusive가 True면 나머지를 모두 포함하는 팀, False면 한 명 이상 포함하는 팀입니다.
+        앞쪽/뒤쪽 누적 AND(OR) 비트셋을 한 번씩 만들어 두므로 비트셋 연산은 O(N)번입니다.
+        """
+        combine = np.bitwise_and if all_inclusive else np.bitwise_or
+        num_words = self.posting_bits.shape[1]
+        # 사전에 없는 챔피언은 어떤 팀에도 없으므로 빈 비트셋입니다.
+        empty = np.zeros(num_words, dtype=np.uint64)
+        bitsets = []
+        for name in champion_names:
+            bits = self.champion_bits(name)
+            bitsets.append(bits if bits is not None else empty)
+        identity = np.full(num_words, np.uint64(0xFFFFFFFFFFFFFFFF)) if all_inclusive else empty
+
+        suffixes = [identity]
+        for bits in reversed(bitsets[1:]):
+            suffixes.append(combine(suffixes[-1], bits))
+        suffixes.reverse()
+
+        result = []
+        prefix = identity
+        for i, bits in enumerate(bitsets):
+            result.append(combine(prefix, suffixes[i]))
+            prefix = combine(prefix, bits)
+        return result
+
+    def similar_rows(self, champion_names, bands=None):
+        """
+        MinHash LSH로 champion_names와 비슷한(Jaccard 유사도가 높은) 팀 후보를 아레나 번호 오름차순으로 반환합니다.
+        LSH 색인이 없는 뷰이면 None. bands로 사용할 band 수(재현율)를 조절합니다.
+        """
+        if self.lsh is None:
+            return None
+        indices = [i for i in map(self.arena.champion_index.get, champion_names) if i is not None]
+        return self.lsh.candidates(indices, bands)
+
+    def empty_bits(self):
+        return np.zeros(self.arena.num_words, dtype=np.uint64)
+
+    def champion_team_counts(self):
+        """각 챔피언을 포함한 뷰의 팀 수를 (C,) int64 배열로 반환합니다. (챔피언 사전 순서)"""
+        return np.diagonal(self.pair_counts).astype(np.int64)
+
+    def _champion_indices(self, champion_names):
+        indices = []
+        for name in champion_names:
+            i = self.arena.champion_index.get(name)
+            if i is None:
+                return None
+            indices.append(i)
+        return indices
+
+    def _table_count(self, indices):
+        if len(indices) == 1:
+            return int(self.pair_counts[indices[0], indices[0]])
+        if len(indices) == 2:
+            return int(self.pair_counts[indices[0], indices[1]])
+        return int(self.triple_counts[indices[0], indices[1], indices[2]])
+
+    def table_all_inclusive_count(self, champion_names):
+        """
+        champion_names(1~3명)를 모두 포함하는 팀 수를 동시 출현 표에서 읽습니다.
+        표로 답할 수 없는 인원이면 None, 사전에 없는 챔피언이 있으면 0.
+        """
+        champion_names = set(champion_names)
+        if not 0 < len(champion_names) <= MAX_TABLE_CHAMPIONS:
+            return None
+        indices = self._champion_indices(champion_names)
+        return self._table_count(indices) if indices is not None else 0
+
+    def table_any_count(self, champion_names):
+        """champion_names(1~3명) 중 한 명 이상을 포함하는 팀 수 (포함–배제). 표로 답할 수 없는 인원이면 None."""
+        champion_names = set(champion_names)
+        if not 0 < len(champion_names) <= MAX_TABLE_CHAMPIONS:
+            return None
+        indices = [i for i in map(self.arena.champion_index.get, champion_names) if i is not None]
+        count = 0
+        for r in range(1, len(indices) + 1):
+            sign = 1 if r % 2 else -1
+            count += sign * sum(self._table_count(combo) for combo in itertools.combinations(indices, r))
+        return count
+
+    def table_champion_counts(self, champion_names):
+        """
+        champion_names(0~2명)에 각 챔피언을 추가했을 때 모두 포함하는 팀 수 (C,) 배열을 표에서 읽습니다.
+        표로 답할 수 없는 인원이면 None.
+        """
+        champion_names = set(champion_names)
+        if len(champion_names) >= MAX_TABLE_CHAMPIONS:
+            return None
+        indices = self._champion_indices(champion_names)
+        if indices is None:
+            return np.zeros(len(self.arena.champions), dtype=np.int64)
+        if not indices:
+            return self.champion_team_counts()
+        if len(indices) == 1:
+            return self.pair_counts[indices[0]].astype(np.int64)
+        return self.triple_counts[indices[0], indices[1]].astype(np.int64)
+
+    def mapped_bytes(self):
+        """뷰 배열의 크기(바이트). 공유 아레나는 포함하지 않습니다."""
+        return sum(getattr(self, name).nbytes for name in self.array_names)
+
+class RankedRows:
+    """
+    정렬 키가 작은 정수인 팀 번호 목록을 전체 정렬 없이 순서대로 꺼내는 커서.
+    팀을 키별 버킷으로 세어 두고, 요청된 구간이 걸친 버킷만 꺼내므로 첫 페이지는 버킷 몇 개만 훑으면 됩니다.
+    같은 키 안에서는 팀 번호 오름차순입니다. 리스트처럼 len(), 슬라이싱, 반복을 지원합니다.
+    """
+
+    def __init__(self, rows, keys):
+        self.members = rows  # 팀 번호 오름차순 (순위와 무관)
+        self.keys = keys
+        self.bucket_ends = np.cumsum(np.bincount(keys)) if keys.size else np.zeros(0, dtype=np.int64)
+        self._buckets = {}
+
+    def __len__(self):
+        return int(self.members.size)
+
+    def _bucket(self, key):
+        rows = self._buckets.get(key)
+        if rows is None:
+            rows = self.members[self.keys == key]
+            self._buckets[key] = rows
+        return rows
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("RankedRows는 슬라이스로만 접근할 수 있습니다.")
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            raise ValueError("RankedRows는 step 슬라이스를 지원하지 않습니다.")
+        result = []
+        key = int(np.searchsorted(self.bucket_ends, start, side='right'))
+        while start < stop and key < len(self.bucket_ends):
+            bucket_start = int(self.bucket_ends[key - 1]) if key else 0
+            rows = self._bucket(key)
+            result.extend(rows[start - bucket_start:stop - bucket_start].tolist())
+            start = int(self.bucket_ends[key])
+            key += 1
+        return result
+
+    def __iter__(self):
+        for key in range(len(self.bucket_ends)):
+            if self.bucket_ends[key] != (self.bucket_ends[key - 1] if key else 0):
+                yield from self._bucket(key).tolist()
+
+class SelectionBitsetCache:
+    """
+    선택(챔피언 조합)별 후보 팀 비트셋을 내용 기준 키로 보관하는 LRU 캐시.
+    선택이 한 명 바뀌면 직전 선택의 비트셋에 그 챔피언의 비트셋을 한 번만 AND(OR)하여 계산합니다.
+    챔피언을 뺀 선택은 put_leave_one_out()으로 미리 넣어 둔 비트셋을 그대로 사용합니다.
+    """
+
+    def __init__(self, maxsize=SELECTION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        with self._lock:
+            bits = self._entries.get(key)
+            if bits is not None:
+                self._entries.move_to_end(key)
+            return bits
+
+    def _store(self, key, bits):
+        with self._lock:
+            self._entries[key] = bits
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, view, dataset_name, champion_names, all_inclusive=True):
+        """
+        champion_names를 모두(all_inclusive) 또는 한 명 이상 포함하는 팀 비트셋.
+        결과가 없으면 빈 비트셋, 선택이 비었으면 None을 반환합니다. 반환된 배열은 수정하면 안 됩니다.
+        """
+        selected = tuple(sorted(set(champion_names)))
+        if not selected:
+            return None
+        key = (dataset_name, all_inclusive, selected)
+        bits = self._lookup(key)
+        if bits is not None:
+            return bits
+
+        # 한 명 적은 선택이 캐시에 있으면 그 챔피언의 비트셋만 합칩니다.
+        if len(selected) > 1:
+            for i, champ in enumerate(selected):
+                parent = self._lookup((dataset_name, all_inclusive, selected[:i] + selected[i + 1:]))
+                if parent is None:
+                    continue
+                champ_bits = view.champion_bits(champ)
+                if champ_bits is None:
+                    bits = view.empty_bits() if all_inclusive else parent
+                else:
+                    bits = (np.bitwise_and if all_inclusive else np.bitwise_or)(parent, champ_bits)
+                break
+
+        if bits is None:
+            if all_inclusive:
+                bits = view.all_inclusive_bits(selected)
+                if bits is None:
+                    bits = view.empty_bits()
+            else:
+                bits = view.any_bits(selected)
+        self._store(key, bits)
+        return bits
+
+    def put_leave_one_out(self, view, dataset_name, champion_names, all_inclusive=True):
+        """champion_names(2명 이상)에서 한 명씩 뺀 선택의 비트셋을 계산해 캐시에 넣고, champion_names 순서로 반환합니다."""
+        bitsets = view.leave_one_out_bits(champion_names, all_inclusive)
+        for i, bits in enumerate(bitsets):
+            remaining = tuple(sorted(set(champion_names[:i] + champion_names[i + 1:])))
+            self._store((dataset_name, all_inclusive, remaining), bits)
+        return bitsets
+
+def open_team_arena(store_root=TEAM_STORE_DIR, dataset_sources=STORE_DATASET_SOURCES, arena_sources=ARENA_SOURCES, rebuild=False):
+    """
+    저장소의 아레나를 메모리 매핑으로 엽니다. 저장소를 쓰지 않으므로 서버는 이 기본 경로만 사용합니다.
+    저장소가 없거나 현재 버전이 아니면 FileNotFoundError, 원본이 그 이후로 바뀌었으면 경고만 출력합니다.
+    rebuild=True(오프라인 명령 전용)이면 없거나 원본보다 오래된 저장소를 먼저 다시 빌드합니다.
+    """
+    if rebuild and not is_arena_current(store_root, dataset_sources, arena_sources):
+        build_team_arena(store_root, dataset_sources, arena_sources)
+    elif read_store_header(store_root, dataset_sources) is None:
+        raise FileNotFoundError(f"{store_root}에 현재 버전(v{STORE_VERSION})의 팀 저장소가 없습니다. "
+                                f"python team_store.py로 빌드하세요.")
+    elif not is_arena_current(store_root, dataset_sources, arena_sources):
+        print(f"경고: {store_root}을 빌드한 뒤 원본 조합 파일이 바뀌었습니다. python team_store.py로 다시 빌드하세요.")
+    return TeamArena(os.path.join(store_root, ARENA_DIR))
+
+def save_subset(dataset_name, base_dataset, spec, store_root=TEAM_STORE_DIR):
+    """
+    기준 데이터셋에서 명세를 만족하는 팀의 멤버십 비트맵을 subsets/<dataset_name>/에 저장합니다.
+    필터 단계가 조합 파일을 새로 쓰는 대신 호출합니다. 반환값: 부분집합 팀 수
+    """
+    arena = open_team_arena(store_root, rebuild=True)
+    base_view = TeamView.load(os.path.join(store_root, VIEWS_DIR, base_dataset), arena)
+    bits = base_view.spec_bits(spec)
+    subset_dir = os.path.join(store_root, SUBSETS_DIR, dataset_name)
+    os.makedirs(subset_dir, exist_ok=True)
+    np.save(os.path.join(subset_dir, 'bits.npy'), bits)
+    team_count = bitset_count(bits)
+    _write_header(subset_dir, {
+        'version': STORE_VERSION,
+        'base': base_dataset,
+        'spec': spec,
+        'team_count': team_count,
+        'arena_built_at': arena.header.get('built_at'),
+        'arena_team_count': len(arena),
+        'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    print(f"부분집합 저장 완료: {subset_dir} ({team_count:,}팀, 기준 {base_dataset}, {bits.nbytes / 1024:.1f}KB)")
+    return team_count
+
+def load_subset_bits(store_root, dataset_name, base_dataset, arena):
+    """저장된 부분집합 비트맵. 없거나, 기준 데이터셋이 다르거나, 아레나가 그 이후 다시 빌드되었으면 None."""
+    subset_dir = os.path.join(store_root, SUBSETS_DIR, dataset_name)
+    header_path = os.path.join(subset_dir, HEADER_FILE)
+    if not os.path.exists(header_path):
+        return None
+    with open(header_path, 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    if (header.get('version') != STORE_VERSION or header.get('base') != base_dataset
+            or header.get('arena_built_at') != arena.header.get('built_at') or header.get('arena_team_count') != len(arena)):
+        return None
+    return np.load(os.path.join(subset_dir, 'bits.npy'))
+
+class TeamStoreRegistry:
+    """
+    공유 아레나와 데이터셋 뷰를 처음 사용할 때 여는 레지스트리.
+    아레나는 한 번만 매핑되고 모든 데이터셋이 같은 컬럼을 사용합니다.
+    데이터셋마다 잠금을 따로 두어, 여러 스레드가 동시에 요청해도 한 번만 로드하고
+    한 데이터셋의 로드가 다른 데이터셋 요청을 막지 않습니다.
+    """
+
+    def __init__(self, store_root=TEAM_STORE_DIR, dataset_sources=STORE_DATASET_SOURCES, arena_sources=ARENA_SOURCES,
+                 subset_datasets=SUBSET_DATASETS):
+        self.store_root = store_root
+        self.dataset_sources = dataset_sources
+        self.arena_sources = arena_sources
+        self.subset_datasets = subset_datasets
+        self._arena_lock = threading.Lock()
+        self._arena = None
+        self._locks = {name: threading.Lock() for name in (*dataset_sources, *subset_datasets)}
+        self._datasets = {}
+        self._stats = {}
+
+    def arena(self):
+        """공유 TeamArena. 로드에 실패하면 None."""
+        if self._arena is None:
+            with self._arena_lock:
+                if self._arena is None:
+                    start_time = time.time()
+                    try:
+                        self._arena = open_team_arena(self.store_root, self.dataset_sources, self.arena_sources)
+                    except Exception as e:
+                        print(f"팀 아레나 로드 오류: {e}")
+                        return None
+                    self._stats['arena'] = {
+                        'load_seconds': round(time.time() - start_time, 4),
+                        'team_count': len(self._arena),
+                        'mapped_bytes': self._arena.mapped_bytes(),
+                    }
+        return self._arena
+
+    def get(self, dataset_name):
+        """
+        (TeamView, TeamArena)를 반환합니다. 로드에 실패한 데이터셋은 (None, None)입니다.
+        실패는 저장해 두지 않으므로, 저장소를 다시 빌드하면 다음 요청에서 다시 로드를 시도합니다.
+        """
+        dataset = self._datasets.get(dataset_name)
+        if dataset is None:
+            with self._locks[dataset_name]:
+                dataset = self._datasets.get(dataset_name)
+                if dataset is None:
+                    dataset = self._load(dataset_name)
+                    if dataset[0] is not None:
+                        self._datasets[dataset_name] = dataset
+        return dataset
+
+    def _load(self, dataset_name):
+        start_time = time.time()
+        arena = self.arena()
+        try:
+            if arena is None:
+                raise RuntimeError("아레나를 열 수 없습니다.")
+            if dataset_name in self.subset_datasets:
+                # 부분집합 데이터셋: 기준 뷰의 역색인을 저장된 멤버십 비트맵(없으면 명세로 계산)과 AND합니다.
+                base_name, spec_factory = self.subset_datasets[dataset_name]
+                base_view, _ = self.get(base_name)
+                if base_view is None:
+                    raise RuntimeError(f"기준 데이터셋 {base_name}을 열 수 없습니다.")
+                subset_bits = load_subset_bits(self.store_root, dataset_name, base_name, arena)
+                subset_source = 'bitmap'
+                if subset_bits is None:
+                    subset_bits = base_view.spec_bits(spec_factory())
+                    subset_source = 'spec'
+                view = base_view.restricted(subset_bits, subset_of=base_name, subset_source=subset_source)
+            else:
+                view = TeamView.load(os.path.join(self.store_root, VIEWS_DIR, dataset_name), arena)
+        except Exception as e:
+            print(f"팀 저장소 로드 오류({dataset_name}): {e}")
+            view, arena = None, None
+
+        stats = {
+            'load_seconds': round(time.time() - start_time, 4),
+            'team_count': len(view) if view else 0,
+            'mapped_bytes': view.mapped_bytes() if view else 0,
+        }
+        if view and 'subset_source' in view.header:
+            stats['subset_source'] = view.header['subset_source']
+        self._stats[dataset_name] = stats
+        print(f"데이터셋 로드: {dataset_name} ({stats['team_count']:,}팀, {stats['load_seconds']:.3f}초, "
+              f"{stats['mapped_bytes'] / (1024 * 1024):.1f}MB 매핑)")
+        return view, arena
+
+    def dataset_names(self):
+        return list(self._locks)
+
+    def datasets_containing(self, row):
+        """
+        아레나 번호 row의 팀을 포함한 데이터셋 이름 목록. 로드되지 않은 뷰는 새로 만들지 않습니다.
+        로드된 데이터셋은 뷰의 멤버십을, 로드되지 않은 데이터셋은 그 팀의 한 챔피언 역색인에서 한 word만 읽고
+        (posting_bits.npy 메모리 매핑), 부분집합 데이터셋은 저장된 멤버십 비트맵을 읽습니다.
+        비트맵이 없는 부분집합만 기준 뷰에서 명세를 계산합니다.
+        """
+        arena = self.arena()
+        if arena is None:
+            return []
+        champion = int(bitset_rows(arena.champion_mask[row])[0])
+        names = []
+        for dataset_name in self.dataset_names():
+            dataset = self._datasets.get(dataset_name)
+            if dataset is not None:
+                contained = dataset[0].contains(row)
+            elif dataset_name in self.subset_datasets:
+                base_name, spec_factory = self.subset_datasets[dataset_name]
+                subset_bits = load_subset_bits(self.store_root, dataset_name, base_name, arena)
+                if subset_bits is None:
+                    base_view, _ = self.get(base_name)
+                    subset_bits = base_view.spec_bits(spec_factory()) if base_view is not None else None
+                contained = subset_bits is not None and bitset_contains(subset_bits, row)
+            else:
+                posting_path = os.path.join(self.store_root, VIEWS_DIR, dataset_name, 'posting_bits.npy')
+                contained = os.path.exists(posting_path) and bitset_contains(np.load(posting_path, mmap_mode='r')[champion], row)
+            if contained:
+                names.append(dataset_name)
+        return names
+
+    def has_dataset(self, dataset_name):
+        return dataset_name in self._locks
+
+    def stats(self):
+        """공유 아레나('arena')와 로드된 데이터셋별 {load_seconds, team_count, mapped_bytes}."""
+        return dict(self._stats)
+
+def main():
+    if len(sys.argv) > 2:
+        print("사용법: python team_store.py [<저장소 디렉터리>]")
+        return
+    try:
+        build_team_arena(sys.argv[1] if len(sys.argv) == 2 else TEAM_STORE_DIR)
+    except FileNotFoundError as e:
+        print(f"오류: {e}")
+
+if __name__ == '__main__':
+    main()
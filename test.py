@@ -1,5 +1,10 @@
 import json
-import glob
+import sys
+
+from composition_io import compression_suffix, open_composition_file, resolve_composition_path, with_compression
+from filter_spec import compile_filter_spec, load_champion_table, spec_from_target_synergies
+from parallel_filter import parallel_filter_file
+from team_store import save_subset
 
 synergy_counts_path = "synergy_counts.json"
 input_files = [
@@ -10,26 +15,33 @@ input_files = [
 ]
 output_path = "filtered_compositions_all.jsonl"
 
-# targetSynergy=True인 시너지 (이름, count) 세트
-with open(synergy_counts_path, "r", encoding="utf-8") as f:
-    synergy_data = json.load(f)
-target_synergies = {(s["synergy_name"], s["count"]) for s in synergy_data if s["targetSynergy"]}
-
-filtered_compositions = []
-
-# 여러 파일에서 읽기
-for file in input_files:
-    with open(file, "r", encoding="utf-8") as f:
-        for line in f:
-            comp = json.loads(line)
-            comp_synergies = {(name, count) for name, count in comp.get("synergies", {}).items()}
-            if target_synergies & comp_synergies:  # 교집합 있으면 추가
-                comp["source_file"] = file  # 원본 파일 정보 추가 (선택)
-                filtered_compositions.append(comp)
-
-# 결과 저장
-with open(output_path, "w", encoding="utf-8") as f:
-    for comp in filtered_compositions:
-        f.write(json.dumps(comp, ensure_ascii=False) + "\n")
-
-print(f"필터링된 조합 저장 완료: {output_path}")
+
+def main():
+    # targetSynergy=True인 (시너지, count) 중 하나라도 일치하면 통과
+    with open(synergy_counts_path, "r", encoding="utf-8") as f:
+        synergy_data = json.load(f)
+    target_spec = spec_from_target_synergies(synergy_data)
+    target_filter = compile_filter_spec(target_spec, load_champion_table())
+
+    # 서버는 이 데이터셋을 전체 팀 저장소 위의 멤버십 비트맵(팀당 1비트)으로 사용합니다.
+    save_subset("filtered", "all_ai", target_spec)
+    if "--subset-only" in sys.argv:
+        # 두 백엔드 모두 기준 데이터셋 위의 명세로 이 데이터셋을 처리하므로, 조합 파일 사본은 파일을 직접 읽을 때만 필요합니다.
+        return
+
+    # 압축 파일(.jsonl.gz, .jsonl.zst)이 있으면 그대로 읽고, 출력도 같은 형식으로 저장
+    files = [resolve_composition_path(file) for file in input_files]
+    output_file = with_compression(output_path, compression_suffix(files[0]))
+
+    # 여러 파일에서 읽어 순서대로 저장 (파일마다 청크 단위 병렬 필터링)
+    with open_composition_file(output_file, "wb") as f:
+        for file in files:
+            print(f"처리 중: {file}")
+            # 원본 파일 정보 추가 (선택)
+            parallel_filter_file(file, f, target_filter, annotate_fields={"source_file": file})
+
+    print(f"필터링된 조합 저장 완료: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
+import itertools
 import json
 import re
+import zlib
 from flask import Flask, render_template, request, jsonify, session
 import os
 from functools import lru_cache
+import numpy as np
+from filter_spec import check_spec, compile_filter_spec, load_synergy_levels as load_synergy_level_file, spec_from_synergy_levels
+from team_store import (MAX_TABLE_CHAMPIONS, SUBSET_DATASETS, RankedRows, SelectionBitsetCache, TeamStoreRegistry, bitset_count,
+                        bitset_rows, rows_in_bitset, rows_to_bitset)
+from team_query import (SCORE_COMPONENTS, exclude_rows, execute_query, rank_by_overlap, rank_by_score, rank_with_penalties,
+                        page_in_bitset, page_in_order, score_rows, sort_rows)
+from team_db import open_team_db, split_sql_spec
+from trait_tiers import TraitTierTable
 
 app = Flask(__name__)
 app.secret_key = 'tft_team_builder_secret_key'  # 세션을 위한 시크릿 키
@@ -15,169 +25,14 @@ COST_WEIGHT = 0.5            # 챔피언 비용 총합에 대한 가중치
 BONUS_WEIGHT = 15            # '완성 직전' 시너지에 대한 보너스 점수
 FINDABILITY_WEIGHT = 10     # 챔피언 등장 확률 점수에 대한 가중치
 
-# 성능 최적화를 위한 전역 캐시
-@lru_cache(maxsize=1)
-def parse_filtered_teams():
-    """filtered_compositions_all.jsonl에서 팀 정보를 파싱합니다."""
-    teams = []
-    try:
-        with open('filtered_compositions_all.jsonl', 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f, 1):
-                data = json.loads(line)
-
-                synergy_list = [f"{name} ({count})" for name, count in data.get('synergies', {}).items()]
-
-                teams.append({
-                    'id': i,
-                    'champions': data['champions'],
-                    'synergies': synergy_list
-                })
-    except Exception as e:
-        print(f"필터링된 팀 파싱 오류: {e}")
-        return []
-    return teams
-
-
-@lru_cache(maxsize=1)
-def parse_high_value_teams():
-    """filtered_compositions_by_synergy.jsonl에서 팀 정보를 파싱합니다."""
-    teams = []
-    try:
-        with open('filtered_compositions_by_synergy.jsonl', 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f, 1):
-                data = json.loads(line)
-                synergy_list = [f"{name} ({count})" for name, count in data.get('synergies', {}).items()]
-                teams.append({
-                    'id': i,
-                    'champions': data['champions'],
-                    'synergies': synergy_list
-                })
-    except FileNotFoundError:
-        print("경고: filtered_compositions_by_synergy.jsonl 파일을 찾을 수 없습니다.")
-        return []
-    except Exception as e:
-        print(f"고밸류 팀 파싱 오류: {e}")
-        return []
-    return teams
-
-
-@lru_cache(maxsize=1)
-def parse_all_ai_teams():
-    """ai_team_compositions_size_*.jsonl 파일에서 모든 팀 정보를 파싱하고 결합합니다."""
-    teams = []
-    files_to_load = [
-        "ai_team_compositions_size_6.jsonl",
-        "ai_team_compositions_size_7.jsonl",
-        "ai_team_compositions_size_8.jsonl",
-        "ai_team_compositions_size_9.jsonl"
-    ]
-    team_counter = 1
-    for filename in files_to_load:
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                for line in f:
-                    data = json.loads(line)
-                    synergy_list = [f"{name} ({count})" for name, count in data.get('synergies', {}).items()]
-                    teams.append({
-                        'id': team_counter,
-                        'champions': data['champions'],
-                        'synergies': synergy_list
-                    })
-                    team_counter += 1
-        except FileNotFoundError:
-            print(f"경고: {filename}을 찾을 수 없습니다. 건너뜁니다.")
-        except Exception as e:
-            print(f"{filename} 파싱 오류: {e}")
-    return teams
-
-@lru_cache(maxsize=1)
-def build_champion_team_indexes_all_ai():
-    """모든 AI 팀 데이터 기준으로 챔피언별 팀 인덱스를 빌드합니다."""
-    champion_to_team_ids = {}
-    team_id_to_team = {}
-    current_teams = parse_all_ai_teams()
-    for team in current_teams:
-        team_id_to_team[team['id']] = team
-        for champ in team['champions']:
-            if champ not in champion_to_team_ids:
-                champion_to_team_ids[champ] = set()
-            champion_to_team_ids[champ].add(team['id'])
-    return champion_to_team_ids, team_id_to_team
-
-@lru_cache(maxsize=1)
-def build_champion_team_indexes_high_value():
-    """'고밸류덱' (filtered_compositions_by_synergy.jsonl) 기준으로 챔피언별 팀 인덱스를 빌드합니다."""
-    champion_to_team_ids = {}
-    team_id_to_team = {}
-    current_teams = parse_high_value_teams()
-    for team in current_teams:
-        team_id_to_team[team['id']] = team
-        for champ in team['champions']:
-            if champ not in champion_to_team_ids:
-                champion_to_team_ids[champ] = set()
-            champion_to_team_ids[champ].add(team['id'])
-    return champion_to_team_ids, team_id_to_team
-
-@lru_cache(maxsize=1)
-def build_champion_team_indexes_filtered():
-    """filtered_compositions_all.jsonl 기준으로 챔피언별 팀 인덱스를 빌드합니다."""
-    champion_to_team_ids = {}
-    team_id_to_team = {}
-
-    current_teams = parse_filtered_teams()
-
-    for team in current_teams:
-        team_id_to_team[team['id']] = team
-        for champ in team['champions']:
-            if champ not in champion_to_team_ids:
-                champion_to_team_ids[champ] = set()
-            champion_to_team_ids[champ].add(team['id'])
-
-    return champion_to_team_ids, team_id_to_team
-
-@lru_cache(maxsize=1)
-def parse_teams_from_file_size_6():
-    """filtered_ai_team_compositions.jsonl에서 팀 정보를 파싱합니다."""
-    teams = []
-    try:
-        with open('filtered_ai_team_compositions.jsonl', 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f, 1):
-                data = json.loads(line)
-
-                # 프론트엔드 표시를 위해 시너지 데이터를 포맷팅합니다.
-                synergy_list = [f"{name} ({count})" for name, count in data.get('synergies', {}).items()]
-
-                teams.append({
-                    'id': i,
-                    'champions': data['champions'],
-                    'synergies': synergy_list
-                })
-    except Exception as e:
-        print(f"팀 파싱 오류(size 6): {e}")
-        return []
-    return teams
-
-@lru_cache(maxsize=1)
-def parse_teams_from_file_size_8():
-    """ai_team_compositions_size_8.jsonl에서 팀 정보를 파싱합니다."""
-    teams = []
-    try:
-        with open('ai_team_compositions_size_8.jsonl', 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f, 1):
-                data = json.loads(line)
-
-                # 프론트엔드 표시를 위해 시너지 데이터를 포맷팅합니다.
-                synergy_list = [f"{name} ({count})" for name, count in data.get('synergies', {}).items()]
-
-                teams.append({
-                    'id': i,
-                    'champions': data['champions'],
-                    'synergies': synergy_list
-                })
-    except Exception as e:
-        print(f"팀 파싱 오류(size 8): {e}")
-        return []
-    return teams
+# 종합 점수 모드(ai_score)의 기본 가중치. 요청의 weights 파라미터로 요소별로 바꿀 수 있습니다. (team_query.score_rows 참고)
+DEFAULT_SCORE_WEIGHTS = {
+    'overlap': OVERLAP_WEIGHT,
+    'synergy_tier': SYNERGY_TIER_WEIGHT,
+    'cost': COST_WEIGHT,
+    'almost_complete': BONUS_WEIGHT,
+    'findability': FINDABILITY_WEIGHT,
+}
 
 @lru_cache(maxsize=1)
 def load_champion_data():
@@ -244,11 +99,36 @@ def load_reroll_probabilities():
         print(f"리롤 확률 데이터 로드 오류: {e}")
         return {}
 
+@lru_cache(maxsize=1)
+def load_synergy_levels():
+    """synergy_level.json에서 등급(프리즘, 골드, 실버 ...)별 시너지 단계를 로드합니다."""
+    try:
+        return load_synergy_level_file()
+    except Exception as e:
+        print(f"시너지 단계 데이터 로드 오류: {e}")
+        return {}
+
 # 전역 변수로 팀과 챔피언 데이터 저장 (캐시된 버전)
 champion_data, attack_range_data = load_champion_data()
 synergy_tiers_data = load_synergy_tiers()
 champion_traits_data = load_champion_traits()
 reroll_probabilities_data = load_reroll_probabilities()
+synergy_levels_data = load_synergy_levels()
+
+@lru_cache(maxsize=1)
+def load_trait_tier_table():
+    """로드된 시너지 단계, 챔피언 특성, 등급으로 (시너지, 인원) 단계 조회 표를 만듭니다. (trait_tiers.py 참고)"""
+    return TraitTierTable(synergy_tiers_data, champion_traits_data, synergy_levels=synergy_levels_data)
+
+# 시너지 계산(종합 점수, /api/calculate_synergies)은 요청마다 파일을 읽지 않고 이 표만 조회합니다.
+trait_tier_table = load_trait_tier_table()
+
+@lru_cache(maxsize=4)
+def get_arena_tier_table(traits):
+    """아레나의 시너지 순서(traits 튜플)에 맞춘 단계 조회 표. 같은 데이터로 빌드된 아레나이면 공유 표를 그대로 씁니다."""
+    if list(traits) == trait_tier_table.traits:
+        return trait_tier_table
+    return TraitTierTable(synergy_tiers_data, champion_traits_data, traits, synergy_levels_data)
 
 @lru_cache(maxsize=1)
 def load_item_recommendations():
@@ -275,78 +155,36 @@ def set_selected_champions(champions_set):
     # 디버깅을 위해 콘솔에도 출력
     print(f"[DEBUG] 세션에 저장됨: {session['selected_champions']}")
 
-# --- 인덱싱 최적화: 챔피언별로 팀 id 리스트 미리 생성 (캐시된 버전) ---
-@lru_cache(maxsize=1)
-def build_champion_team_indexes_size_6():
-    """챔피언별 팀 인덱스를 빌드합니다 (size 6)."""
-    champion_to_team_ids = {}
-    team_id_to_team = {}
-
-    # parse_teams_from_file_size_6() is cached, so this is efficient
-    current_teams = parse_teams_from_file_size_6()
-
-    for team in current_teams:
-        team_id_to_team[team['id']] = team
-        for champ in team['champions']:
-            if champ not in champion_to_team_ids:
-                champion_to_team_ids[champ] = set()
-            champion_to_team_ids[champ].add(team['id'])
-
-    return champion_to_team_ids, team_id_to_team
-
-@lru_cache(maxsize=1)
-def build_champion_team_indexes_size_8():
-    """챔피언별 팀 인덱스를 빌드합니다 (size 8)."""
-    champion_to_team_ids = {}
-    team_id_to_team = {}
-
-    # parse_teams_from_file_size_8() is cached, so this is efficient
-    current_teams = parse_teams_from_file_size_8()
-
-    for team in current_teams:
-        team_id_to_team[team['id']] = team
-        for champ in team['champions']:
-            if champ not in champion_to_team_ids:
-                champion_to_team_ids[champ] = set()
-            champion_to_team_ids[champ].add(team['id'])
-    
-    return champion_to_team_ids, team_id_to_team
-
-# 인덱스 빌드
-champion_to_team_ids_6, team_id_to_team_6 = build_champion_team_indexes_size_6()
-champion_to_team_ids_8, team_id_to_team_8 = build_champion_team_indexes_size_8()
-champion_to_team_ids_filtered, team_id_to_team_filtered = build_champion_team_indexes_filtered()
-champion_to_team_ids_all_ai, team_id_to_team_all_ai = build_champion_team_indexes_all_ai()
-champion_to_team_ids_high_value, team_id_to_team_high_value = build_champion_team_indexes_high_value()
-
-def calculate_comprehensive_score(team, selected_champions, champion_data, synergy_tiers_data, champion_traits_data, reroll_probabilities_data):
-    """팀의 종합 점수를 새로운 기준(리롤 확률 포함)에 따라 계산합니다."""
-    from collections import defaultdict
-
-    # 1. 팀의 특성별 챔피언 수 계산
-    trait_counts = defaultdict(int)
+# --- 인덱싱 최적화: 챔피언별 팀 비트셋은 저장소에 미리 빌드되어 있습니다 ---
+# 모든 데이터셋은 team_store/arena/의 공유 컬럼 저장소를 쓰고, 데이터셋별로는 챔피언별 팀 비트셋(뷰)만 가집니다.
+# 서버 시작 전에 `python team_store.py`로 빌드해 두면 시작 시 파싱이 전혀 없습니다. (team_store.py 참고)
+# 데이터셋은 처음 사용될 때 로드되므로, 쓰지 않는 모드의 데이터셋은 비용이 들지 않습니다.
+team_datasets = TeamStoreRegistry()
+# 선택별 후보 비트셋. 챔피언 한 명을 추가/제외하면 직전 선택의 결과에서 비트셋 연산 한 번으로 갱신됩니다.
+selection_bitsets = SelectionBitsetCache()
+
+# --- SQLite 백엔드 (선택) ---
+# TFT_TEAM_DB 환경 변수에 team_db.py로 만든 데이터베이스 경로를 지정하면 추천 쿼리를 SQLite로 실행합니다.
+# 이 경우 컬럼 저장소는 열리지 않습니다.
+TEAM_DB_PATH = os.environ.get('TFT_TEAM_DB')
+team_db = open_team_db(TEAM_DB_PATH) if TEAM_DB_PATH else None
+
+def calculate_comprehensive_score(team, selected_champions, champion_data, tier_table, reroll_probabilities_data, weights=None,
+                                  emblem_vector=None):
+    """
+    팀의 종합 점수를 새로운 기준(리롤 확률 포함)에 따라 계산합니다. weights가 없으면 DEFAULT_SCORE_WEIGHTS를 씁니다.
+    tier_table은 시너지 단계 조회 표(TraitTierTable)이고, emblem_vector가 있으면 상징 인원을 더해 시너지 단계를 계산합니다.
+    컬럼 저장소 백엔드는 같은 점수를 team_query.score_rows()로 후보 전체에 대해 한 번에 계산합니다.
+    """
+    weights = weights or DEFAULT_SCORE_WEIGHTS
     team_champions = team['champions']
-    for champ_name in team_champions:
-        if champ_name in champion_traits_data:
-            for trait in champion_traits_data[champ_name]:
-                trait_counts[trait] += 1
-
-    # 2. 시너지 등급 점수 및 '완성 직전' 보너스 계산
-    synergy_tier_score = 0
-    almost_complete_bonus = 0
-
-    for trait, count in trait_counts.items():
-        if trait in synergy_tiers_data:
-            tiers = synergy_tiers_data[trait]
-            current_tier_val = 0
-            for i, tier_level in enumerate(tiers):
-                if count >= tier_level:
-                    current_tier_val = tier_level
-                else:
-                    if count + 1 == tier_level:
-                        almost_complete_bonus += BONUS_WEIGHT
-                    break
-            synergy_tier_score += current_tier_val
+
+    # 1~2. 팀의 특성별 챔피언 수로 시너지 등급 점수 및 '완성 직전' 시너지 수 계산 (조회 표)
+    trait_counts = tier_table.trait_counts(team_champions)
+    if emblem_vector is not None:
+        trait_counts = tier_table.add_emblems(trait_counts, len(team_champions), emblem_vector)
+    synergy_tier_score, almost_complete_count = tier_table.score_counts(trait_counts)
+    almost_complete_bonus = int(almost_complete_count) * weights['almost_complete']
 
     # 3. 챔피언 비용 점수 계산
     champion_cost_score = 0
@@ -373,109 +211,464 @@ def calculate_comprehensive_score(team, selected_champions, champion_data, syner
     overlap_score = 0
     if selected_champions:
         overlap_count = len(set(team['champions']).intersection(selected_champions))
-        overlap_score = overlap_count * OVERLAP_WEIGHT
+        overlap_score = overlap_count * weights['overlap']
 
     # 6. 점수 종합
     total_score = (overlap_score) + \
-                  (synergy_tier_score * SYNERGY_TIER_WEIGHT) + \
-                  (champion_cost_score * COST_WEIGHT) + \
+                  (int(synergy_tier_score) * weights['synergy_tier']) + \
+                  (champion_cost_score * weights['cost']) + \
                   almost_complete_bonus + \
-                  (findability_score * FINDABILITY_WEIGHT)
+                  (findability_score * weights['findability'])
 
     return total_score
 
 # --- Recommendation Logic (non-cached) ---
+# 추천 결과는 팀 dict 대신 공유 아레나의 팀 번호(row) 리스트로 다룹니다.
+# JSON 변환은 실제로 응답에 실리는 팀(페이지)에 대해서만 TeamArena.team_record()로 수행합니다.
 
-def _get_ai_teams_all_inclusive_logic(selected_champions_tuple, champion_to_team_ids, team_id_to_team):
+def _get_ai_teams_all_inclusive_logic(selected_champions_tuple, dataset_name):
     """(AI 추천) 선택된 챔피언을 '모두 포함'하는 팀을 추천합니다. (ID 기준 정렬)"""
     selected_champions = set(selected_champions_tuple)
 
     if not selected_champions:
         return []
 
-    candidate_team_ids = None
-    for champ in selected_champions:
-        if champ not in champion_to_team_ids:
-            return []
-        current_champ_team_ids = champion_to_team_ids[champ]
-        if candidate_team_ids is None:
-            candidate_team_ids = current_champ_team_ids.copy()
-        else:
-            candidate_team_ids.intersection_update(current_champ_team_ids)
-        if not candidate_team_ids:
-            return []
+    view, _ = team_datasets.get(dataset_name)
+    if view is None:
+        return []
 
-    # ID 기준으로 정렬하여 반환
-    recommended_teams = [team_id_to_team[team_id] for team_id in sorted(list(candidate_team_ids))]
-    return recommended_teams
+    # 챔피언별 비트셋을 word 단위로 AND합니다. 켜진 비트를 앞에서부터 읽으므로 결과는 ID 순입니다.
+    candidate_bits = selection_bitsets.get(view, dataset_name, selected_champions)
+    return bitset_rows(candidate_bits).tolist()
 
-def _get_overlap_based_teams_logic(selected_champions_tuple, champion_to_team_ids, team_id_to_team):
+@lru_cache(maxsize=16384)
+def count_ai_teams_all_inclusive(selected_champions_tuple, dataset_name):
+    """
+    '모두 포함' 추천 팀 수. 3명 이하는 동시 출현 표에서 읽고,
+    그보다 많으면 팀 번호 목록을 만들지 않고 AND한 비트셋의 popcount로 셉니다.
+    """
+    if not selected_champions_tuple:
+        return 0
+    view, _ = team_datasets.get(dataset_name)
+    if view is None:
+        return 0
+    table_count = view.table_all_inclusive_count(selected_champions_tuple)
+    if table_count is not None:
+        return table_count
+    return bitset_count(selection_bitsets.get(view, dataset_name, selected_champions_tuple))
+
+def _get_overlap_based_teams_logic(selected_champions_tuple, dataset_name):
     """(AI 추천 2) 선택된 챔피언과 가장 많이 겹치는 팀을 추천합니다."""
     selected_champions = set(selected_champions_tuple)
 
     if not selected_champions:
         return []
 
-    relevant_team_ids = set()
-    for champ in selected_champions:
-        if champ in champion_to_team_ids:
-            relevant_team_ids.update(champion_to_team_ids[champ])
+    view, team_store = team_datasets.get(dataset_name)
+    if view is None:
+        return []
 
-    team_scores = []
-    for team_id in relevant_team_ids:
-        team = team_id_to_team[team_id]
-        overlap_count = len(set(team['champions']).intersection(selected_champions))
-        team_size = len(team['champions'])
-        score = (overlap_count, -team_size)
-        team_scores.append((team, score))
+    # 선택된 챔피언 중 한 명이라도 포함한 팀 (비트셋 OR)
+    rows = bitset_rows(selection_bitsets.get(view, dataset_name, selected_champions, all_inclusive=False))
+    if not rows.size:
+        return []
 
-    team_scores.sort(key=lambda x: x[1], reverse=True)
-    return [team for team, score in team_scores]
+    return rank_by_overlap(team_store, rows, selected_champions)
+
+def _get_similar_teams_logic(selected_champions_tuple, dataset_name, bands=None):
+    """
+    (유사 팀 추천) MinHash LSH로 선택과 비슷한 팀 후보만 꺼낸 뒤, 후보를 '겹치는' 로직과 같은 순서로 정확히 다시 정렬합니다.
+    데이터셋 전체의 합집합을 훑지 않는 근사 검색이며, bands로 재현율을 조절합니다.
+    """
+    selected_champions = set(selected_champions_tuple)
+
+    if not selected_champions:
+        return []
+
+    view, team_store = team_datasets.get(dataset_name)
+    if view is None:
+        return []
+
+    rows = view.similar_rows(selected_champions, bands)
+    if rows is None:
+        # LSH 색인이 없는 데이터셋은 정확한 '겹치는' 로직을 사용합니다.
+        return _get_overlap_based_teams_logic(selected_champions_tuple, dataset_name)
+    if not rows.size:
+        return []
+    return rank_by_overlap(team_store, rows, selected_champions)
+
+def _emblem_trait_counts(team_store, rows, emblems_tuple):
+    """rows 팀들의 (N, T) 시너지별 인원에 상징 인원을 더한 값과 그 순서의 단계 조회 표."""
+    tier_table = get_arena_tier_table(tuple(team_store.traits))
+    counts = tier_table.add_emblems(team_store.trait_counts[rows], team_store.size[rows], tier_table.emblem_vector(emblems_tuple))
+    return counts, tier_table
+
+def _get_scored_teams_logic(selected_champions_tuple, dataset_name, weights_tuple, emblems_tuple=()):
+    """
+    (종합 점수 추천) 선택된 챔피언 중 한 명 이상을 포함한 팀을 종합 점수 내림차순으로 추천합니다.
+    calculate_comprehensive_score와 같은 점수를 후보 전체에 대해 아레나 컬럼으로 한 번에 계산합니다.
+    상징이 있으면 시너지 단계 점수와 '완성 직전' 수만 상징을 더한 인원으로 다시 계산합니다.
+    """
+    selected_champions = set(selected_champions_tuple)
+
+    if not selected_champions:
+        return []
+
+    view, team_store = team_datasets.get(dataset_name)
+    if view is None:
+        return []
+
+    rows = bitset_rows(selection_bitsets.get(view, dataset_name, selected_champions, all_inclusive=False))
+    if not rows.size:
+        return []
+    synergy_scores = None
+    if emblems_tuple:
+        counts, tier_table = _emblem_trait_counts(team_store, rows, emblems_tuple)
+        synergy_scores = tier_table.score_counts(counts)
+    player_level = len(selected_champions)
+    scores = score_rows(team_store, rows, selected_champions, dict(weights_tuple),
+                        reroll_probabilities_data.get(player_level, {}), synergy_scores)
+    return rank_by_score(team_store, rows, scores)
+
+def _drop_emblem_broken_teams(team_store, rows, emblems_tuple):
+    """
+    완전 활성화 팀의 추천 결과(팀 번호 리스트 또는 RankedRows)에서, 상징을 더해 바뀐 시너지 인원이
+    활성화 단계가 아니게 되는 팀을 뺍니다. (makeTeam.check_team_validity()와 같은 규칙) 순서는 유지합니다.
+    """
+    members = rows.members if isinstance(rows, RankedRows) else np.asarray(rows, dtype=np.int64)
+    if not len(members):
+        return rows
+    counts, tier_table = _emblem_trait_counts(team_store, members, emblems_tuple)
+    broken = ~tier_table.is_fully_activated(counts, counts != team_store.trait_counts[members])
+    return exclude_rows(rows, rows_to_bitset(members[broken], team_store.num_words))
+
+@lru_cache(maxsize=None)
+def get_subset_spec(dataset_name):
+    """부분집합 데이터셋의 (기준 데이터셋, 명세). (team_store.SUBSET_DATASETS)"""
+    base_name, spec_factory = SUBSET_DATASETS[dataset_name]
+    return base_name, spec_factory()
+
+def _get_emblem_subset_teams_logic(selected_champions_tuple, dataset_name, emblems_tuple):
+    """
+    (상징 반영 '모두 포함') 부분집합 데이터셋의 명세를 상징을 더한 시너지 인원으로 다시 검사합니다.
+    기준 데이터셋에서 선택을 모두 포함한 팀이 후보이므로, 상징으로 목표 단계에 도달한 팀은 새로 들어오고
+    목표 인원을 넘어서 명세에서 벗어난 팀은 빠집니다. 결과는 ID 순입니다.
+    """
+    base_name, spec = get_subset_spec(dataset_name)
+    rows = np.asarray(_get_ai_teams_all_inclusive_logic(selected_champions_tuple, base_name), dtype=np.int64)
+    if not rows.size:
+        return []
+    _, team_store = team_datasets.get(base_name)
+    counts, tier_table = _emblem_trait_counts(team_store, rows, emblems_tuple)
+    return rows[tier_table.match_trait_spec(counts, spec)].tolist()
 
 # --- Cached Recommendation Wrappers ---
 
 @lru_cache(maxsize=16384)
 def get_ai_teams_all_inclusive_size_6(selected_champions_tuple):
-    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, champion_to_team_ids_6, team_id_to_team_6)
+    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, 'size_6')
 
 @lru_cache(maxsize=16384)
 def get_ai_teams_all_inclusive_size_8(selected_champions_tuple):
-    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, champion_to_team_ids_8, team_id_to_team_8)
+    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, 'size_8')
 
 @lru_cache(maxsize=16384)
 def get_overlap_based_teams_size_6(selected_champions_tuple):
-    return _get_overlap_based_teams_logic(selected_champions_tuple, champion_to_team_ids_6, team_id_to_team_6)
+    return _get_overlap_based_teams_logic(selected_champions_tuple, 'size_6')
 
 @lru_cache(maxsize=16384)
 def get_overlap_based_teams_size_8(selected_champions_tuple):
-    return _get_overlap_based_teams_logic(selected_champions_tuple, champion_to_team_ids_8, team_id_to_team_8)
+    return _get_overlap_based_teams_logic(selected_champions_tuple, 'size_8')
+
+@lru_cache(maxsize=16384)
+def get_similar_teams_size_8(selected_champions_tuple, bands=None):
+    return _get_similar_teams_logic(selected_champions_tuple, 'size_8', bands)
 
 # --- AI 추천 로직에서 filtered_compositions_all.jsonl 사용 ---
 @lru_cache(maxsize=16384)
 def get_ai_teams_all_inclusive_filtered(selected_champions_tuple):
-    return _get_ai_teams_all_inclusive_logic(
-        selected_champions_tuple, champion_to_team_ids_filtered, team_id_to_team_filtered
-    )
+    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, 'filtered')
 
 @lru_cache(maxsize=16384)
 def get_overlap_based_teams_filtered(selected_champions_tuple):
-    return _get_overlap_based_teams_logic(
-        selected_champions_tuple, champion_to_team_ids_filtered, team_id_to_team_filtered
-    )
+    return _get_overlap_based_teams_logic(selected_champions_tuple, 'filtered')
+
+@lru_cache(maxsize=1024)
+def get_scored_teams_all_sizes(selected_champions_tuple, weights_tuple, emblems_tuple=()):
+    return _get_scored_teams_logic(selected_champions_tuple, 'all_ai', weights_tuple, emblems_tuple)
 
 @lru_cache(maxsize=16384)
 def get_ai_teams_all_inclusive_all_sizes(selected_champions_tuple):
-    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, champion_to_team_ids_all_ai, team_id_to_team_all_ai)
+    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, 'all_ai')
 
 @lru_cache(maxsize=16384)
 def get_high_value_teams_all_inclusive(selected_champions_tuple):
     """'고밸류덱'에 대한 '모두 포함' 로직을 실행합니다."""
-    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, champion_to_team_ids_high_value, team_id_to_team_high_value)
+    return _get_ai_teams_all_inclusive_logic(selected_champions_tuple, 'high_value')
+
+@lru_cache(maxsize=1024)
+def get_high_value_teams_with_emblems(selected_champions_tuple, emblems_tuple):
+    """'고밸류덱'에 대한 '모두 포함' 로직을 상징을 반영해 실행합니다."""
+    return _get_emblem_subset_teams_logic(selected_champions_tuple, 'high_value', emblems_tuple)
 
 @lru_cache(maxsize=16384)
 def get_high_value_teams_overlap_based(selected_champions_tuple):
     """'고밸류덱'에 대한 '겹치는' 로직을 실행합니다."""
-    return _get_overlap_based_teams_logic(selected_champions_tuple, champion_to_team_ids_high_value, team_id_to_team_high_value)
+    return _get_overlap_based_teams_logic(selected_champions_tuple, 'high_value')
+
+# --- 추천 모드별 실행 (백엔드 공통 API) ---
+# 각 모드는 (데이터셋, 쿼리 종류)로 정의됩니다. 엔드포인트는 아래 세 함수만 사용하므로
+# 컬럼 저장소 백엔드와 SQLite 백엔드가 같은 결과를 돌려줍니다.
+RECOMMENDATION_MODES = {
+    'ai': ('all_ai', 'all_inclusive'),
+    'ai_any': ('size_8', 'overlap'),
+    'ai_similar': ('size_8', 'similar'),
+    'ai_score': ('all_ai', 'score'),
+    'high_value': ('high_value', 'all_inclusive'),
+}
+# 상징을 반영하는 모드. 종합 점수 모드는 상징을 더한 인원으로 채점하고, high_value는 명세를 다시 검사하며,
+# 완전 활성화 팀을 그대로 추천하는 ACTIVATION_MODES는 상징이 시너지 인원을 활성화 단계에서 벗어나게 하는 팀을 뺍니다.
+ACTIVATION_MODES = ('ai', 'ai_any', 'ai_similar')
+EMBLEM_MODES = (*ACTIVATION_MODES, 'ai_score', 'high_value')
+
+def recommendation_dataset(mode, emblems_tuple=()):
+    """모드의 추천 팀이 속한 데이터셋. 상징을 반영한 부분집합 모드는 기준 데이터셋에서 팀을 다시 고릅니다."""
+    dataset_name, _ = RECOMMENDATION_MODES[mode]
+    if emblems_tuple and dataset_name in SUBSET_DATASETS:
+        return SUBSET_DATASETS[dataset_name][0]
+    return dataset_name
+
+def score_weights_tuple(weights=None):
+    """기본 가중치에 요청의 가중치를 덮어쓴 ((요소, 가중치), ...) 튜플 (캐시 키). 알 수 없는 요소이면 ValueError."""
+    merged = dict(DEFAULT_SCORE_WEIGHTS)
+    for component, weight in (weights or {}).items():
+        if component not in SCORE_COMPONENTS or not isinstance(weight, (int, float)):
+            raise ValueError(f"잘못된 가중치: {component}={weight!r}")
+        merged[component] = float(weight)
+    return tuple(sorted(merged.items()))
+
+def _get_store_recommendation(mode, selected_champions_tuple, weights_tuple=None, emblems_tuple=(), bands=None):
+    """
+    컬럼 저장소 백엔드: (추천 팀 번호 리스트, 저장소)를 반환합니다.
+    weights_tuple은 종합 점수 모드에만, emblems_tuple은 EMBLEM_MODES에만, bands는 유사 팀 모드에만 쓰입니다.
+    """
+    dataset_name = recommendation_dataset(mode, emblems_tuple)
+    if mode == 'ai_any':
+        rows = get_overlap_based_teams_size_8(selected_champions_tuple)
+    elif mode == 'ai_similar':
+        rows = get_similar_teams_size_8(selected_champions_tuple, bands)
+    elif mode == 'ai_score':
+        rows = get_scored_teams_all_sizes(selected_champions_tuple, weights_tuple or score_weights_tuple(), emblems_tuple)
+    elif mode == 'high_value' and emblems_tuple:
+        rows = get_high_value_teams_with_emblems(selected_champions_tuple, emblems_tuple)
+    elif mode == 'high_value':
+        rows = get_high_value_teams_all_inclusive(selected_champions_tuple)
+    else:
+        rows = get_ai_teams_all_inclusive_all_sizes(selected_champions_tuple)
+    team_store = team_datasets.get(dataset_name)[1]
+    if emblems_tuple and mode in ACTIVATION_MODES:
+        rows = _drop_emblem_broken_teams(team_store, rows, emblems_tuple)
+    return rows, team_store
+
+@lru_cache(maxsize=1024)
+def _get_adjusted_store_recommendation(mode, selected_champions_tuple, excluded_tuple, penalties_tuple, weights_tuple=None,
+                                      emblems_tuple=(), bands=None):
+    """
+    제외/벌점/상징이 적용된 컬럼 저장소 추천 결과. (팀 번호 리스트 또는 RankedRows, 저장소)
+    제외 챔피언은 그 챔피언들의 역색인 합집합을 추천 후보에서 빼는 방식으로 처리하고,
+    벌점은 추천 순서를 유지한 채 벌점 합이 작은 팀부터 오도록 다시 묶습니다.
+    """
+    rows, team_store = _get_store_recommendation(mode, selected_champions_tuple, weights_tuple, emblems_tuple, bands)
+    if excluded_tuple:
+        view, _ = team_datasets.get(recommendation_dataset(mode, emblems_tuple))
+        rows = exclude_rows(rows, view.any_bits(excluded_tuple))
+    if penalties_tuple:
+        rows = rank_with_penalties(team_store, rows, dict(penalties_tuple))
+    return rows, team_store
+
+def _iter_db_records(mode, selected_champions_tuple, emblems_tuple=(), sql_spec=None):
+    """
+    SQLite 백엔드: 추천 순서대로 팀 dict를 돌려줍니다. sql_spec(SQL_SPEC_KEYS만 담은 필터 명세)은 SQL 안에서 거릅니다.
+    상징을 반영한 부분집합 모드는 기준 데이터셋의 '모두 포함' 팀을 상징을 더한 시너지 인원으로 명세에 다시 검사합니다.
+    """
+    dataset_name, kind = RECOMMENDATION_MODES[mode]
+    if emblems_tuple and mode in ACTIVATION_MODES:
+        emblem_vector = trait_tier_table.emblem_vector(emblems_tuple)
+
+        def keeps_activation(record):
+            counts = trait_tier_table.trait_counts(record['champions'])
+            adjusted = trait_tier_table.add_emblems(counts, len(record['champions']), emblem_vector)
+            return bool(trait_tier_table.is_fully_activated(adjusted[None, :], (adjusted != counts)[None, :])[0])
+
+        return (record for record in team_db.iter_records(dataset_name, kind, selected_champions_tuple, sql_spec)
+                if keeps_activation(record))
+    if not (emblems_tuple and dataset_name in SUBSET_DATASETS):
+        return team_db.iter_records(dataset_name, kind, selected_champions_tuple, sql_spec)
+    base_name, spec = get_subset_spec(dataset_name)
+    emblem_vector = trait_tier_table.emblem_vector(emblems_tuple)
+
+    def matches(record):
+        counts = trait_tier_table.add_emblems(trait_tier_table.trait_counts(record['champions']), len(record['champions']), emblem_vector)
+        return bool(trait_tier_table.match_trait_spec(counts[None, :], spec)[0])
+
+    return (record for record in team_db.iter_records(base_name, 'all_inclusive', selected_champions_tuple, sql_spec)
+            if matches(record))
+
+def _score_db_records(records, selected_champions_tuple, weights_tuple, emblems_tuple=()):
+    """SQLite 백엔드: 후보 팀 dict를 calculate_comprehensive_score로 채점해 점수 내림차순, 팀 ID 오름차순으로 정렬합니다."""
+    weights = dict(weights_tuple)
+    selected_champions = set(selected_champions_tuple)
+    emblem_vector = trait_tier_table.emblem_vector(emblems_tuple) if emblems_tuple else None
+    scored = []
+    for record in records:
+        score = calculate_comprehensive_score(record, selected_champions, champion_data, trait_tier_table,
+                                              reroll_probabilities_data, weights, emblem_vector)
+        scored.append((-round(score, 6), record['id'], record))
+    scored.sort(key=lambda item: item[:2])
+    return [record for _, _, record in scored]
+
+def _adjust_db_records(records, excluded_tuple, penalties_tuple):
+    """SQLite 백엔드: 추천 순서의 팀 dict에 제외/벌점을 적용합니다. 벌점이 있으면 전체를 읽어 안정 정렬합니다."""
+    excluded = set(excluded_tuple)
+    records = (record for record in records if excluded.isdisjoint(record['champions']))
+    if not penalties_tuple:
+        return records
+    penalties = dict(penalties_tuple)
+    return iter(sorted(records, key=lambda record: sum(penalties.get(champ, 0) for champ in record['champions'])))
+
+@lru_cache(maxsize=16384)
+def _get_db_recommended_count(mode, selected_champions_tuple):
+    dataset_name, kind = RECOMMENDATION_MODES[mode]
+    return team_db.count(dataset_name, kind, selected_champions_tuple)
+
+def get_recommended_count(mode, selected_champions_tuple, bands=None):
+    """추천되는 팀의 수를 반환합니다. bands는 get_recommended_page()와 같습니다."""
+    if team_db is not None:
+        return _get_db_recommended_count(mode, selected_champions_tuple)
+    dataset_name, kind = RECOMMENDATION_MODES[mode]
+    if kind == 'all_inclusive':
+        return count_ai_teams_all_inclusive(selected_champions_tuple, dataset_name)
+    view, _ = team_datasets.get(dataset_name)
+    table_count = view.table_any_count(selected_champions_tuple) if view is not None and kind in ('overlap', 'score') else None
+    if table_count is not None:
+        return table_count
+    return len(_get_store_recommendation(mode, selected_champions_tuple, bands=bands)[0])
+
+def _iter_rows_in_bitset(rows, bits, chunk_size=1024):
+    """추천 순서를 유지하며 비트셋에 속한 팀 번호만 꺼냅니다. 순위 커서는 chunk_size개씩만 꺼내 검사합니다."""
+    for start in range(0, len(rows), chunk_size):
+        chunk = np.asarray(rows[start:start + chunk_size], dtype=np.int64)
+        yield from chunk[rows_in_bitset(chunk, bits)].tolist()
+
+def get_recommended_page(mode, selected_champions_tuple, offset, limit, filter_spec_json=None, excluded_tuple=(), penalties_tuple=(),
+                         weights_tuple=None, emblems_tuple=(), bands=None):
+    """
+    추천 순서대로 offset부터 limit개의 팀 dict를 반환합니다. 필터 명세(JSON 문자열)가 있으면 통과한 팀만 셉니다.
+    excluded_tuple의 챔피언을 포함한 팀은 빼고, penalties_tuple((챔피언, 벌점) 쌍)이 있으면 벌점 합이 작은 팀부터 돌려줍니다.
+    weights_tuple은 종합 점수 모드의 가중치입니다. (score_weights_tuple() 참고)
+    emblems_tuple은 보유한 상징의 시너지 이름이며, EMBLEM_MODES에서 시너지 단계를 상징을 더한 인원으로 다시 확인합니다.
+    bands는 유사 팀 모드가 사용할 LSH band 수입니다. (None: 전체, SQLite 백엔드는 정확한 순서이므로 무시)
+    잘못된 명세이면 ValueError를 발생시킵니다.
+    """
+    dataset_name, kind = RECOMMENDATION_MODES[mode]
+    if team_db is not None:
+        if kind != 'score' and filter_spec_json is None and not excluded_tuple and not penalties_tuple and not emblems_tuple:
+            return team_db.page(dataset_name, kind, selected_champions_tuple, offset, limit)
+        # 명세의 시너지/챔피언 조건은 SQL(team_traits, team_champions)에서, 나머지 조건만 팀 dict로 검사합니다.
+        sql_spec, rest_spec = None, {}
+        if filter_spec_json is not None:
+            get_compiled_filter(filter_spec_json)  # 잘못된 명세이면 여기서 ValueError
+            sql_spec, rest_spec = split_sql_spec(json.loads(filter_spec_json))
+        records = _iter_db_records(mode, selected_champions_tuple, emblems_tuple, sql_spec)
+        if rest_spec:
+            compiled_filter = get_compiled_filter(json.dumps(rest_spec, ensure_ascii=False, sort_keys=True))
+            records = (record for record in records if compiled_filter.match_champions(record['champions']))
+        if kind == 'score':
+            records = _score_db_records(records, selected_champions_tuple, weights_tuple or score_weights_tuple(), emblems_tuple)
+        records = _adjust_db_records(records, excluded_tuple, penalties_tuple)
+        return list(itertools.islice(records, offset, offset + limit))
+
+    rows, team_store = _get_adjusted_store_recommendation(mode, selected_champions_tuple, excluded_tuple, penalties_tuple, weights_tuple,
+                                                          emblems_tuple, bands)
+    if filter_spec_json is None:
+        page_rows = rows[offset:offset + limit]
+    else:
+        # 명세를 만족하는 팀의 비트셋을 한 번 구해 두고, 추천 순서대로 페이지 끝까지만 비트를 검사합니다.
+        filter_bits = get_query_bits(recommendation_dataset(mode, emblems_tuple), filter_spec_json)
+        page_rows = list(itertools.islice(_iter_rows_in_bitset(rows, filter_bits), offset, offset + limit))
+    # 응답에 실리는 페이지의 팀만 JSON으로 변환합니다.
+    return [team_store.team_record(row) for row in page_rows]
+
+def get_recommended_champion_names(mode, selected_champions_tuple, excluded_tuple=(), emblems_tuple=(), bands=None):
+    """
+    추천 팀들에 한 번이라도 포함된 챔피언 이름 리스트를 반환합니다. excluded_tuple의 챔피언을 포함한 팀은 뺍니다.
+    emblems_tuple, bands는 get_recommended_page()와 같습니다.
+    """
+    if team_db is not None:
+        dataset_name, kind = RECOMMENDATION_MODES[mode]
+        if excluded_tuple or emblems_tuple:
+            records = _adjust_db_records(_iter_db_records(mode, selected_champions_tuple, emblems_tuple), excluded_tuple, ())
+            return sorted({champ for record in records for champ in record['champions']})
+        return team_db.champion_names(dataset_name, kind, selected_champions_tuple)
+    rows, team_store = _get_adjusted_store_recommendation(mode, selected_champions_tuple, excluded_tuple, (), None, emblems_tuple, bands)
+    # 추천 팀들의 챔피언 비트마스크를 OR하여 한 번에 모읍니다. (순서와 무관하므로 순위 커서는 팀 번호 순 목록을 사용)
+    if isinstance(rows, RankedRows):
+        rows = rows.members
+    return team_store.champions_in_rows(rows) if len(rows) else []
+
+@lru_cache(maxsize=1024)
+def _get_champion_count_vector(mode, selected_champions_tuple):
+    """
+    선택에 각 챔피언을 추가했을 때의 '모두 포함' 추천 팀 수를 (챔피언 이름, 팀 수) 튜플로 반환합니다.
+    선택이 2명 이하면 동시 출현 표의 한 줄을 그대로 읽고, 그보다 많으면
+    현재 추천 팀들을 한 번만 훑으며 챔피언별 포함 횟수를 세므로, 챔피언마다 교집합을 다시 구하지 않습니다.
+    """
+    dataset_name, _ = RECOMMENDATION_MODES[mode]
+    if team_db is not None:
+        return tuple(team_db.champion_counts(dataset_name, selected_champions_tuple).items())
+
+    view, team_store = team_datasets.get(dataset_name)
+    if view is None:
+        return ()
+    counts = view.table_champion_counts(selected_champions_tuple)
+    if counts is None:
+        rows, _ = _get_store_recommendation(mode, selected_champions_tuple)
+        counts = team_store.champion_counts(np.asarray(rows, dtype=np.int64))
+    return tuple(zip(team_store.champions, counts.tolist()))
+
+def get_champion_counts(mode, selected_champions_tuple):
+    """{챔피언: 그 챔피언을 추가했을 때 추천되는 팀 수}. 이미 선택된 챔피언과 0팀인 챔피언은 제외합니다."""
+    return {
+        champ_name: count
+        for champ_name, count in _get_champion_count_vector(mode, selected_champions_tuple)
+        if count and champ_name not in selected_champions_tuple
+    }
+
+@lru_cache(maxsize=4096)
+def get_deactivation_counts(mode, selected_champions_tuple, bands=None):
+    """
+    선택에서 챔피언을 한 명씩 뺐을 때의 추천 팀 수 {챔피언: 팀 수}.
+    나머지가 3명 이하면 동시 출현 표를 읽고, 그보다 많으면 앞쪽/뒤쪽 누적 비트셋으로 한 번에 계산합니다.
+    유사 팀 모드는 비트셋으로 셀 수 없으므로 한 명씩 뺀 선택마다 LSH 후보 수를 셉니다.
+    """
+    if len(selected_champions_tuple) < 2:
+        return {champ_name: 0 for champ_name in selected_champions_tuple}
+
+    dataset_name, kind = RECOMMENDATION_MODES[mode]
+    view = team_datasets.get(dataset_name)[0] if team_db is None else None
+    if view is None or kind == 'similar' or len(selected_champions_tuple) - 1 <= MAX_TABLE_CHAMPIONS:
+        return {
+            champ_name: get_recommended_count(mode, tuple(c for c in selected_champions_tuple if c != champ_name), bands)
+            for champ_name in selected_champions_tuple
+        }
+    # 한 명씩 뺀 선택의 비트셋은 캐시에 남으므로, 이후 챔피언을 제외하면 다시 계산하지 않습니다.
+    bitsets = selection_bitsets.put_leave_one_out(view, dataset_name, selected_champions_tuple, all_inclusive=(kind == 'all_inclusive'))
+    return {champ_name: bitset_count(bits) for champ_name, bits in zip(selected_champions_tuple, bitsets)}
+
+@lru_cache(maxsize=128)
+def get_compiled_filter(filter_spec_json):
+    """요청으로 받은 필터 명세(JSON 문자열)를 컴파일합니다. 같은 명세는 한 번만 컴파일됩니다."""
+    return compile_filter_spec(json.loads(filter_spec_json), champion_data, synergy_levels_data)
 
 def calculate_champion_synergies(champion_name, traits_data):
     """특정 챔피언의 시너지를 계산합니다. (데이터 직접 참조)"""
@@ -496,6 +689,59 @@ def calculate_current_synergies(selected_champions, traits_data):
         print(f"시너지 계산 오류: {e}")
         return set()
 
+def get_exclusion_args():
+    """
+    요청의 제외/벌점 조건을 읽습니다. (다른 플레이어가 가져가는 챔피언)
+        excluded   쉼표로 구분한 챔피언 이름. 이 챔피언을 포함한 팀은 추천에서 뺍니다.
+        penalties  {챔피언: 벌점} JSON. 이 챔피언을 포함한 팀은 벌점 합만큼 뒤로 밀립니다.
+    반환값: (제외 챔피언 튜플, (챔피언, 벌점) 튜플) — 캐시 키로 쓸 수 있도록 정렬되어 있습니다.
+    """
+    excluded = {name for name in request.args.get('excluded', '').split(',') if name}
+    penalties = json.loads(request.args.get('penalties', '{}'))
+    if not isinstance(penalties, dict) or not all(isinstance(w, (int, float)) for w in penalties.values()):
+        raise ValueError("penalties는 {챔피언: 숫자} 형식이어야 합니다.")
+    unknown = (excluded | set(penalties)) - set(champion_data)
+    if unknown:
+        raise ValueError(f"알 수 없는 챔피언: {', '.join(sorted(unknown))}")
+    penalties_tuple = tuple(sorted((name, float(w)) for name, w in penalties.items() if w and name not in excluded))
+    return tuple(sorted(excluded)), penalties_tuple
+
+def get_emblem_args(mode):
+    """
+    요청의 상징 목록을 읽습니다. emblems: 쉼표로 구분한 시너지 이름 (같은 상징이 여러 개면 반복).
+    반환값: 정렬된 시너지 이름 튜플 (캐시 키). 상징은 EMBLEM_MODES에만 반영되므로 다른 모드에서는 빈 튜플입니다.
+    알 수 없는 시너지이면 ValueError를 발생시킵니다.
+    """
+    emblems = tuple(sorted(name for name in request.args.get('emblems', '').split(',') if name))
+    trait_tier_table.emblem_vector(emblems)
+    return emblems if mode in EMBLEM_MODES else ()
+
+def get_bands_arg(mode):
+    """
+    요청의 LSH band 수를 읽습니다. bands: 1 이상, 저장된 LSH 색인의 band 수 이하의 정수.
+    반환값: band 수 또는 None(전체 band). 유사 팀 모드가 아니거나 LSH 색인이 없으면(SQLite 백엔드 포함) None이며,
+    저장된 band 수와 같은 값도 None으로 돌려주어 기본 요청과 캐시를 공유합니다.
+    잘못된 값이면 ValueError를 발생시킵니다.
+    """
+    value = request.args.get('bands')
+    if value is None or team_db is not None:
+        return None
+    dataset_name, _ = RECOMMENDATION_MODES['ai_similar']
+    view, _ = team_datasets.get(dataset_name)
+    if view is None or view.lsh is None:
+        return None
+    try:
+        bands = int(value)
+    except ValueError:
+        raise ValueError(f"bands는 정수여야 합니다: {value!r}")
+    if not 1 <= bands <= view.lsh.num_bands:
+        raise ValueError(f"bands는 1~{view.lsh.num_bands} 사이여야 합니다: {bands}")
+    return bands if mode == 'ai_similar' and bands < view.lsh.num_bands else None
+
+def get_count_mode(mode):
+    """카운트 엔드포인트가 쓰는 모드. 겹치는 수 기반 모드와 종합 점수 모드는 그대로, 나머지는 ai로 셉니다."""
+    return mode if mode in ('ai_any', 'ai_similar', 'ai_score') else 'ai'
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -508,29 +754,185 @@ def get_teams():
     page = request.args.get('page', 0, type=int)
     page_size = 30
 
-    all_recommended_teams = []
-
     if not selected_champions:
         # 다른 모드에서는 선택된 챔피언이 없으면 빈 목록을 반환합니다.
         return jsonify([])
-    else:
-        # 선택된 챔피언이 있는 경우
-        selected_champions_tuple = tuple(sorted(selected_champions))
-
-        if mode == 'ai_any':
-            all_recommended_teams = get_overlap_based_teams_size_8(selected_champions_tuple)
-        elif mode == 'high_value':
-            all_recommended_teams = get_high_value_teams_all_inclusive(selected_champions_tuple)
-        else:  # mode == 'ai'
-            all_recommended_teams = get_ai_teams_all_inclusive_all_sizes(selected_champions_tuple)
 
-    # 모든 경우에 대해 페이지네이션 적용
-    start_index = page * page_size
-    end_index = start_index + page_size
-    recommended_teams = all_recommended_teams[start_index:end_index]
+    # 선택된 챔피언이 있는 경우
+    selected_champions_tuple = tuple(sorted(selected_champions))
+    if mode not in RECOMMENDATION_MODES:
+        mode = 'ai'
 
+    # 필터 명세가 주어지면 페이지네이션 전에 적용합니다. (filter_spec.py 참고)
+    filter_spec_json = request.args.get('filter') or None
+    # 요청 인자는 따로 읽어, 오류 메시지에 잘못된 인자 이름을 밝힙니다.
+    try:
+        excluded_tuple, penalties_tuple = get_exclusion_args()
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 제외/벌점 조건 (excluded/penalties): {e}'}), 400
+    try:
+        # 종합 점수 모드의 가중치 (예: weights={"cost": 0, "findability": 20})
+        weights_tuple = score_weights_tuple(json.loads(request.args.get('weights', '{}'))) if mode == 'ai_score' else None
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 가중치 (weights): {e}'}), 400
+    try:
+        # 보유한 상징 (예: emblems=별 수호자,별 수호자)
+        emblems_tuple = get_emblem_args(mode)
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 상징 (emblems): {e}'}), 400
+    try:
+        # 유사 팀 모드의 LSH band 수 (예: bands=8, 적을수록 후보와 재현율이 줄어듭니다)
+        bands = get_bands_arg(mode)
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 band 수 (bands): {e}'}), 400
+    try:
+        # 모든 경우에 대해 페이지네이션 적용
+        recommended_teams = get_recommended_page(mode, selected_champions_tuple, page * page_size, page_size,
+                                                 filter_spec_json, excluded_tuple, penalties_tuple, weights_tuple, emblems_tuple,
+                                                 bands)
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 필터 명세 (filter): {e}'}), 400
     return jsonify(recommended_teams)
 
+@lru_cache(maxsize=256)
+def get_query_rows(dataset_name, spec_json):
+    """
+    데이터셋에서 필터 명세(JSON 문자열)를 만족하는 팀 번호 배열 (ID 순)과 실행 계획 설명을 반환합니다.
+    명세는 team_query.execute_query()의 실행 계획(드문 조건부터, 컬럼 조건은 마지막)으로 계산됩니다.
+    """
+    view, _ = team_datasets.get(dataset_name)
+    if view is None:
+        return np.zeros(0, dtype=np.int64), ()
+    spec = json.loads(spec_json)
+    if not isinstance(spec, dict):
+        raise ValueError("명세는 JSON 객체여야 합니다.")
+    rows, explain = execute_query(view, spec)
+    return rows, tuple(explain)
+
+@lru_cache(maxsize=128)
+def get_query_bits(dataset_name, spec_json):
+    """get_query_rows()의 결과를 비트셋으로 반환합니다. (추천 순서를 유지한 채 필터링할 때 사용)"""
+    rows, _ = get_query_rows(dataset_name, spec_json)
+    _, team_store = team_datasets.get(dataset_name)
+    if team_store is None:
+        return np.zeros(0, dtype=np.uint64)
+    return rows_to_bitset(rows, team_store.num_words)
+
+@app.route('/api/trait_query')
+def trait_query():
+    """
+    시너지 단계 조건과 챔피언 조건을 조합한 팀 검색.
+    spec: 필터 명세 JSON (filter_spec.py 형식, 예: {"required_traits": {"별 수호자": 8}})
+    synergy_tiers: synergy_level.json의 등급 목록 (예: 골드,프리즘). 해당 등급 중 하나를 달성한 팀으로 제한합니다.
+    selected=1: 현재 선택된 챔피언을 모두 포함하는 팀으로 제한합니다.
+    """
+    dataset_name = request.args.get('dataset', 'all_ai')
+    page = request.args.get('page', 0, type=int)
+    page_size = 30
+    if not team_datasets.has_dataset(dataset_name):
+        return jsonify({'error': f'알 수 없는 데이터셋: {dataset_name}'}), 400
+    if page < 0:
+        return jsonify({'error': f'page는 0 이상이어야 합니다: {page}'}), 400
+
+    try:
+        spec = json.loads(request.args.get('spec', '{}'))
+        check_spec(spec)
+        synergy_tiers = [tier for tier in request.args.get('synergy_tiers', '').split(',') if tier]
+        if synergy_tiers:
+            tier_levels = spec_from_synergy_levels(synergy_levels_data, synergy_tiers)['any_trait_levels']
+            any_trait_levels = dict(spec.get('any_trait_levels', {}))
+            for trait, levels in tier_levels.items():
+                existing = any_trait_levels.get(trait, [])
+                any_trait_levels[trait] = (existing if isinstance(existing, list) else [existing]) + levels
+            spec['any_trait_levels'] = any_trait_levels
+        if request.args.get('selected') == '1':
+            spec['include_champions'] = sorted(set(spec.get('include_champions', [])) | get_selected_champions())
+        rows, _ = get_query_rows(dataset_name, json.dumps(spec, ensure_ascii=False, sort_keys=True))
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 검색 조건: {e}'}), 400
+
+    _, team_store = team_datasets.get(dataset_name)
+    page_rows = rows[page * page_size:(page + 1) * page_size].tolist()
+    return jsonify({'count': int(rows.size), 'teams': [team_store.team_record(row) for row in page_rows]})
+
+# /api/query 한 페이지의 최대 팀 수
+MAX_QUERY_PAGE_SIZE = 200
+
+def encode_query_cursor(position, query_key):
+    """정렬 순서 안의 위치를 커서 문자열로 만듭니다. 다른 검색 조건의 커서를 구분하도록 조건의 체크섬을 붙입니다."""
+    return f'{position}-{zlib.crc32(query_key.encode("utf-8")):08x}'
+
+def decode_query_cursor(cursor, query_key):
+    """encode_query_cursor()의 역. 형식이 잘못되었거나 다른 검색 조건의 커서이면 ValueError."""
+    position, _, checksum = str(cursor).partition('-')
+    if not position.isdigit() or checksum != f'{zlib.crc32(query_key.encode("utf-8")):08x}':
+        raise ValueError("이 검색 조건의 커서가 아닙니다.")
+    return int(position)
+
+@app.route('/api/query', methods=['GET', 'POST'])
+def composite_query():
+    """
+    복합 팀 검색. POST JSON 본문 또는 GET의 q 파라미터(JSON)로 검색 조건을 받습니다.
+        dataset            데이터셋 이름 (기본 all_ai)
+        filter             필터 명세 (filter_spec.py 형식: 포함/제외 챔피언, 시너지 단계, 인원, 코스트, 골드/프리즘 수)
+        selected           true이면 현재 선택된 챔피언을 모두 포함하는 팀으로 제한
+        sort               'id' | 'overlap' | 팀 컬럼 (size, total_cost, synergy_tier_score, almost_complete,
+                           gold_traits, prism_traits, highest_tier, 앞에 '-'면 내림차순)
+        overlap_champions  sort가 overlap일 때 겹치는 수를 셀 챔피언 (기본: 현재 선택)
+        page, page_size    페이지 (page_size는 최대 MAX_QUERY_PAGE_SIZE)
+        cursor             이전 응답의 next_cursor. 주면 page 대신 그 위치부터 이어서 반환 (미리 계산된 정렬에서만)
+        counts             true이면 결과 팀들의 챔피언별 포함 횟수를 함께 반환
+        explain            true이면 실행 계획 설명을 함께 반환
+    """
+    if team_db is not None:
+        return jsonify({'error': '복합 검색은 팀 저장소 백엔드에서만 지원합니다.'}), 400
+    try:
+        query = request.get_json(silent=True) if request.method == 'POST' else json.loads(request.args.get('q', '{}'))
+        if not isinstance(query, dict):
+            raise ValueError("검색 조건은 JSON 객체여야 합니다.")
+        dataset_name = query.get('dataset', 'all_ai')
+        if not team_datasets.has_dataset(dataset_name):
+            raise ValueError(f"알 수 없는 데이터셋: {dataset_name}")
+        check_spec(query.get('filter', {}))
+        spec = dict(query.get('filter', {}))
+        if query.get('selected'):
+            spec['include_champions'] = sorted(set(spec.get('include_champions', [])) | get_selected_champions())
+        page = int(query.get('page', 0))
+        page_size = min(int(query.get('page_size', 30)), MAX_QUERY_PAGE_SIZE)
+        if page < 0 or page_size <= 0:
+            raise ValueError(f"page는 0 이상, page_size는 1 이상이어야 합니다: page={page}, page_size={page_size}")
+        sort = query.get('sort', 'id')
+        spec_json = json.dumps(spec, ensure_ascii=False, sort_keys=True)
+        rows, explain = get_query_rows(dataset_name, spec_json)
+        view, team_store = team_datasets.get(dataset_name)
+        next_cursor = None
+        if sort == 'id' or view.sort_order(sort) is not None:
+            # 미리 계산된 순서(비트셋 자체 또는 정렬 순열)를 커서 위치부터 훑어 한 페이지만 꺼냅니다.
+            query_key = f'{dataset_name}|{spec_json}|{sort}'
+            position, skip = (decode_query_cursor(query['cursor'], query_key), 0) if query.get('cursor') else (0, page * page_size)
+            query_bits = get_query_bits(dataset_name, spec_json)
+            if sort == 'id':
+                page_rows, next_position = page_in_bitset(query_bits, position, page_size, skip)
+            else:
+                page_rows, next_position = page_in_order(view.sort_order(sort), query_bits, position, page_size, skip)
+            if next_position is not None:
+                next_cursor = encode_query_cursor(next_position, query_key)
+        else:
+            overlap_champions = query.get('overlap_champions') or sorted(get_selected_champions())
+            page_rows = sort_rows(team_store, rows, sort, overlap_champions)[page * page_size:(page + 1) * page_size]
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'잘못된 검색 조건: {e}'}), 400
+
+    response = {'count': int(rows.size), 'teams': [team_store.team_record(row) for row in page_rows]}
+    if next_cursor is not None:
+        response['next_cursor'] = next_cursor
+    if query.get('counts'):
+        counts = team_store.champion_counts(rows) if rows.size else np.zeros(0, dtype=np.int64)
+        response['champion_counts'] = {champ_name: count for champ_name, count in zip(team_store.champions, counts.tolist()) if count}
+    if query.get('explain'):
+        response['plan'] = list(explain)
+    return jsonify(response)
+
 @app.route('/api/all_champion_data')
 def get_all_champion_data():
     """모든 챔피언 데이터를 반환합니다."""
@@ -640,64 +1042,7 @@ def calculate_synergies():
         selected_champions = get_selected_champions()
         if not selected_champions:
             return jsonify([])
-
-        with open('tft_champion_traits.json', 'r', encoding='utf-8') as f:
-            champion_traits = json.load(f)
-        champion_traits_dict = {champ['name']: champ['traits'] for champ in champion_traits['champions_and_traits']}
-
-        with open('synergy_counts.json', 'r', encoding='utf-8') as f:
-            synergy_counts = json.load(f)
-        synergy_counts_dict = {}
-        for item in synergy_counts:
-            synergy_name = item['synergy_name']
-            count = item['count']
-            if synergy_name not in synergy_counts_dict:
-                synergy_counts_dict[synergy_name] = []
-            synergy_counts_dict[synergy_name].append(count)
-
-        current_synergies = {}
-        for champion in selected_champions:
-            if champion in champion_traits_dict:
-                for trait in champion_traits_dict[champion]:
-                    if trait not in current_synergies:
-                        current_synergies[trait] = 0
-                    current_synergies[trait] += 1
-
-        active_synergies = []
-        for trait, count in current_synergies.items():
-            if trait in synergy_counts_dict:
-                activation_levels = sorted(synergy_counts_dict[trait])
-                current_level = None
-                next_level = None
-                
-                for level in activation_levels:
-                    if count >= level:
-                        current_level = level
-                    else:
-                        next_level = level
-                        break
-
-                if current_level is not None:
-                    active_synergies.append({
-                        'name': trait,
-                        'count': count,
-                        'current_level': current_level,
-                        'next_level': next_level,
-                        'max_level': activation_levels[-1]
-                    })
-                elif count > 0:
-                    active_synergies.append({
-                        'name': trait,
-                        'count': count,
-                        'current_level': 0,
-                        'next_level': activation_levels[0],
-                        'max_level': activation_levels[-1]
-                    })
-
-        active_synergies.sort(key=lambda x: (-x['count'], x['name']))
-        
-        return jsonify(active_synergies)
-
+        return jsonify(trait_tier_table.board_synergies(selected_champions))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -710,22 +1055,39 @@ def get_all_recommended_champions():
     if not selected_champions:
         return jsonify([])
 
-    selected_champions_tuple = tuple(sorted(selected_champions))
-    all_recommended_teams = []
-
-    if mode == 'ai':
-        all_recommended_teams = get_ai_teams_all_inclusive_all_sizes(selected_champions_tuple)
-    elif mode == 'ai_any':
-        all_recommended_teams = get_overlap_based_teams_size_8(selected_champions_tuple)
-    elif mode == 'high_value':
-        all_recommended_teams = get_high_value_teams_all_inclusive(selected_champions_tuple)
-
-    recommended_champion_set = set()
-    for team in all_recommended_teams:
-        for champion in team['champions']:
-            recommended_champion_set.add(champion)
+    if mode not in RECOMMENDATION_MODES:
+        return jsonify([])
 
-    return jsonify(list(recommended_champion_set))
+    selected_champions_tuple = tuple(sorted(selected_champions))
+    try:
+        excluded_tuple, _ = get_exclusion_args()
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 제외/벌점 조건 (excluded/penalties): {e}'}), 400
+    try:
+        emblems_tuple = get_emblem_args(mode)
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 상징 (emblems): {e}'}), 400
+    try:
+        bands = get_bands_arg(mode)
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 band 수 (bands): {e}'}), 400
+    return jsonify(get_recommended_champion_names(mode, selected_champions_tuple, excluded_tuple, emblems_tuple, bands))
+
+@app.route('/api/team/<team_id>')
+def get_team(team_id):
+    """팀 ID(챔피언 구성으로 정해지는 ID)로 팀과, 그 팀을 포함한 데이터셋 목록을 반환합니다."""
+    if team_db is not None:
+        record, datasets = team_db.find_team(team_id)
+    else:
+        team_store = team_datasets.arena()
+        row = team_store.row_of_team_id(team_id) if team_store is not None else None
+        record, datasets = None, []
+        if row is not None:
+            record = team_store.team_record(row)
+            datasets = team_datasets.datasets_containing(row)
+    if record is None:
+        return jsonify({'error': f'알 수 없는 팀 ID: {team_id}'}), 404
+    return jsonify({'team': record, 'datasets': datasets})
 
 @app.route('/api/item_recommendations/<champion_name>')
 def get_item_recommendations(champion_name):
@@ -747,18 +1109,13 @@ def get_recommended_champion_count(champion_name):
         # 캐시 키로 사용하기 위해 튜플로 변환
         potential_selection_tuple = tuple(sorted(list(potential_selection)))
 
-        recommended_teams = []
-        if mode == 'ai_any':
-            recommended_teams = get_overlap_based_teams_size_8(potential_selection_tuple)
-        else: # 'ai'
-            recommended_teams = get_ai_teams_all_inclusive_all_sizes(potential_selection_tuple)
-
-        if not recommended_teams:
-            return jsonify({'count': 0})
+        count_mode = get_count_mode(mode)
 
         # 추천되는 팀 조합의 수를 반환
-        return jsonify({'count': len(recommended_teams)})
+        return jsonify({'count': get_recommended_count(count_mode, potential_selection_tuple, get_bands_arg(count_mode))})
 
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 요청: {e}'}), 400
     except Exception as e:
         print(f"추천 챔피언 수 계산 오류: {e}")
         return jsonify({'error': str(e)}), 500
@@ -772,20 +1129,9 @@ def get_bulk_recommendation_counts():
     if mode != 'ai':
         return jsonify({})
 
-    all_champs = set(champion_data.keys())
-    champs_to_check = all_champs - selected_champions
-
-    counts = {}
-    for champ_name in champs_to_check:
-        potential_selection = selected_champions.copy()
-        potential_selection.add(champ_name)
-        potential_selection_tuple = tuple(sorted(list(potential_selection)))
-
-        recommended_teams = get_ai_teams_all_inclusive_all_sizes(potential_selection_tuple)
-        if recommended_teams:
-            counts[champ_name] = len(recommended_teams)
-
-    return jsonify(counts)
+    # 현재 추천 팀들에서 챔피언별 포함 횟수를 한 번에 셉니다. (선택별로 캐시됨)
+    counts = get_champion_counts('ai', tuple(sorted(selected_champions)))
+    return jsonify({champ_name: count for champ_name, count in counts.items() if champ_name in champion_data})
 
 @app.route('/api/deactivation_recommendation_count/<champion_name>')
 def get_deactivation_recommendation_count(champion_name):
@@ -804,18 +1150,38 @@ def get_deactivation_recommendation_count(champion_name):
         if not potential_selection_tuple:
             return jsonify({'count': 0})
 
-        recommended_teams = []
-        if mode == 'ai_any':
-            recommended_teams = get_overlap_based_teams_size_8(potential_selection_tuple)
-        else: # 'ai'
-            recommended_teams = get_ai_teams_all_inclusive_all_sizes(potential_selection_tuple)
+        count_mode = get_count_mode(mode)
+        return jsonify({'count': get_recommended_count(count_mode, potential_selection_tuple, get_bands_arg(count_mode))})
 
-        return jsonify({'count': len(recommended_teams)})
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 요청: {e}'}), 400
+    except Exception as e:
+        print(f"비활성화 추천 수 계산 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/deactivation_recommendation_counts')
+def get_deactivation_recommendation_counts():
+    """선택된 챔피언 각각을 제외했을 때 추천되는 팀의 수를 한 번에 계산합니다."""
+    try:
+        mode = request.args.get('mode', 'ai')
+        selected_champions = get_selected_champions()
+        count_mode = get_count_mode(mode)
+        return jsonify(get_deactivation_counts(count_mode, tuple(sorted(selected_champions)), get_bands_arg(count_mode)))
 
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 요청: {e}'}), 400
     except Exception as e:
         print(f"비활성화 추천 수 계산 오류: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/dataset_stats')
+def get_dataset_stats():
+    """지금까지 로드된 데이터셋별 로드 시간, 팀 수, 메모리 매핑 크기를 반환합니다."""
+    return jsonify({
+        'backend': 'sqlite' if team_db is not None else 'team_store',
+        'datasets': team_datasets.stats(),
+    })
+
 @app.route('/api/item_icons')
 def get_item_icons():
     """tft_item_icons 폴더에 있는 아이콘 파일 목록을 반환합니다."""
@@ -834,8 +1200,10 @@ if __name__ == '__main__':
     app.config['TEMPLATES_AUTO_RELOAD'] = True
     
     print("TFT 팀 빌더 서버 시작...")
-    print(f"로드된 6-조합 팀 수: {len(parse_teams_from_file_size_6())}")
-    print(f"로드된 8-조합 팀 수: {len(parse_teams_from_file_size_8())}")
+    if team_db is not None:
+        print(f"SQLite 백엔드 사용: {TEAM_DB_PATH}")
+    else:
+        print("팀 데이터셋은 처음 사용될 때 로드됩니다. (/api/dataset_stats 참고)")
     print(f"로드된 챔피언 수: {len(champion_data)}")
     
     app.run(debug=False, host='0.0.0.0', port=5000, threaded=True)
@@ -0,0 +1,188 @@
+"""
+(시너지, 인원) → 활성화 단계 조회 표.
+
+synergy_counts.json의 활성화 단계를 시너지 번호 × 인원 2차원 배열로 펼쳐 두어,
+보드나 팀의 시너지 단계 계산을 시너지별 단계 목록 순회 대신 배열 인덱싱 몇 번으로 끝냅니다.
+    current[t, c]   시너지 t가 c명일 때 활성화된 단계 (없으면 0)
+    next[t, c]      다음 단계 (이미 최고 단계이면 0)
+    max_level[t]    최고 단계 (단계가 없는 시너지는 0)
+    level_tier[t, c] synergy_level.json 등급 번호 (0: 없음, 1: 실버, 2: 골드, 3: 프리즘 — LEVEL_TIERS 순서 + 1)
+인원은 (가장 큰 단계 + 1)에서 잘라 조회하므로, 그 이상의 인원도 같은 표로 처리됩니다.
+
+챔피언별 시너지 번호 배열(champion_trait_ids)과 (챔피언 수, 시너지 수) 0/1 행렬(champion_traits)도 함께 가지므로
+챔피언 목록의 시너지별 인원도 행 합으로 바로 구합니다.
+
+상징(emblem)은 시너지별 인원 벡터로 표현해 팀들의 (N, T) 인원에 한 번에 더하고(add_emblems),
+같은 표로 단계와 명세 조건, '낭비 없는 활성화'(is_fully_activated)를 다시 확인합니다. 상징별 데이터셋을 미리 만들지 않습니다.
+"""
+import numpy as np
+
+# synergy_level.json의 등급 (낮은 등급부터)
+LEVEL_TIERS = ('실버', '골드', '프리즘')
+
+def level_tier_pairs(synergy_levels):
+    """
+    synergy_level.json을 {등급: frozenset((시너지, 인원), ...)}로 펼칩니다. 등급의 인원은 정확히 그 인원입니다.
+    같은 (시너지, 인원)이 여러 등급에 있으면 높은 등급에만 남깁니다.
+    """
+    pairs = {}
+    claimed = set()
+    for tier in reversed(LEVEL_TIERS):
+        tier_pairs = {(trait, level)
+                      for trait, levels in synergy_levels.get(tier, {}).items()
+                      for level in (levels if isinstance(levels, list) else [levels])}
+        pairs[tier] = frozenset(tier_pairs - claimed)
+        claimed |= tier_pairs
+    return pairs
+
+class TraitTierTable:
+    """시너지 활성화 단계 조회 표. 서버는 한 번만 만들어 모든 요청에서 공유합니다."""
+
+    def __init__(self, synergy_tiers, champion_traits, traits=None, synergy_levels=None):
+        """
+        synergy_tiers: {시너지: 오름차순 활성화 단계 리스트}, champion_traits: {챔피언: 시너지 리스트}
+        traits: 시너지 번호 순서 (기본: 두 데이터에 나오는 시너지의 이름 순 — 팀 저장소 아레나와 같은 순서)
+        synergy_levels: synergy_level.json 내용 (없으면 level_tier가 모두 0)
+        """
+        self.traits = list(traits) if traits is not None else sorted(
+            {trait for names in champion_traits.values() for trait in names} | set(synergy_tiers))
+        self.trait_index = {name: i for i, name in enumerate(self.traits)}
+        tier_pairs = level_tier_pairs(synergy_levels or {})
+        self.max_count = 1 + max([level for levels in synergy_tiers.values() for level in levels] +
+                                 [level for pairs in tier_pairs.values() for _, level in pairs], default=0)
+
+        num_traits = len(self.traits)
+        self.current = np.zeros((num_traits, self.max_count + 1), dtype=np.int16)
+        self.next = np.zeros((num_traits, self.max_count + 1), dtype=np.int16)
+        self.max_level = np.zeros(num_traits, dtype=np.int16)
+        self.has_tiers = np.zeros(num_traits, dtype=bool)
+        counts = np.arange(self.max_count + 1)
+        for trait, levels in synergy_tiers.items():
+            t = self.trait_index.get(trait)
+            if t is None or not levels:
+                continue
+            levels = np.asarray(sorted(levels), dtype=np.int16)
+            reached = np.searchsorted(levels, counts, side='right')
+            self.current[t] = np.where(reached > 0, levels[np.maximum(reached - 1, 0)], 0)
+            self.next[t] = np.where(reached < levels.size, levels[np.minimum(reached, levels.size - 1)], 0)
+            self.max_level[t] = levels[-1]
+            self.has_tiers[t] = True
+
+        self.level_tier = np.zeros((num_traits, self.max_count + 1), dtype=np.int8)
+        for rank, tier in enumerate(LEVEL_TIERS, 1):
+            for trait, level in tier_pairs[tier]:
+                if trait in self.trait_index:
+                    self.level_tier[self.trait_index[trait], level] = rank
+
+        self.champions = sorted(champion_traits)
+        self.champion_index = {name: i for i, name in enumerate(self.champions)}
+        self.champion_trait_ids = {name: np.array([self.trait_index[trait] for trait in champion_traits[name]], dtype=np.int64)
+                                   for name in self.champions}
+        self.champion_traits = np.zeros((len(self.champions), num_traits), dtype=np.int16)
+        for i, name in enumerate(self.champions):
+            np.add.at(self.champion_traits[i], self.champion_trait_ids[name], 1)
+
+    def trait_counts(self, champion_names):
+        """챔피언 목록의 (T,) 시너지별 인원. 특성 데이터에 없는 챔피언은 무시합니다."""
+        rows = [self.champion_index[name] for name in champion_names if name in self.champion_index]
+        return self.champion_traits[rows].sum(axis=0, dtype=np.int64)
+
+    def emblem_vector(self, emblems):
+        """상징 시너지 이름 목록(같은 상징 여러 개는 반복)의 (T,) 인원 벡터. 알 수 없는 시너지이면 ValueError."""
+        vector = np.zeros(len(self.traits), dtype=np.int64)
+        for trait in emblems:
+            if trait not in self.trait_index:
+                raise ValueError(f"알 수 없는 상징 시너지: {trait}")
+            vector[self.trait_index[trait]] += 1
+        return vector
+
+    def add_emblems(self, trait_counts, team_sizes, emblem_vector):
+        """
+        (..., T) 시너지별 인원에 상징 인원을 더합니다. team_sizes는 팀 인원 (... 모양)입니다.
+        상징은 그 시너지가 없는 챔피언만 달 수 있으므로, 시너지마다 (팀 인원 - 현재 인원)까지만 더합니다.
+        """
+        counts = np.asarray(trait_counts, dtype=np.int64)
+        room = np.maximum(np.asarray(team_sizes, dtype=np.int64)[..., None] - counts, 0)
+        return counts + np.minimum(emblem_vector, room)
+
+    def is_fully_activated(self, trait_counts, checked=None):
+        """
+        (N, T) 시너지별 인원에서 한 명 이상인 시너지가 모두 정확히 활성화 단계인지 (N,) bool 배열로 반환합니다.
+        makeTeam.check_team_validity()와 같은 규칙이며, checked((N, T) bool)가 있으면 True인 칸만 검사합니다.
+        """
+        counts = np.asarray(trait_counts, dtype=np.int64)
+        current, _ = self.lookup(counts)
+        valid = (counts == 0) | (current == counts)
+        if checked is not None:
+            valid |= ~np.asarray(checked, dtype=bool)
+        return valid.all(axis=-1)
+
+    def match_trait_spec(self, trait_counts, spec):
+        """
+        (N, T) 시너지별 인원이 필터 명세(filter_spec.py 형식)의 시너지 조건을 만족하는지 (N,) bool 배열로 반환합니다.
+        any_trait_levels(정확히 그 인원), required_traits(이상), forbidden_traits(미만이어야 함)만 검사합니다.
+        """
+        counts = np.asarray(trait_counts, dtype=np.int64)
+        matched = np.ones(len(counts), dtype=bool)
+        if spec.get('any_trait_levels'):
+            any_matched = np.zeros(len(counts), dtype=bool)
+            for trait, levels in spec['any_trait_levels'].items():
+                t = self.trait_index.get(trait)
+                if t is not None:
+                    any_matched |= np.isin(counts[:, t], levels if isinstance(levels, list) else [levels])
+            matched &= any_matched
+        for trait, level in spec.get('required_traits', {}).items():
+            t = self.trait_index.get(trait)
+            matched &= counts[:, t] >= level if t is not None else False
+        for trait, level in spec.get('forbidden_traits', {}).items():
+            t = self.trait_index.get(trait)
+            if t is not None:
+                matched &= counts[:, t] < level
+        return matched
+
+    def lookup(self, trait_counts):
+        """
+        (..., T) 시너지별 인원 배열에 대해 (current, next) 단계 배열을 같은 모양으로 반환합니다.
+        마지막 축의 순서는 self.traits여야 합니다.
+        """
+        clipped = np.minimum(np.asarray(trait_counts, dtype=np.int64), self.max_count)
+        trait_ids = np.arange(len(self.traits))
+        return self.current[trait_ids, clipped], self.next[trait_ids, clipped]
+
+    def score_counts(self, trait_counts):
+        """
+        (..., T) 시너지별 인원에 대해 (활성화된 단계 합, '완성 직전' 시너지 수)를 계산합니다.
+        team_store.score_trait_counts()와 같은 규칙입니다. ('완성 직전'은 한 명 이상 있고 다음 단계까지 1명 남은 시너지)
+        """
+        counts = np.asarray(trait_counts, dtype=np.int64)
+        current, next_level = self.lookup(counts)
+        almost_complete = (counts > 0) & (next_level == counts + 1)
+        return current.sum(axis=-1, dtype=np.int64), almost_complete.sum(axis=-1, dtype=np.int64)
+
+    def tier_summary(self, trait_counts):
+        """
+        (..., T) 시너지별 인원에 대해 synergy_level.json 등급 요약 (골드 시너지 수, 프리즘 시너지 수, 최고 등급 번호)을 계산합니다.
+        등급 번호는 0(없음), 1(실버), 2(골드), 3(프리즘)입니다.
+        """
+        clipped = np.minimum(np.asarray(trait_counts, dtype=np.int64), self.max_count)
+        tiers = self.level_tier[np.arange(len(self.traits)), clipped]
+        gold = (tiers == LEVEL_TIERS.index('골드') + 1).sum(axis=-1, dtype=np.int64)
+        prism = (tiers == LEVEL_TIERS.index('프리즘') + 1).sum(axis=-1, dtype=np.int64)
+        return gold, prism, tiers.max(axis=-1, initial=0).astype(np.int64)
+
+    def board_synergies(self, champion_names):
+        """
+        보드(챔피언 목록)의 시너지 목록. 단계가 정의된 시너지 중 한 명 이상인 것을 인원 내림차순, 이름 순으로 반환합니다.
+        항목: {'name', 'count', 'current_level', 'next_level' (최고 단계면 None), 'max_level'}
+        """
+        counts = self.trait_counts(champion_names)
+        current, next_level = self.lookup(counts)
+        synergies = [{
+            'name': self.traits[t],
+            'count': int(counts[t]),
+            'current_level': int(current[t]),
+            'next_level': int(next_level[t]) or None,
+            'max_level': int(self.max_level[t]),
+        } for t in np.flatnonzero((counts > 0) & self.has_tiers).tolist()]
+        synergies.sort(key=lambda x: (-x['count'], x['name']))
+        return synergies